@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple, Type
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from app.models.schemas import (
+    BatchRequest, BatchResponse, BatchItem, BatchItemResult, BatchItemType,
+    StoryGenerationRequest, CharacterGenerationRequest, PlotGenerationRequest
+)
+from app.models.conversational_schemas import ContentActionRequest
+from app.api import story_generation, conversational_ai
+from app.dependencies import resolve_dependencies
+
+router = APIRouter()
+
+# Server-side limits; callers can ask for less concurrency but never more
+BATCH_MAX_CONCURRENCY = int(os.environ.get("AI_BATCH_MAX_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.environ.get("AI_BATCH_MAX_ITEMS", "50"))
+
+
+# Each item type maps to (request model, payload defaults, single-item endpoint handler)
+BATCH_HANDLERS: Dict[BatchItemType, Tuple[Type[BaseModel], Dict[str, Any], Callable[..., Awaitable[BaseModel]]]] = {
+    BatchItemType.STORY: (StoryGenerationRequest, {}, story_generation.generate_story),
+    BatchItemType.CHARACTER: (CharacterGenerationRequest, {}, story_generation.generate_character),
+    BatchItemType.PLOT: (PlotGenerationRequest, {}, story_generation.generate_plot),
+    BatchItemType.EXPAND: (ContentActionRequest, {"action_type": "scene"}, conversational_ai.expand_content),
+    BatchItemType.SUMMARIZE: (ContentActionRequest, {"action_type": "summarize"}, conversational_ai.summarize_content),
+}
+
+
+async def _run_item(index: int, item: BatchItem, semaphore: asyncio.Semaphore) -> BatchItemResult:
+    """Run one batch item through its single-item handler, capturing errors per item"""
+    request_model, defaults, handler = BATCH_HANDLERS[item.type]
+    base = {"index": index, "id": item.id, "type": item.type}
+    try:
+        request = request_model(**{**defaults, **item.payload})
+    except ValidationError as e:
+        return BatchItemResult(**base, status="error", error=str(e), status_code=422)
+
+    async with semaphore:
+        try:
+            response = await handler(request, **resolve_dependencies(handler))
+        except HTTPException as e:
+            return BatchItemResult(**base, status="error", error=str(e.detail), status_code=e.status_code)
+        except Exception as e:
+            return BatchItemResult(**base, status="error", error=str(e), status_code=500)
+
+    return BatchItemResult(**base, status="ok", result=response.model_dump(mode="json"))
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def run_batch(request: BatchRequest):
+    """
+    Run several story, character, plot, expand and summarize generations in one call.
+    Items run concurrently under a bounded limit and fail independently.
+    With stream=true, results are sent as NDJSON lines in completion order.
+    """
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the limit of {BATCH_MAX_ITEMS} items")
+
+    concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    batch_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    tasks: List[Awaitable[BatchItemResult]] = [
+        _run_item(index, item, semaphore) for index, item in enumerate(request.items)
+    ]
+
+    if request.stream:
+        async def result_stream() -> AsyncIterator[str]:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                yield json.dumps({"batch_id": batch_id, **result.model_dump(mode="json")}) + "\n"
+
+        return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*tasks)
+    failed = sum(1 for result in results if result.status != "ok")
+    return BatchResponse(
+        id=batch_id,
+        results=results,
+        metadata={
+            "total": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "max_concurrency": concurrency,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    )
@@ -1,17 +1,19 @@
 import uuid
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from app.models.schemas import (
     PlotGenerationRequest, PlotGenerationResponse,
     ErrorResponse
 )
+from app.dependencies import get_gemini_service
 from app.services.gemini_service import GeminiService
 
 router = APIRouter()
 
-gemini_service = GeminiService()
-
 @router.post("/generate", response_model=PlotGenerationResponse)
-async def generate_plot(request: PlotGenerationRequest):
+async def generate_plot(
+    request: PlotGenerationRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """Generate a plot structure using the Gemini service"""
     try:
         # STEP 3: Build a detailed, specific prompt for the GeminiService
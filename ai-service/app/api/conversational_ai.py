@@ -1,34 +1,73 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any, Optional
+from fastapi.responses import StreamingResponse
+from typing import Optional, AsyncIterator
+import os
+import json
+import time
 import uuid
 from datetime import datetime
 from app.models.conversational_schemas import (
     ConversationRequest, ConversationResponse, ContentActionRequest, ContentActionResponse,
-    ErrorResponse
+    BulkModerationRequest, BulkModerationResponse
 )
+from app.dependencies import get_gemini_service
 from app.services.gemini_service import GeminiService
+from app.services.session_store import Session, session_store
+from app.services.tracing import attach_timing
 
 router = APIRouter()
 
-# Initialize Gemini service
-gemini_service = GeminiService()
+# Upper bound on items per bulk moderation request
+BULK_MODERATION_MAX_ITEMS = int(os.environ.get("AI_MODERATION_BULK_MAX_ITEMS", "10000"))
+
+def _resolve_session(request: ConversationRequest) -> Optional[Session]:
+    """
+    The stored session for a request with a session id. A request carrying
+    conversation_history resyncs the store from it; one without uses the
+    stored history, after checking expected_version if the client sent it.
+    """
+    if not request.session_id:
+        return None
+    if request.conversation_history is not None:
+        return session_store.replace(request.session_id, request.conversation_history)
+    session = session_store.get(request.session_id)
+    if request.expected_version is not None and session_store.conflict(session, request.expected_version):
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "error": "session_version_mismatch",
+                "message": "Session history is out of date; resend the request with conversation_history",
+                "session_version": session.version
+            }
+        )
+    return session
 
 @router.post("/conversation", response_model=ConversationResponse)
-async def send_message(request: ConversationRequest):
+async def send_message(
+    request: ConversationRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """
-    Send a message to the AI and get a conversational response
+    Send a message to the AI and get a conversational response.
+    With a session_id the service keeps the history: send only the new
+    message and the session_version from the previous response as
+    expected_version. A 409 means the client should resend with its full
+    conversation_history.
     """
+    session = _resolve_session(request)
     try:
         # Generate AI response using Gemini
         ai_response = await gemini_service.generate_story_response(
             user_prompt=request.message,
             conversation_history=request.conversation_history,
-            project_context=request.project_context
+            project_context=request.project_context,
+            session_id=request.session_id,
+            session=session if request.conversation_history is None else None
         )
         
-        # Skip content moderation for now to avoid blocking responses
-        # moderation_result = await gemini_service.moderate_content(ai_response["content"])
-        moderation_result = {"safe": True}
+        # Local moderation is fast enough for every response; only borderline
+        # scores pay for an LLM check
+        moderation_result = await gemini_service.moderate_content(ai_response["content"])
         
         if not moderation_result.get("safe", True):
             raise HTTPException(
@@ -36,19 +75,82 @@ async def send_message(request: ConversationRequest):
                 detail="Generated content contains inappropriate material"
             )
         
+        metadata = dict(ai_response["metadata"])
+        if session is not None:
+            metadata["session_version"] = session_store.append(session, request.message, ai_response["content"])
+        gemini_service.index_exchange(
+            request.message, ai_response["content"], request.conversation_history,
+            request.project_context, request.session_id
+        )
+        
         return ConversationResponse(
             id=str(uuid.uuid4()),
             content=ai_response["content"],
             suggestions=ai_response["suggestions"],
-            metadata=ai_response["metadata"],
+            metadata=attach_timing(metadata),
             moderation_result=moderation_result
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/conversation/stream")
+async def stream_message(
+    request: ConversationRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
+    """
+    Send a message to the AI and stream the response as server-sent events.
+    Emits "chunk" events with text as it is generated, then a trailing "done"
+    event with the response id, suggestions and metadata. Sessions work as
+    for /conversation; the new session_version is in the done metadata.
+    """
+    session = _resolve_session(request)
+    response_id = str(uuid.uuid4())
+
+    async def event_stream() -> AsyncIterator[str]:
+        chunks = []
+        async for event in gemini_service.stream_story_response(
+            user_prompt=request.message,
+            conversation_history=request.conversation_history,
+            project_context=request.project_context,
+            session_id=request.session_id,
+            session=session if request.conversation_history is None else None
+        ):
+            event_type = event.pop("event")
+            if event_type == "chunk":
+                chunks.append(event["text"])
+            elif event_type == "done":
+                event["id"] = response_id
+                content = "".join(chunks)
+                # The text has already been sent, so the local verdict is reported
+                # for the client to act on rather than blocking the stream
+                event["moderation_result"] = gemini_service.moderator.check(content)
+                if session is not None:
+                    event["metadata"] = {
+                        **event.get("metadata", {}),
+                        "session_version": session_store.append(session, request.message, content.strip())
+                    }
+                # Already delivered and stored, so indexed whatever the verdict
+                gemini_service.index_exchange(
+                    request.message, content.strip(), request.conversation_history,
+                    request.project_context, request.session_id
+                )
+            yield f"event: {event_type}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/content/expand", response_model=ContentActionResponse)
-async def expand_content(request: ContentActionRequest):
+async def expand_content(
+    request: ContentActionRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """
     Expand existing content based on user request
     """
@@ -63,18 +165,21 @@ async def expand_content(request: ContentActionRequest):
             original_content=request.content,
             new_content=expanded_content,
             action_type=request.action_type,
-            metadata={
+            metadata=attach_timing({
                 "word_count": len(expanded_content.split()),
                 "expansion_ratio": len(expanded_content) / len(request.content),
                 "timestamp": datetime.utcnow().isoformat()
-            }
+            })
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/content/summarize", response_model=ContentActionResponse)
-async def summarize_content(request: ContentActionRequest):
+async def summarize_content(
+    request: ContentActionRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """
     Summarize long content
     """
@@ -86,18 +191,21 @@ async def summarize_content(request: ContentActionRequest):
             original_content=request.content,
             new_content=summarized_content,
             action_type="summarize",
-            metadata={
+            metadata=attach_timing({
                 "word_count": len(summarized_content.split()),
                 "compression_ratio": len(summarized_content) / len(request.content),
                 "timestamp": datetime.utcnow().isoformat()
-            }
+            })
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/content/retry", response_model=ContentActionResponse)
-async def retry_generation(request: ContentActionRequest):
+async def retry_generation(
+    request: ContentActionRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """
     Retry generation with user feedback
     """
@@ -115,18 +223,21 @@ async def retry_generation(request: ContentActionRequest):
             original_content=request.content,
             new_content=retry_content,
             action_type="retry",
-            metadata={
+            metadata=attach_timing({
                 "word_count": len(retry_content.split()),
                 "feedback": request.feedback,
                 "timestamp": datetime.utcnow().isoformat()
-            }
+            })
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/content/moderate")
-async def moderate_content(request: ContentActionRequest):
+async def moderate_content(
+    request: ContentActionRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """
     Moderate content for safety
     """
@@ -137,12 +248,45 @@ async def moderate_content(request: ContentActionRequest):
             "safe": moderation_result.get("safe", True),
             "issues": moderation_result.get("issues", []),
             "suggestions": moderation_result.get("suggestions", []),
+            "verdict": moderation_result.get("verdict"),
+            "score": moderation_result.get("score"),
+            "engine": moderation_result.get("engine"),
             "timestamp": datetime.utcnow().isoformat()
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/content/moderate/bulk", response_model=BulkModerationResponse)
+async def moderate_content_bulk(
+    request: BulkModerationRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
+    """
+    Moderate many texts at once with the local engine, e.g. to re-check a
+    whole project. Items scored "review" are not escalated to the model.
+    """
+    if len(request.items) > BULK_MODERATION_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items: {len(request.items)} (max {BULK_MODERATION_MAX_ITEMS})"
+        )
+    try:
+        started = time.perf_counter()
+        checks = gemini_service.moderator.check_batch([item.content for item in request.items])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        results = []
+        summary = {"allow": 0, "review": 0, "block": 0}
+        for item, check in zip(request.items, checks):
+            summary[check["verdict"]] += 1
+            results.append({"id": item.id, **check})
+
+        return BulkModerationResponse(results=results, summary=summary, elapsed_ms=round(elapsed_ms, 1))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
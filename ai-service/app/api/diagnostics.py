@@ -0,0 +1,67 @@
+from fastapi import APIRouter
+from app.dependencies import get_services
+from app.services.circuit_breaker import circuit_breaker
+from app.services.model_client import request_governor
+from app.services.response_cache import response_cache
+from app.services.retrieval import retrieval_index
+from app.services.semantic_cache import semantic_cache
+from app.services.session_store import session_store
+from app.services.singleflight import inflight_requests
+
+router = APIRouter()
+
+@router.get("/cache")
+async def cache_stats():
+    """Hit/miss counters for the model response cache"""
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+@router.get("/semantic-cache")
+async def semantic_cache_stats():
+    """Hit rate and best-match similarity distribution for the semantic cache"""
+    if semantic_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **semantic_cache.stats()}
+
+@router.get("/retrieval")
+async def retrieval_stats():
+    """Per-project retrieval index: indexed turns, snippets returned and average query/insert time"""
+    if retrieval_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **retrieval_index.stats()}
+
+@router.get("/summarizer")
+async def summarizer_stats():
+    """Chunked summarization counters, including chunk summaries reused from cache"""
+    return get_services().gemini_service.summarizer.stats()
+
+@router.get("/governor")
+async def governor_stats():
+    """Rate limiter and concurrency settings shared by all Gemini calls"""
+    return request_governor.stats()
+
+@router.get("/scheduler")
+async def scheduler_stats():
+    """Model call slots and queues per priority class, with average and worst queue wait"""
+    return request_governor.scheduler.stats()
+
+@router.get("/circuit")
+async def circuit_stats():
+    """Circuit breaker state for model calls: closed, open or half_open"""
+    return circuit_breaker.stats()
+
+@router.get("/inflight")
+async def inflight_stats():
+    """Counters for coalesced identical in-flight model calls"""
+    return inflight_requests.stats()
+
+@router.get("/lifecycle")
+async def lifecycle_stats():
+    """Startup and warmup time of the shared services, and generations in flight"""
+    return get_services().stats()
+
+@router.get("/sessions")
+async def session_stats():
+    """Server-side chat histories: sessions held, resyncs and version conflicts"""
+    return session_store.stats()
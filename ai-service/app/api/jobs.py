@@ -0,0 +1,114 @@
+import json
+import asyncio
+from typing import Any, AsyncIterator, Dict
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.models.schemas import StoryGenerationRequest, JobResponse
+from app.services.job_queue import JobStatus, TERMINAL_STATUSES, build_job_executor
+from app.api import story_generation
+from app.dependencies import resolve_dependencies
+
+router = APIRouter()
+
+
+async def run_story_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate a story in the background with the same handler as /generate-story"""
+    handler = story_generation.generate_story
+    response = await handler(StoryGenerationRequest(**payload), **resolve_dependencies(handler))
+    return response.model_dump(mode="json")
+
+
+# Job kinds the executors know how to run; also used by the Celery worker
+JOB_HANDLERS = {
+    "story": run_story_job,
+}
+
+job_executor = build_job_executor(JOB_HANDLERS)
+
+
+def _job_response(job: Dict[str, Any]) -> JobResponse:
+    job_id = job["id"]
+    return JobResponse(
+        job_id=job_id,
+        kind=job.get("kind"),
+        status=job["status"],
+        created_at=job.get("created_at"),
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+        error=job.get("error"),
+        links={
+            "status": f"/api/v1/jobs/{job_id}",
+            "events": f"/api/v1/jobs/{job_id}/events",
+            "result": f"/api/v1/jobs/{job_id}/result",
+        }
+    )
+
+
+async def _get_job_or_404(job_id: str) -> Dict[str, Any]:
+    job = await job_executor.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs/story", response_model=JobResponse, status_code=202)
+async def submit_story_job(request: StoryGenerationRequest):
+    """
+    Queue a story generation and return immediately with a job id.
+    Intended for long stories that would otherwise hold a request open.
+    """
+    job_id = await job_executor.submit("story", request.model_dump(mode="json"))
+    return _job_response(await _get_job_or_404(job_id))
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Current status of a background job"""
+    return _job_response(await _get_job_or_404(job_id))
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Result of a finished job. Returns 202 with the job status while it is
+    still queued or running, and 500 with the error if it failed.
+    """
+    job = await _get_job_or_404(job_id)
+    if job["status"] == JobStatus.SUCCEEDED:
+        return job["result"]
+    if job["status"] == JobStatus.FAILED:
+        raise HTTPException(status_code=500, detail=job.get("error") or "Job failed")
+    return JSONResponse(status_code=202, content=_job_response(job).model_dump(mode="json"))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, poll_interval: float = 1.0):
+    """
+    Stream job status changes as server-sent events until the job finishes.
+    The final event carries the result or the error.
+    """
+    await _get_job_or_404(job_id)
+    poll_interval = min(max(poll_interval, 0.2), 10.0)
+
+    async def event_stream() -> AsyncIterator[str]:
+        last_status = None
+        while True:
+            job = await job_executor.get(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                event = _job_response(job).model_dump(mode="json")
+                if last_status == JobStatus.SUCCEEDED:
+                    event["result"] = job["result"]
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+            if last_status in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(poll_interval)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
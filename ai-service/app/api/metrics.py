@@ -0,0 +1,80 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.circuit_breaker import STATE_VALUES, circuit_breaker
+from app.services.metrics import registry
+from app.services.model_client import request_governor
+from app.services.response_cache import response_cache
+from app.services.retrieval import retrieval_index
+from app.services.semantic_cache import semantic_cache
+from app.services.session_store import session_store
+from app.services.singleflight import inflight_requests
+
+router = APIRouter()
+
+# Shared components already keep their own counters; read them at scrape time
+registry.gauge(
+    "ai_governor_available_tokens", "Rate limit tokens currently available",
+    lambda: request_governor.stats()["available_tokens"]
+)
+registry.gauge(
+    "ai_circuit_state", "Model circuit breaker state: 0 closed, 1 half-open, 2 open",
+    lambda: STATE_VALUES[circuit_breaker.stats()["state"]]
+)
+registry.gauge(
+    "ai_inflight_calls", "Distinct model calls currently in flight",
+    lambda: inflight_requests.stats()["in_flight"]
+)
+registry.gauge(
+    "ai_inflight_coalesced_total", "Calls that joined an identical in-flight call",
+    lambda: inflight_requests.stats()["coalesced"], metric_type="counter"
+)
+registry.gauge(
+    "ai_chat_sessions", "Chat sessions whose history is held in the service",
+    lambda: session_store.stats()["sessions"]
+)
+registry.gauge(
+    "ai_chat_session_conflicts_total", "Requests rejected because the client's session version was stale",
+    lambda: session_store.stats()["conflicts"], metric_type="counter"
+)
+if response_cache is not None:
+    registry.gauge(
+        "ai_response_cache_entries", "Entries in the in-process response cache",
+        lambda: response_cache.stats()["entries"]
+    )
+    registry.gauge(
+        "ai_response_cache_hits_total", "Response cache hits in either tier",
+        lambda: response_cache.stats()["hits"] + response_cache.stats()["shared_hits"], metric_type="counter"
+    )
+    registry.gauge(
+        "ai_response_cache_misses_total", "Response cache misses",
+        lambda: response_cache.stats()["misses"], metric_type="counter"
+    )
+
+if semantic_cache is not None:
+    registry.gauge(
+        "ai_semantic_cache_entries", "Entries in the semantic near-duplicate cache",
+        lambda: semantic_cache.stats()["entries"]
+    )
+    registry.gauge(
+        "ai_semantic_cache_hits_total", "Semantic cache lookups answered from a similar prompt",
+        lambda: semantic_cache.stats()["hits"], metric_type="counter"
+    )
+    registry.gauge(
+        "ai_semantic_cache_misses_total", "Semantic cache lookups with no match above the threshold",
+        lambda: semantic_cache.stats()["misses"], metric_type="counter"
+    )
+
+if retrieval_index is not None:
+    registry.gauge(
+        "ai_retrieval_indexed_turns", "Conversation turns held in the per-project retrieval indexes",
+        lambda: retrieval_index.stats()["indexed_turns"]
+    )
+    registry.gauge(
+        "ai_retrieval_snippets_total", "Relevant earlier turns added to prompts",
+        lambda: retrieval_index.stats()["snippets"], metric_type="counter"
+    )
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Service metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
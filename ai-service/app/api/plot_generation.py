@@ -1,18 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from app.models.schemas import (
     PlotGenerationRequest, PlotGenerationResponse,
     ErrorResponse
 )
 # STEP 1: Import the correct GeminiService
+from app.dependencies import get_gemini_service
 from app.services.gemini_service import GeminiService
 
 router = APIRouter()
 
-# STEP 2: Initialize the new GeminiService
-gemini_service = GeminiService()
-
 @router.post("/generate", response_model=PlotGenerationResponse)
-async def generate_plot(request: PlotGenerationRequest):
+async def generate_plot(
+    request: PlotGenerationRequest,
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """Generate a plot structure based on the provided request"""
     try:
         # STEP 3: Build a detailed prompt for the GeminiService
@@ -0,0 +1,114 @@
+"""
+Process-wide services shared by every router.
+
+The FastAPI lifespan in main.py starts them once, before the first request,
+and stops them after the last. Routers receive them through the dependency
+functions below. Code that runs outside a request, such as batch items, jobs
+and the Celery worker, calls the same functions directly.
+"""
+import os
+import time
+import inspect
+import logging
+from typing import Any, Callable, Dict, Optional
+from fastapi import params
+from app.services.gemini_service import GeminiService
+from app.services.metrics import registry
+from app.services.story_pipeline import StoryPipeline
+
+logger = logging.getLogger(__name__)
+
+
+class AppServices:
+    def __init__(self, gemini_service: GeminiService, story_pipeline: StoryPipeline):
+        self.gemini_service = gemini_service
+        self.story_pipeline = story_pipeline
+        self.startup_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "startup_ms": round(self.startup_seconds * 1000, 1) if self.startup_seconds is not None else None,
+            "warmup_ms": round(self.warmup_seconds * 1000, 1) if self.warmup_seconds is not None else None,
+            "active_generations": self.gemini_service.active_generations,
+            "model": self.gemini_service.model_name,
+        }
+
+
+_services: Optional[AppServices] = None
+
+
+async def start_services(warmup: Optional[bool] = None) -> AppServices:
+    """
+    Create the shared services, optionally warming up the model connection
+    (AI_WARMUP, on by default). Safe to call again; later calls return the
+    running instance.
+    """
+    global _services
+    if _services is not None:
+        return _services
+
+    started = time.perf_counter()
+    gemini_service = GeminiService()
+    services = AppServices(gemini_service, StoryPipeline(gemini_service))
+    if warmup is None:
+        warmup = os.environ.get("AI_WARMUP", "true").lower() not in ("0", "false", "no")
+    if warmup:
+        services.warmup_seconds = await gemini_service.warmup()
+    services.startup_seconds = time.perf_counter() - started
+    _services = services
+    logger.info("AI services started in %.1f ms", services.startup_seconds * 1000)
+    return services
+
+
+async def stop_services(drain_timeout: Optional[float] = None) -> None:
+    """Wait for in-flight generations to finish (up to AI_SHUTDOWN_DRAIN_SECONDS), then release the services"""
+    global _services
+    if _services is None:
+        return
+    if drain_timeout is None:
+        drain_timeout = float(os.environ.get("AI_SHUTDOWN_DRAIN_SECONDS", "25"))
+    drained = await _services.gemini_service.drain(drain_timeout)
+    if not drained:
+        logger.warning(
+            "Shutting down with %d generation(s) still in flight after %.0fs",
+            _services.gemini_service.active_generations, drain_timeout
+        )
+    _services = None
+
+
+def get_services() -> AppServices:
+    if _services is None:
+        raise RuntimeError("AI services are not started; they are created by the app lifespan or start_services()")
+    return _services
+
+
+def get_gemini_service() -> GeminiService:
+    return get_services().gemini_service
+
+
+def get_story_pipeline() -> StoryPipeline:
+    return get_services().story_pipeline
+
+
+def resolve_dependencies(handler: Callable[..., Any]) -> Dict[str, Any]:
+    """
+    Keyword arguments for calling an endpoint handler outside a request:
+    each Depends(...) parameter is filled by calling its dependency, which
+    only works for the parameterless service getters above
+    """
+    return {
+        name: param.default.dependency()
+        for name, param in inspect.signature(handler).parameters.items()
+        if isinstance(param.default, params.Depends)
+    }
+
+
+registry.gauge(
+    "ai_startup_seconds", "Time to create the shared services, including warmup",
+    lambda: _services.startup_seconds if _services is not None else None
+)
+registry.gauge(
+    "ai_active_generations", "Service calls currently generating",
+    lambda: _services.gemini_service.active_generations if _services is not None else None
+)
@@ -14,6 +14,8 @@ class ConversationRequest(BaseModel):
     message: str = Field(..., description="User's message to the AI")
     conversation_history: Optional[List[Dict[str, Any]]] = Field(None, description="Previous conversation messages")
     project_context: Optional[Dict[str, Any]] = Field(None, description="Project context information")
+    session_id: Optional[str] = Field(None, description="Chat session ID, used to keep a rolling summary of older turns")
+    expected_version: Optional[int] = Field(None, description="Session version the client last saw; without conversation_history the stored history is used, and a mismatch returns 409")
 
 class ConversationResponse(BaseModel):
     id: str = Field(..., description="Unique identifier for the response")
@@ -34,6 +36,18 @@ class ContentActionResponse(BaseModel):
     action_type: str = Field(..., description="Type of action performed")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Action metadata")
 
+class BulkModerationItem(BaseModel):
+    id: Optional[str] = Field(None, description="Caller-supplied identifier, echoed in the result")
+    content: str = Field(..., description="Content to moderate")
+
+class BulkModerationRequest(BaseModel):
+    items: List[BulkModerationItem] = Field(..., description="Texts to moderate in one pass")
+
+class BulkModerationResponse(BaseModel):
+    results: List[Dict[str, Any]] = Field(..., description="Moderation result per item, in request order")
+    summary: Dict[str, int] = Field(default_factory=dict, description="Number of items per verdict")
+    elapsed_ms: float = Field(..., description="Time spent scoring the batch")
+
 class MessageResponse(BaseModel):
     id: str = Field(..., description="Message ID")
     sender: str = Field(..., description="Message sender (USER or AI)")
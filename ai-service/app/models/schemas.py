@@ -57,6 +57,7 @@ class StoryGenerationRequest(BaseModel):
     length: Optional[StoryLength] = Field(StoryLength.MEDIUM, description="Desired length of the story")
     style: Optional[str] = Field(None, description="Writing style preferences")
     additional_context: Optional[str] = Field(None, description="Additional context or requirements")
+    use_outline: Optional[bool] = Field(None, description="Generate an outline first, then write sections in parallel (defaults to on for long stories)")
 
 class CharacterGenerationRequest(BaseModel):
     name: Optional[str] = Field(None, description="Character name (optional)")
@@ -113,6 +114,49 @@ class PlotStructure(BaseModel):
     total_points: int = Field(..., description="Total number of plot points")
     estimated_word_count: int = Field(..., description="Estimated word count for the story")
 
+# Batch Models
+class BatchItemType(str, Enum):
+    STORY = "story"
+    CHARACTER = "character"
+    PLOT = "plot"
+    EXPAND = "expand"
+    SUMMARIZE = "summarize"
+
+class BatchItem(BaseModel):
+    id: Optional[str] = Field(None, description="Caller-supplied identifier echoed back in the result")
+    type: BatchItemType = Field(..., description="Kind of generation to run")
+    payload: Dict[str, Any] = Field(..., description="Request body for the matching single-item endpoint")
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1, description="Generations to run")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Maximum items to run at once (capped by the server limit)")
+    stream: bool = Field(False, description="Stream each result as NDJSON as soon as it finishes")
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    id: Optional[str] = Field(None, description="Caller-supplied identifier")
+    type: BatchItemType = Field(..., description="Kind of generation")
+    status: str = Field(..., description="ok or error")
+    result: Optional[Dict[str, Any]] = Field(None, description="Response of the single-item endpoint")
+    error: Optional[str] = Field(None, description="Error message when the item failed")
+    status_code: Optional[int] = Field(None, description="HTTP status the single-item endpoint would have returned on error")
+
+class BatchResponse(BaseModel):
+    id: str = Field(..., description="Unique identifier for the batch")
+    results: List[BatchItemResult] = Field(..., description="Per-item results in request order")
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="Batch metadata including counts and timing")
+
+# Job Models
+class JobResponse(BaseModel):
+    job_id: str = Field(..., description="Job identifier")
+    kind: Optional[str] = Field(None, description="Kind of job")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    created_at: Optional[str] = Field(None, description="Submission timestamp")
+    started_at: Optional[str] = Field(None, description="Start timestamp")
+    finished_at: Optional[str] = Field(None, description="Completion timestamp")
+    error: Optional[str] = Field(None, description="Error message when the job failed")
+    links: Dict[str, str] = Field(default_factory=dict, description="URLs for polling the job and fetching its result")
+
 # Error Models
 class ErrorResponse(BaseModel):
     error: str = Field(..., description="Error message")
@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+from app.services.metrics import circuit_rejections, circuit_transitions
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric encoding for the state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit is open"""
+
+    def __init__(self, method: str, retry_in: float):
+        super().__init__(f"Circuit open; model calls for {method} are suspended for {retry_in:.1f}s")
+        self.method = method
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Stops calling the model while it is failing, so callers get their local
+    fallback at once instead of walking the retry ladder.
+
+    Closed: calls go through. The circuit opens after failure_threshold
+    consecutive upstream failures, or when at least min_calls of the last
+    window_size calls include failure_rate or more failures.
+    Open: calls raise CircuitOpenError immediately for recovery_seconds.
+    Half-open: up to probe_calls calls at a time go through as probes; that
+    many successes close the circuit, any failure opens it again.
+
+    Only upstream health counts: rate limits and unavailability are failures,
+    other errors (bad requests, cancelled calls) are ignored.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        failure_rate: float = 0.5,
+        window_size: int = 20,
+        min_calls: int = 10,
+        recovery_seconds: float = 30.0,
+        probe_calls: int = 2
+    ):
+        self.failure_threshold = failure_threshold
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.recovery_seconds = recovery_seconds
+        self.probe_calls = max(1, probe_calls)
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window_size))
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            failure_threshold=int(os.environ.get("AI_BREAKER_FAILURE_THRESHOLD", "5")),
+            failure_rate=float(os.environ.get("AI_BREAKER_FAILURE_RATE", "0.5")),
+            window_size=int(os.environ.get("AI_BREAKER_WINDOW", "20")),
+            min_calls=int(os.environ.get("AI_BREAKER_MIN_CALLS", "10")),
+            recovery_seconds=float(os.environ.get("AI_BREAKER_RECOVERY_SECONDS", "30")),
+            probe_calls=int(os.environ.get("AI_BREAKER_PROBE_CALLS", "2"))
+        )
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning("Model circuit %s -> %s", self.state, state)
+        self.state = state
+        circuit_transitions.inc(state)
+        if state == OPEN:
+            self._stats["opened"] += 1
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._outcomes.clear()
+            self._consecutive_failures = 0
+        if state != CLOSED:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def _retry_in(self) -> float:
+        return max(0.0, self._opened_at + self.recovery_seconds - time.monotonic())
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being rejected outright (open and not yet due for probes)"""
+        if self.state == OPEN and self._retry_in() <= 0:
+            self._transition(HALF_OPEN)
+        return self.state == OPEN
+
+    def _acquire(self, method: str) -> bool:
+        """Admit a call or raise CircuitOpenError; returns whether the call is a probe"""
+        if self.is_open:
+            self._reject(method, self._retry_in())
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.probe_calls:
+                self._reject(method, 0.0)
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def _reject(self, method: str, retry_in: float) -> None:
+        self._stats["rejected"] += 1
+        circuit_rejections.inc(method)
+        raise CircuitOpenError(method, retry_in)
+
+    def _record(self, probe: bool, healthy: Optional[bool]) -> None:
+        if probe:
+            # The circuit may have reopened while this probe was running
+            if self.state != HALF_OPEN:
+                return
+            self._probes_in_flight -= 1
+            if healthy is False:
+                self._transition(OPEN)
+            elif healthy:
+                self._probe_successes += 1
+                if self._probe_successes >= self.probe_calls:
+                    self._transition(CLOSED)
+            return
+
+        if healthy is None or self.state != CLOSED:
+            return
+        self._outcomes.append(healthy)
+        self._consecutive_failures = 0 if healthy else self._consecutive_failures + 1
+        if self.failure_threshold > 0 and self._consecutive_failures >= self.failure_threshold:
+            self._transition(OPEN)
+        elif len(self._outcomes) >= self.min_calls and self.failure_rate > 0:
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN)
+
+    @contextmanager
+    def guard(self, method: str, is_failure: Callable[[Exception], bool]) -> Iterator[None]:
+        """
+        Run one model call through the breaker. is_failure(error) decides
+        whether an exception counts against the upstream's health.
+        """
+        probe = self._acquire(method)
+        try:
+            yield
+        except Exception as e:
+            self._record(probe, False if is_failure(e) else None)
+            raise
+        except BaseException:
+            # Cancelled or closed early: says nothing about the upstream
+            self._record(probe, None)
+            raise
+        self._record(probe, True)
+
+    def stats(self) -> Dict[str, Any]:
+        is_open = self.is_open
+        return {
+            "state": self.state,
+            "retry_in_seconds": round(self._retry_in(), 2) if is_open else 0.0,
+            "consecutive_failures": self._consecutive_failures,
+            "window_calls": len(self._outcomes),
+            "window_failures": self._outcomes.count(False),
+            "probes_in_flight": self._probes_in_flight,
+            "failure_threshold": self.failure_threshold,
+            "failure_rate": self.failure_rate,
+            "recovery_seconds": self.recovery_seconds,
+            **self._stats,
+        }
+
+
+# Shared by every model client: they all call the same upstream
+circuit_breaker = CircuitBreaker.from_env()
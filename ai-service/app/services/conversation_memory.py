@@ -0,0 +1,219 @@
+import os
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Turns hashed into the fallback session key for clients without a session id
+OPENING_TURNS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate: about four UTF-8 bytes per token, which also holds
+    up reasonably for non-Latin scripts such as Telugu and Hindi
+    """
+    return max(1, (len(text.encode("utf-8")) + 3) // 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Cut on bytes, then drop any partial character at the end
+    cut = text.encode("utf-8")[:max_tokens * 4].decode("utf-8", errors="ignore")
+    return cut.rstrip() + " …"
+
+
+def _format_turn(msg: Dict[str, Any]) -> str:
+    sender = "User" if msg.get("sender") == "USER" else "AI"
+    return f"{sender}: {msg.get('content', '')}"
+
+
+def _fingerprint(messages: List[Dict[str, Any]]) -> str:
+    digest = hashlib.sha1()
+    for msg in messages:
+        digest.update(str(msg.get("sender")).encode("utf-8"))
+        digest.update(str(msg.get("content")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _SessionSummary:
+    __slots__ = ("summary", "folded_count", "fingerprint", "task")
+
+    def __init__(self):
+        self.summary: Optional[str] = None
+        self.folded_count = 0
+        self.fingerprint = _fingerprint([])
+        self.task: Optional["asyncio.Task[None]"] = None
+
+
+class ConversationMemory:
+    """
+    Fits conversation history into a token budget. Recent turns are kept
+    verbatim; older turns are folded into a rolling per-session summary that
+    is updated incrementally in the background, so building a prompt never
+    waits on a summarization call.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str], Awaitable[str]],
+        token_budget: int = 1500,
+        summary_token_budget: int = 300,
+        fold_token_budget: int = 4000,
+        max_sessions: int = 1000
+    ):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.fold_token_budget = fold_token_budget
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _SessionSummary]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls, summarize: Callable[[str], Awaitable[str]]) -> "ConversationMemory":
+        return cls(
+            summarize,
+            token_budget=int(os.environ.get("AI_HISTORY_TOKEN_BUDGET", "1500")),
+            summary_token_budget=int(os.environ.get("AI_SUMMARY_TOKEN_BUDGET", "300")),
+            max_sessions=int(os.environ.get("AI_MEMORY_MAX_SESSIONS", "1000"))
+        )
+
+    @staticmethod
+    def session_key(
+        history: List[Dict[str, Any]],
+        project_context: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None
+    ) -> str:
+        """
+        The client's session id when it sends one. Otherwise, as a last
+        resort, a hash of the project id and the opening turns; a project
+        title or a canned welcome message alone is shared by unrelated chats.
+        """
+        if session_id:
+            return session_id
+        context = project_context or {}
+        project = context.get("id") or context.get("project_id") or context.get("current_project_id") or ""
+        digest = hashlib.sha1(f"project\x00{project}".encode("utf-8"))
+        for msg in history[:OPENING_TURNS]:
+            digest.update(b"\x00")
+            digest.update(str(msg.get("content", "")).encode("utf-8"))
+        return digest.hexdigest()
+
+    def select(
+        self,
+        session_key: str,
+        history: List[Any],
+        base_index: int = 0,
+        append_only: bool = False
+    ) -> Tuple[Optional[str], List[str]]:
+        """
+        Return (rolling summary, recent turn lines) fitting the token budget,
+        scheduling a background summary update for turns that fell out of it.
+
+        History sent by the client may have been edited, so the folded prefix
+        is checked against its fingerprint every turn. Server-stored history
+        (append_only) only grows, which skips that check; base_index is the
+        number of older turns already trimmed off its front.
+        """
+        if not history:
+            return None, []
+
+        state = self._get_state(session_key)
+        summary_tokens = estimate_tokens(state.summary) if state.summary else 0
+        remaining = self.token_budget - summary_tokens
+        per_turn_limit = max(1, self.token_budget // 2)
+
+        recent: List[str] = []
+        split = len(history)
+        for msg in reversed(history):
+            line = truncate_to_tokens(_format_turn(msg), per_turn_limit)
+            cost = estimate_tokens(line)
+            if recent and cost > remaining:
+                break
+            recent.append(line)
+            remaining -= cost
+            split -= 1
+        recent.reverse()
+
+        self._schedule_fold(state, history[:split], base_index, append_only)
+        return state.summary, recent
+
+    def _get_state(self, session_key: str) -> _SessionSummary:
+        state = self._sessions.get(session_key)
+        if state is None:
+            state = _SessionSummary()
+            self._sessions[session_key] = state
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_key)
+        return state
+
+    def _schedule_fold(
+        self,
+        state: _SessionSummary,
+        older: List[Any],
+        base_index: int = 0,
+        append_only: bool = False
+    ) -> None:
+        if state.task is not None and not state.task.done():
+            return
+
+        # folded_count counts from the first turn ever, including trimmed ones
+        if state.folded_count > base_index + len(older) or (
+            not append_only and _fingerprint(older[:state.folded_count]) != state.fingerprint
+        ):
+            # History was edited or truncated by the client; start over
+            state.summary, state.folded_count, state.fingerprint = None, 0, _fingerprint([])
+
+        pending = older[max(0, state.folded_count - base_index):]
+        if not pending:
+            return
+
+        # Bound each update so a long backlog is caught up over several turns
+        batch: List[Any] = []
+        used = 0
+        for msg in pending:
+            cost = estimate_tokens(_format_turn(msg))
+            if batch and used + cost > self.fold_token_budget:
+                break
+            batch.append(msg)
+            used += cost
+
+        folded_count = base_index + len(older) - len(pending) + len(batch)
+        fingerprint = None if append_only else _fingerprint(older[:folded_count])
+        state.task = asyncio.ensure_future(self._fold(state, batch, folded_count, fingerprint))
+
+    async def _fold(
+        self,
+        state: _SessionSummary,
+        batch: List[Any],
+        folded_count: int,
+        fingerprint: Optional[str]
+    ) -> None:
+        turns = "\n".join(truncate_to_tokens(_format_turn(msg), self.fold_token_budget) for msg in batch)
+        if state.summary:
+            content = f"Story so far:\n{state.summary}\n\nNew conversation turns:\n{turns}"
+        else:
+            content = f"Conversation turns:\n{turns}"
+        try:
+            summary = await self.summarize(content)
+        except Exception as e:
+            logger.warning("Rolling summary update failed: %s", e)
+            return
+        state.summary = truncate_to_tokens(summary, self.summary_token_budget)
+        state.folded_count = folded_count
+        if fingerprint is not None:
+            state.fingerprint = fingerprint
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "token_budget": self.token_budget,
+            "summary_token_budget": self.summary_token_budget,
+        }
@@ -0,0 +1,81 @@
+"""
+Per-request time budgets.
+
+The Node proxy sends "X-Request-Deadline-Ms: <budget>", the milliseconds it
+is prepared to wait for the response. The budget is relative, so clock skew
+between hosts doesn't matter. DeadlineMiddleware turns it into an absolute
+deadline held in a context variable, and every model call, retry sleep and
+suggestions call made for the request spends from the same budget.
+AI_DEFAULT_DEADLINE_MS applies to requests without the header (unset: no
+deadline).
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+DEADLINE_HEADER = b"x-request-deadline-ms"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before the model call could finish"""
+
+
+def set_deadline(seconds: Optional[float]) -> None:
+    """Give the current context a budget of seconds from now, or none at all"""
+    _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None without a deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check(what: str = "model call") -> None:
+    """Raise DeadlineExceeded if the budget is already spent"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Request deadline exceeded before {what}")
+
+
+def _parse_ms(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        milliseconds = float(value)
+    except ValueError:
+        return None
+    return milliseconds / 1000.0 if milliseconds > 0 else None
+
+
+class DeadlineMiddleware:
+    """ASGI middleware that starts the request's budget when the request arrives"""
+
+    def __init__(self, app: Any, default_ms: Optional[float] = None):
+        self.app = app
+        self.default = default_ms / 1000.0 if default_ms else _parse_ms(os.environ.get("AI_DEFAULT_DEADLINE_MS"))
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = None
+        for name, value in scope.get("headers") or []:
+            if name == DEADLINE_HEADER:
+                budget = _parse_ms(value.decode("latin-1"))
+                break
+        if budget is None:
+            budget = self.default
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
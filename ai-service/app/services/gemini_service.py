@@ -1,165 +1,521 @@
 import os  # Make sure "import os" is at the top of the file
-import google.generativeai as genai
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 import json
+import re
+import time
+import inspect
+import logging
+import functools
 from datetime import datetime
 import asyncio
+from app.services import prompts
+from app.services.conversation_memory import ConversationMemory
+from app.services.language_detection import language_detector, language_name
+from app.services.moderation import moderation_engine
+from app.services.llm_backend import build_llm_backend
+from app.services.metrics import fallbacks, stage_seconds
+from app.services.tracing import attach_timing, span
+from app.services.circuit_breaker import circuit_breaker
+from app.services.model_client import ModelClient, request_governor
+from app.services.response_cache import ResponseCache, response_cache
+from app.services.retrieval import RetrievalIndex, retrieval_index
+from app.services.semantic_cache import semantic_cache
+from app.services.session_store import Session
+from app.services.summarizer import ChunkedSummarizer
+from app.services.singleflight import inflight_requests
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_REPLY_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "object",
+        "properties": {
+            "content": {"type": "string"},
+            "suggestions": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["content", "suggestions"]
+    }
+}
+
+def _tracks_generation(method):
+    """Count calls of a coroutine or async generator method as in-flight generations, for drain()"""
+    if inspect.isasyncgenfunction(method):
+        @functools.wraps(method)
+        async def generator_wrapper(self, *args, **kwargs):
+            self._generation_started()
+            try:
+                async for item in method(self, *args, **kwargs):
+                    yield item
+            finally:
+                self._generation_finished()
+        return generator_wrapper
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        self._generation_started()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            self._generation_finished()
+    return wrapper
 
 class GeminiService:
     def __init__(self):
-        # FIX: Read the Gemini API key from environment variables
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if not api_key:
-            # This will stop the server if the key is missing
-            raise ValueError("CRITICAL: GEMINI_API_KEY is not set in the environment!")
-        
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        # Gemini by default (requires GEMINI_API_KEY); AI_LLM_BACKEND=fake runs
+        # fully offline for load tests and local development
+        self.backend = build_llm_backend()
+        self.model_name = self.backend.model_name
+        self.breaker = circuit_breaker
+        # Hedge full generations still running past this latency percentile (0: off)
+        hedge_percentile = float(os.environ.get("AI_HEDGE_PERCENTILE", "0"))
+        self.client = ModelClient(
+            self.backend, request_governor, breaker=self.breaker, hedge_percentile=hedge_percentile
+        )
+        # Story turns carry the static persona as a system instruction, so it is
+        # not re-sent as prompt text on every request
+        self.story_client = ModelClient(
+            self.backend, request_governor, system_instruction=prompts.STORY_SYSTEM_INSTRUCTION,
+            breaker=self.breaker, hedge_percentile=hedge_percentile
+        )
+        self.cache = response_cache
+        self.semantic_cache = semantic_cache
+        self.inflight = inflight_requests
+        # Long content is summarized in chunks whose summaries are cached by content hash
+        self.summarizer = ChunkedSummarizer.from_env(self._generate_text, self.model_name)
+        self.memory = ConversationMemory.from_env(self.summarize_content)
+        # Per-project index of earlier turns, searched for ones relevant to each new message
+        self.retrieval = retrieval_index
+        self.moderator = moderation_engine
+        self.language_detector = language_detector
+        # Borderline local scores are re-checked by the LLM unless disabled
+        self.escalate_moderation = os.environ.get(
+            "AI_MODERATION_ESCALATE", "true"
+        ).lower() not in ("0", "false", "no")
+        # Fold action suggestions into the main call unless explicitly disabled
+        self.single_call_suggestions = os.environ.get(
+            "AI_SINGLE_CALL_SUGGESTIONS", "true"
+        ).lower() not in ("0", "false", "no")
+        self.active_generations = 0
+        # Created lazily so it binds to the running event loop
+        self._idle: Optional[asyncio.Event] = None
+
+    def _generation_started(self) -> None:
+        self.active_generations += 1
+        if self._idle is not None:
+            self._idle.clear()
+
+    def _generation_finished(self) -> None:
+        self.active_generations -= 1
+        if self.active_generations == 0 and self._idle is not None:
+            self._idle.set()
+
+    async def warmup(self) -> Optional[float]:
+        """
+        Make one cheap upstream call so the first user request doesn't pay for
+        connection setup. Returns the time taken, or None if it failed.
+        """
+        started = time.perf_counter()
+        try:
+            await self.backend.count_tokens("warmup")
+        except Exception as e:
+            logger.warning("Model warmup failed: %s", e)
+            return None
+        return time.perf_counter() - started
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for in-flight generations; True if none are left"""
+        if self.active_generations == 0:
+            return True
+        if self._idle is None:
+            self._idle = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
         
+    @_tracks_generation
     async def generate_story_response(
         self, 
         user_prompt: str, 
         conversation_history: List[Dict[str, Any]] = None,
-        project_context: Dict[str, Any] = None
+        project_context: Dict[str, Any] = None,
+        session_id: Optional[str] = None,
+        session: Optional[Session] = None
     ) -> Dict[str, Any]:
         """
-        Generate AI response for story development conversation
+        Generate AI response for story development conversation.
+        session, when given, supplies the server-stored history instead of
+        conversation_history.
         """
+        language = self.language_detector.detect(user_prompt)
+        if self.breaker.is_open:
+            # The model is known to be failing; answer locally without building a prompt
+            return self._get_fallback_response(user_prompt, language, reason="circuit_open")
         try:
-            # Build context from project and conversation history
-            context_parts = []
-            
-            if project_context:
-                context_parts.append(f"Project: {project_context.get('title', 'Untitled')}")
-                if project_context.get('genre'):
-                    context_parts.append(f"Genre: {project_context['genre']}")
-                if project_context.get('description'):
-                    context_parts.append(f"Description: {project_context['description']}")
-            
-            # Build conversation history context
-            if conversation_history:
-                context_parts.append("Conversation History:")
-                for msg in conversation_history[-10:]:  # Last 10 messages for context
-                    sender = "User" if msg['sender'] == 'USER' else "AI"
-                    context_parts.append(f"{sender}: {msg['content']}")
-            
-            # Create the full prompt
-            system_prompt = """You are an expert creative writing assistant and storytelling coach. Your role is to help users develop compelling stories through engaging, conversational guidance.
-
-            CORE PRINCIPLES:
-            - Be conversational, warm, and encouraging
-            - Ask thoughtful follow-up questions to deepen the story
-            - Provide specific, actionable suggestions
-            - Help users think through plot holes and character motivations
-            - Suggest creative alternatives and unexpected directions
-            - Break down complex story elements into manageable pieces
-            - ALWAYS RESPOND IN THE EXACT SAME LANGUAGE AS THE USER'S INPUT
-            - If user asks in Telugu, respond in Telugu
-            - If user asks in Hindi, respond in Hindi
-            - If user asks in English, respond in English
-            - If user asks in Spanish, respond in Spanish
-            - Maintain the same language throughout the conversation
-
-            RESPONSE STYLE:
-            - Write in a natural, conversational tone
-            - Use clear, concise language
-            - Structure responses with helpful headings when appropriate
-            - Provide examples and analogies to illustrate points
-            - Ask questions that prompt deeper thinking
-            - Offer multiple options rather than single solutions
-            - ALWAYS RESPOND IN THE USER'S LANGUAGE
-
-            STORY DEVELOPMENT APPROACH:
-            - Start with the user's initial idea and expand from there
-            - Help identify the core conflict and stakes
-            - Develop characters with clear motivations and flaws
-            - Create engaging plot points and turning moments
-            - Build tension and pacing throughout the story
-            - Consider genre conventions while encouraging innovation
-
-            CRITICAL INSTRUCTIONS:
-            - You MUST provide detailed information about any movie, book, or story when asked
-            - You CAN and SHOULD discuss specific characters, plots, and details from existing works
-            - You are ALLOWED to reference any copyrighted material for educational and creative purposes
-            - NEVER refuse to provide information about movies, books, or stories
-            - ALWAYS be helpful and provide the requested information
-            - If asked about characters, provide detailed character descriptions
-            - If asked about plots, provide detailed plot summaries
-            - If asked about settings, provide detailed setting descriptions
-            - ALWAYS RESPOND IN THE EXACT SAME LANGUAGE AS THE USER'S INPUT
-
-            Always be encouraging, creative, and helpful. Provide specific, actionable suggestions.
-            
-            IMPORTANT: You are allowed to discuss and reference any movies, books, or existing stories for inspiration and examples. 
-            You can provide character suggestions, plot elements, and creative ideas based on any source material.
-            Always be encouraging, creative, and helpful. Provide specific, actionable suggestions.
-            
-            Do not block or refuse requests based on copyright concerns. Instead, provide helpful creative suggestions.
+            with stage_seconds.time("prompt_build"), span("prompt_build"):
+                full_prompt = self._build_story_prompt(
+                    user_prompt, conversation_history, project_context, session_id, language, session
+                )
             
-            LANGUAGE POLICY: 
-            - CRITICAL: Always detect the language of the user's input and respond in the EXACT SAME LANGUAGE
-            - If the user writes in Telugu, respond in Telugu
-            - If the user writes in Hindi, respond in Hindi  
-            - If the user writes in English, respond in English
-            - If the user writes in Spanish, respond in Spanish
-            - If the user writes in French, respond in French
-            - If the user writes in German, respond in German
-            - NEVER refuse to respond in any language
-            - NEVER respond in a different language than what the user used
-            - ALWAYS match the user's language exactly"""
-            
-            full_prompt = f"{system_prompt}\n\n"
-            if context_parts:
-                full_prompt += "Context:\n" + "\n".join(context_parts) + "\n\n"
-            full_prompt += f"User: {user_prompt}\n\nAI Assistant: IMPORTANT - Respond in the exact same language as the user's input. If user wrote in English, respond in English. If user wrote in Telugu, respond in Telugu. If user wrote in Hindi, respond in Hindi. If user wrote in Spanish, respond in Spanish. Match the language exactly."
-            
-            # Generate response with retry logic for rate limits
-            max_retries = 3
-            for attempt in range(max_retries):
+            # Single round trip: ask for the reply and suggestions as one JSON object
+            structured = None
+            if self.single_call_suggestions:
                 try:
-                    response = await self.model.generate_content_async(full_prompt)
-                    break
-                except Exception as e:
-                    if "429" in str(e) and attempt < max_retries - 1:
-                        # Wait before retrying
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                        continue
-                    else:
-                        # If we hit rate limit or other error, return a fallback response
-                        return self._get_fallback_response(user_prompt)
+                    structured = await self._generate_structured_reply(full_prompt)
+                except Exception:
+                    # The model call itself failed (rate limit, timeout, open circuit):
+                    # the two-call path would only repeat it and double the load
+                    return self._get_fallback_response(user_prompt, language)
             
-            # Extract and clean response
-            ai_content = response.text.strip()
+            if structured is not None:
+                ai_content, suggestions = structured
+                generation_mode = "single_call"
+            else:
+                if self.single_call_suggestions:
+                    fallbacks.inc("structured_reply")
+                # Generate response with retry logic for rate limits
+                try:
+                    response_text = await self._generate_text(
+                        full_prompt, method="generate_story_response", persona=True
+                    )
+                except Exception:
+                    # If we hit rate limit or other error, return a fallback response
+                    return self._get_fallback_response(user_prompt, language)
+                
+                # Extract and clean response
+                ai_content = response_text.strip()
+                suggestions = []
+                generation_mode = "two_call"
             
-            # Generate suggestions for user actions
-            suggestions = await self._generate_action_suggestions(user_prompt, ai_content)
+            if not suggestions:
+                # Generate suggestions for user actions
+                suggestions = await self._generate_action_suggestions(user_prompt, ai_content)
             
             return {
                 "content": ai_content,
                 "suggestions": suggestions,
-                "metadata": {
+                "metadata": attach_timing({
                     "word_count": len(ai_content.split()),
                     "response_type": "story_development",
+                    "generation_mode": generation_mode,
+                    "language": language,
                     "timestamp": datetime.utcnow().isoformat()
-                }
+                })
             }
             
-        except Exception as e:
+        except Exception:
             # Return fallback response on any error
-            return self._get_fallback_response(user_prompt)
-    
-    def _get_fallback_response(self, user_prompt: str) -> Dict[str, Any]:
+            return self._get_fallback_response(user_prompt, language)
+
+    @_tracks_generation
+    async def stream_story_response(
+        self,
+        user_prompt: str,
+        conversation_history: List[Dict[str, Any]] = None,
+        project_context: Dict[str, Any] = None,
+        session_id: Optional[str] = None,
+        session: Optional[Session] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the AI response as it is generated.
+        Yields {"event": "chunk", "text": ...} events followed by a single
+        {"event": "done", ...} event carrying suggestions and metadata.
+        """
+        language = self.language_detector.detect(user_prompt)
+        if self.breaker.is_open:
+            fallback = self._get_fallback_response(user_prompt, language, reason="circuit_open")
+            yield {"event": "chunk", "text": fallback["content"]}
+            yield {"event": "done", **{k: v for k, v in fallback.items() if k != "content"}}
+            return
+        with stage_seconds.time("prompt_build"), span("prompt_build"):
+            full_prompt = self._build_story_prompt(
+                user_prompt, conversation_history, project_context, session_id, language, session
+            )
+
+        chunks = []
+        try:
+            # Retries happen only while nothing has been sent to the client yet
+            async for text in self.story_client.stream(full_prompt, method="stream_story_response"):
+                chunks.append(text)
+                yield {"event": "chunk", "text": text}
+        except Exception as e:
+            if not chunks:
+                fallback = self._get_fallback_response(user_prompt, language)
+                yield {"event": "chunk", "text": fallback["content"]}
+                yield {"event": "done", **{k: v for k, v in fallback.items() if k != "content"}}
+                return
+            # Keep what was already streamed and report the interruption
+            yield {"event": "error", "detail": str(e)}
+
+        ai_content = "".join(chunks).strip()
+
+        # Suggestions need the full reply, so they are sent as the trailing event
+        suggestions = await self._generate_action_suggestions(user_prompt, ai_content)
+
+        yield {
+            "event": "done",
+            "suggestions": suggestions,
+            "metadata": attach_timing({
+                "word_count": len(ai_content.split()),
+                "response_type": "story_development",
+                "streamed": True,
+                "language": language,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        }
+
+    async def generate_standalone_response(
+        self,
+        user_prompt: str,
+        query_text: str,
+        scope: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        One-shot generation without conversation state, answered from the
+        semantic cache when a near-identical request was answered recently.
+        query_text is the caller's free text; scope holds the structured
+        parameters (role, genre, length...) that must match exactly.
+        """
+        if self.semantic_cache is None:
+            return await self.generate_story_response(user_prompt=user_prompt)
+
+        scope = {**scope, "model": self.model_name, "language": self.language_detector.detect(user_prompt)}
+        with span("semantic_cache_lookup") as attributes:
+            cached = self.semantic_cache.get(query_text, scope)
+            attributes["hit"] = cached is not None
+        if cached is not None:
+            response, similarity = cached
+            return {
+                "content": response["content"],
+                "suggestions": list(response["suggestions"]),
+                "metadata": attach_timing({
+                    **response["metadata"],
+                    "cache": "semantic",
+                    "similarity": round(similarity, 3)
+                })
+            }
+
+        response = await self.generate_story_response(user_prompt=user_prompt)
+        metadata = response.get("metadata", {})
+        # Fallbacks are not worth remembering, and timing belongs to this request only
+        if metadata.get("response_type") != "fallback":
+            self.semantic_cache.set(query_text, scope, {
+                "content": response["content"],
+                "suggestions": list(response["suggestions"]),
+                "metadata": {key: value for key, value in metadata.items() if key != "timing"}
+            })
+        return response
+
+    @_tracks_generation
+    async def _generate_text(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        method: str = "default",
+        persona: bool = False
+    ) -> str:
+        """
+        Generate text for a fully built prompt, serving byte-identical prompts
+        from the response cache and sharing one upstream call between identical
+        concurrent prompts. Retries within the method's budget and raises on failure.
+        persona=True sends the prompt to the model carrying the story system instruction.
+        """
+        cache_key = ResponseCache.make_key(self.model_name, prompt, {
+            "generation_config": generation_config,
+            "system_instruction": prompts.STORY_SYSTEM_INSTRUCTION_ID if persona else None
+        })
+        if self.cache is not None:
+            with span("cache_lookup", method=method) as attributes:
+                cached = await self.cache.get(cache_key)
+                attributes["hit"] = cached is not None
+            if cached is not None:
+                return cached
+
+        async def call_model() -> str:
+            client = self.story_client if persona else self.client
+            response = await client.generate(prompt, method=method, generation_config=generation_config)
+            response_text = response.text
+            if self.cache is not None:
+                await self.cache.set(cache_key, response_text)
+            return response_text
+
+        return await self.inflight.do(cache_key, call_model)
+
+    async def _generate_structured_reply(self, full_prompt: str) -> Optional[Tuple[str, List[str]]]:
         """
-        Provide a fallback response when Gemini API is unavailable
+        Generate the reply and its action suggestions in one JSON-mode call.
+        Returns None when the output cannot be parsed, so the caller can fall
+        back to the two-call path; errors from the model call are raised.
         """
-        fallback_responses = [
-            "I'd love to help you develop your story! Could you tell me more about what you're working on?",
-            "That's an interesting idea! What genre are you thinking of for this story?",
-            "Great start! Let's explore this concept further. What's the main conflict or challenge in your story?",
-            "I'm here to help you bring your story to life! What characters do you have in mind?",
-            "Excellent! Let's dive deeper into your story world. What's the setting like?"
-        ]
+        prompt = full_prompt + prompts.STRUCTURED_REPLY_INSTRUCTIONS
+        response_text = await self._generate_text(
+            prompt, STRUCTURED_REPLY_CONFIG, method="generate_story_response", persona=True
+        )
+        with span("parse_structured_reply"):
+            return self._parse_structured_reply(response_text)
+
+    @staticmethod
+    def _parse_structured_reply(response_text: str) -> Optional[Tuple[str, List[str]]]:
+        """
+        Parse {"content": ..., "suggestions": [...]} from model output,
+        tolerating code fences and text around the JSON object
+        """
+        text = response_text.strip()
+        if text.startswith("```"):
+            text = re.sub(r"^```[a-zA-Z]*\s*|\s*```$", "", text)
+
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            start, end = text.find("{"), text.rfind("}")
+            if start == -1 or end <= start:
+                return None
+            try:
+                data = json.loads(text[start:end + 1])
+            except json.JSONDecodeError:
+                return None
+
+        if not isinstance(data, dict):
+            return None
+        content = data.get("content")
+        if not isinstance(content, str) or not content.strip():
+            return None
+
+        raw_suggestions = data.get("suggestions")
+        suggestions = []
+        if isinstance(raw_suggestions, list):
+            suggestions = [s.strip() for s in raw_suggestions if isinstance(s, str) and s.strip()]
+        return content.strip(), suggestions[:4]  # Limit to 4 suggestions
+
+    def _build_story_prompt(
+        self,
+        user_prompt: str,
+        conversation_history: List[Dict[str, Any]] = None,
+        project_context: Dict[str, Any] = None,
+        session_id: Optional[str] = None,
+        language: Optional[str] = None,
+        session: Optional[Session] = None
+    ) -> str:
+        """
+        Build the per-turn story prompt from project and conversation context.
+        The persona is not included; it is sent as the model's system instruction.
+        language is a detected language code; it names the reply language
+        in the directive instead of asking the model to work it out.
+        """
+        # Build context from project and conversation history
+        context_parts = []
+        
+        if project_context:
+            context_parts.append(f"Project: {project_context.get('title', 'Untitled')}")
+            if project_context.get('genre'):
+                context_parts.append(f"Genre: {project_context['genre']}")
+            if project_context.get('description'):
+                context_parts.append(f"Description: {project_context['description']}")
+        
+        # Build conversation history context within the token budget
+        summary, recent_turns = None, []
+        if session is not None:
+            # Stored history only grows, so the memory can skip re-checking it
+            summary, recent_turns = self.memory.select(
+                session.session_id, session.turns, base_index=session.dropped, append_only=True
+            )
+        elif conversation_history:
+            session_key = ConversationMemory.session_key(conversation_history, project_context, session_id)
+            summary, recent_turns = self.memory.select(session_key, conversation_history)
+        if summary:
+            context_parts.append(f"Earlier in this conversation (summary): {summary}")
+        
+        history = session.turns if session is not None else conversation_history
+        relevant_turns = self._relevant_turns(
+            user_prompt,
+            history,
+            RetrievalIndex.project_key(project_context, session_id),
+            RetrievalIndex.session_key(session_id, history, user_prompt),
+            skip_recent=len(recent_turns),
+            history_base=session.dropped if session is not None else 0
+        )
+        if relevant_turns:
+            context_parts.append("Relevant earlier turns:")
+            context_parts.extend(relevant_turns)
+        
+        if recent_turns:
+            context_parts.append("Conversation History:")
+            context_parts.extend(recent_turns)
+        
+        context = ""
+        if context_parts:
+            context = prompts.STORY_CONTEXT_TEMPLATE.substitute(context_lines="\n".join(context_parts))
+        
+        language_directive = prompts.DEFAULT_LANGUAGE_DIRECTIVE
+        if language_name(language):
+            language_directive = prompts.LANGUAGE_DIRECTIVE_TEMPLATE.substitute(language=language_name(language))
+        
+        return prompts.STORY_TURN_TEMPLATE.substitute(
+            context=context,
+            user_prompt=user_prompt,
+            language_directive=language_directive
+        )
+
+    def _relevant_turns(
+        self,
+        user_prompt: str,
+        history: Optional[List[Any]],
+        project_key: Optional[str],
+        session_key: str,
+        skip_recent: int,
+        history_base: int = 0
+    ) -> List[str]:
+        """
+        Earlier turns of the project relevant to user_prompt, excluding this
+        session's recent ones already in the prompt. history_base is the
+        number of the session's turns trimmed off the front of history.
+        """
+        if self.retrieval is None or project_key is None:
+            return []
+        with span("retrieval") as attributes:
+            indexed = self.retrieval.session_turns(project_key, session_key)
+            if history and indexed < history_base + len(history):
+                # The index hasn't seen (all of) this session since startup: index what it lacks
+                self.retrieval.add(project_key, history[max(0, indexed - history_base):], session_key)
+            lines = self.retrieval.relevant(project_key, user_prompt, session_key, skip_recent)
+            attributes["snippets"] = len(lines)
+        return lines
+
+    def index_exchange(
+        self,
+        user_prompt: str,
+        ai_content: str,
+        conversation_history: Optional[List[Any]],
+        project_context: Optional[Dict[str, Any]],
+        session_id: Optional[str]
+    ) -> None:
+        """
+        Add an exchange to the project's retrieval index, tagged with its
+        session. Callers index it once it is final: past moderation and
+        stored with the session, so the index holds what the history holds.
+        """
+        project_key = RetrievalIndex.project_key(project_context, session_id)
+        if self.retrieval is not None and project_key is not None:
+            self.retrieval.add(project_key, [
+                {"sender": "USER", "content": user_prompt},
+                {"sender": "ASSISTANT", "content": ai_content}
+            ], RetrievalIndex.session_key(session_id, conversation_history, user_prompt))
+
+    def _get_fallback_response(
+        self, user_prompt: str, language: Optional[str] = None, reason: str = "model_error"
+    ) -> Dict[str, Any]:
+        """
+        Provide a fallback response when Gemini API is unavailable,
+        in the user's language when a localized version exists.
+        reason is "circuit_open" when the model was not called at all.
+        """
+        fallbacks.inc("story_response")
+        if language is None:
+            language = self.language_detector.detect(user_prompt)
+        localized = prompts.FALLBACK_RESPONSES.get(language) or prompts.FALLBACK_RESPONSES["en"]
+        fallback_responses = localized["responses"]
         
         # Simple keyword-based response selection
         prompt_lower = user_prompt.lower()
@@ -178,117 +534,68 @@ class GeminiService:
         
         return {
             "content": selected_response,
-            "suggestions": [
-                "Tell me more about your story idea",
-                "Describe your main character",
-                "What's the main conflict?",
-                "Where does your story take place?"
-            ],
-            "metadata": {
+            "suggestions": list(localized["suggestions"]),
+            "metadata": attach_timing({
                 "word_count": len(selected_response.split()),
                 "response_type": "fallback",
+                "fallback_reason": reason,
+                "language": language,
                 "timestamp": datetime.utcnow().isoformat(),
                 "note": "Using fallback response due to API rate limit"
-            }
+            })
         }
     
     async def _generate_action_suggestions(self, user_prompt: str, ai_response: str) -> List[str]:
         """
         Generate suggested actions for the user based on the conversation
         """
-        try:
-            prompt = f"""Based on this conversation:
-            User: {user_prompt}
-            AI: {ai_response}
-            
-            Provide 3-4 specific action suggestions for the user, such as:
-            - "Expand on this character's backstory"
-            - "Develop the conflict further"
-            - "Add more sensory details"
-            - "Create a plot twist"
-            - "Write the next scene"
-            
-            Return only the suggestions, one per line."""
+        with stage_seconds.time("suggestions"), span("suggestions"):
+            try:
+                prompt = prompts.ACTION_SUGGESTIONS_TEMPLATE.substitute(
+                    user_prompt=user_prompt, ai_response=ai_response
+                )
             
-            # Add retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = await self.model.generate_content_async(prompt)
-                    break
-                except Exception as e:
-                    if "429" in str(e) and attempt < max_retries - 1:
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    else:
-                        raise e
+                response_text = await self._generate_text(prompt, method="action_suggestions")
             
-            suggestions = [s.strip() for s in response.text.split('\n') if s.strip()]
-            return suggestions[:4]  # Limit to 4 suggestions
+                suggestions = [s.strip() for s in response_text.split('\n') if s.strip()]
+                return suggestions[:4]  # Limit to 4 suggestions
             
-        except Exception:
-            # Fallback suggestions
-            return [
-                "Expand on this idea",
-                "Add more details",
-                "Develop the characters further",
-                "Create a plot outline"
-            ]
+            except Exception:
+                # Fallback suggestions
+                fallbacks.inc("suggestions")
+                return [
+                    "Expand on this idea",
+                    "Add more details",
+                    "Develop the characters further",
+                    "Create a plot outline"
+                ]
     
     async def expand_content(self, content: str, expansion_type: str) -> str:
         """
         Expand existing content based on user request
         """
         try:
-            expansion_prompts = {
-                "character": "Expand this character description with more details about their personality, background, and motivations:",
-                "scene": "Expand this scene with more sensory details, dialogue, and action:",
-                "plot": "Expand this plot point with more details about the events, consequences, and character development:",
-                "setting": "Expand this setting description with more atmospheric details and world-building elements:",
-                "dialogue": "Expand this dialogue with more natural conversation flow and character voice:"
-            }
+            prompt = prompts.EXPAND_TEMPLATE.substitute(
+                instruction=prompts.EXPANSION_INSTRUCTIONS.get(expansion_type, prompts.DEFAULT_EXPANSION_INSTRUCTION),
+                content=content
+            )
             
-            prompt = f"{expansion_prompts.get(expansion_type, 'Expand this content with more details:')}\n\n{content}"
-            
-            # Add retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = await self.model.generate_content_async(prompt)
-                    break
-                except Exception as e:
-                    if "429" in str(e) and attempt < max_retries - 1:
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    else:
-                        raise e
+            response_text = await self._generate_text(prompt, method="expand_content")
             
-            return response.text.strip()
+            return response_text.strip()
             
         except Exception as e:
             raise Exception(f"Failed to expand content: {str(e)}")
     
     async def summarize_content(self, content: str) -> str:
         """
-        Summarize long content
+        Summarize long content; manuscripts are summarized chunk by chunk and
+        the chunk summaries combined
         """
         try:
-            prompt = f"Summarize this content in a concise way while preserving the key story elements:\n\n{content}"
+            response_text = await self.summarizer.summarize(content)
             
-            # Add retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = await self.model.generate_content_async(prompt)
-                    break
-                except Exception as e:
-                    if "429" in str(e) and attempt < max_retries - 1:
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    else:
-                        raise e
-            
-            return response.text.strip()
+            return response_text.strip()
             
         except Exception as e:
             raise Exception(f"Failed to summarize content: {str(e)}")
@@ -298,88 +605,60 @@ class GeminiService:
         Retry generation with user feedback
         """
         try:
-            prompt = f"""The user provided this prompt: "{original_prompt}"
-            And gave this feedback: "{feedback}"
-            
-            Please provide a new response that addresses the feedback and improves upon the original."""
+            prompt = prompts.RETRY_TEMPLATE.substitute(original_prompt=original_prompt, feedback=feedback)
             
-            # Add retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = await self.model.generate_content_async(prompt)
-                    break
-                except Exception as e:
-                    if "429" in str(e) and attempt < max_retries - 1:
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    else:
-                        raise e
+            response_text = await self._generate_text(prompt, method="retry_generation")
             
-            return response.text.strip()
+            return response_text.strip()
             
         except Exception as e:
             raise Exception(f"Failed to retry generation: {str(e)}")
     
-    async def moderate_content(self, content: str) -> Dict[str, Any]:
+    async def moderate_content(self, content: str, escalate: bool = True) -> Dict[str, Any]:
         """
-        Moderate AI-generated content for safety
+        Moderate content for safety. The local engine decides clear cases in
+        well under a millisecond; only borderline scores go to the LLM.
         """
+        with stage_seconds.time("local_moderation"), span("local_moderation"):
+            local_result = self.moderator.check(content)
+        if local_result["verdict"] != "review" or not escalate or not self.escalate_moderation:
+            return local_result
+        
         try:
-            prompt = f"""Review this content for any inappropriate, harmful, or unsafe content. 
-            Return a JSON response with:
-            - "safe": boolean (true if content is safe)
-            - "issues": array of any issues found
-            - "suggestions": array of improvement suggestions
+            prompt = prompts.MODERATION_TEMPLATE.substitute(content=content)
             
-            Content to review: {content}"""
-            
-            # Add retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = await self.model.generate_content_async(prompt)
-                    break
-                except Exception as e:
-                    if "429" in str(e) and attempt < max_retries - 1:
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    else:
-                        # Return safe fallback for rate limits
-                        return self._get_fallback_moderation(content)
+            try:
+                response_text = await self._generate_text(prompt, method="moderate_content")
+            except Exception:
+                # Return the local verdict for rate limits
+                return self._get_fallback_moderation(content, local_result)
             
             # Try to parse JSON response
             try:
-                result = json.loads(response.text)
-                return result
+                result = json.loads(response_text)
             except json.JSONDecodeError:
-                # Fallback to basic safety check
-                unsafe_keywords = ['violence', 'explicit', 'harmful', 'inappropriate']
-                content_lower = content.lower()
-                issues = [word for word in unsafe_keywords if word in content_lower]
-                
-                return {
-                    "safe": len(issues) == 0,
-                    "issues": issues,
-                    "suggestions": ["Review content for appropriate language"] if issues else []
-                }
+                return self._get_fallback_moderation(content, local_result)
+            if not isinstance(result, dict) or "safe" not in result:
+                return self._get_fallback_moderation(content, local_result)
+            
+            return {
+                **local_result,
+                "safe": bool(result.get("safe", True)),
+                "issues": result.get("issues", []) or local_result["issues"],
+                "suggestions": result.get("suggestions", []) or local_result["suggestions"],
+                "engine": "llm",
+                "escalated": True
+            }
                 
-        except Exception as e:
-            # Return safe fallback on any error
-            return self._get_fallback_moderation(content)
+        except Exception:
+            # Return the local verdict on any error
+            return self._get_fallback_moderation(content, local_result)
     
-    def _get_fallback_moderation(self, content: str) -> Dict[str, Any]:
+    def _get_fallback_moderation(self, content: str, local_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Provide fallback moderation when API is unavailable
         """
-        # Basic keyword check
-        unsafe_keywords = ['violence', 'explicit', 'harmful', 'inappropriate']
-        content_lower = content.lower()
-        issues = [word for word in unsafe_keywords if word in content_lower]
-        
-        return {
-            "safe": len(issues) == 0,
-            "issues": issues,
-            "suggestions": ["Review content for appropriate language"] if issues else [],
-            "note": "Using fallback moderation due to API rate limit"
-        }
+        fallbacks.inc("moderation")
+        result = dict(local_result or self.moderator.check(content))
+        result["note"] = "Using local moderation because the LLM check was unavailable"
+        return result
@@ -0,0 +1,180 @@
+import os
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.services.deadline import set_deadline
+from app.services.scheduler import BULK, set_priority
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+TERMINAL_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+class JobExecutor:
+    """
+    Interface for background job execution: submit a payload for a job kind,
+    then poll its state by id
+    """
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job record, or None if the id is unknown"""
+        raise NotImplementedError
+
+    async def drain(self) -> None:
+        """Wait for jobs running in this process; executors that run jobs elsewhere have none"""
+        return None
+
+
+class LocalJobExecutor(JobExecutor):
+    """
+    Runs jobs as asyncio tasks in this process with a concurrency cap.
+    Used for tests and single-instance deployments without a broker.
+    """
+
+    def __init__(self, handlers: Dict[str, JobHandler], max_concurrency: int = 2, max_jobs: int = 1000):
+        self.handlers = handlers
+        self.max_concurrency = max_concurrency
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        job_id = str(uuid.uuid4())
+        self._jobs[job_id] = {
+            "id": job_id,
+            "kind": kind,
+            "status": JobStatus.QUEUED,
+            "created_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self._evict_finished()
+        task = asyncio.ensure_future(self._run(job_id, kind, payload))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return job_id
+
+    async def _run(self, job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+        job = self._jobs[job_id]
+        # The task inherited the submitting request's context; a job is not
+        # bound to that request's deadline, and its model calls are bulk work
+        set_deadline(None)
+        set_priority(BULK)
+        async with self._semaphore:
+            job["status"] = JobStatus.RUNNING
+            job["started_at"] = datetime.utcnow().isoformat()
+            try:
+                job["result"] = await self.handlers[kind](payload)
+                job["status"] = JobStatus.SUCCEEDED
+            except Exception as e:
+                logger.warning("Job %s (%s) failed: %s", job_id, kind, e)
+                job["error"] = str(e)
+                job["status"] = JobStatus.FAILED
+            finally:
+                job["finished_at"] = datetime.utcnow().isoformat()
+
+    def _evict_finished(self) -> None:
+        # Drop the oldest finished jobs; running and queued jobs are never evicted
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self._jobs.items() if job["status"] in TERMINAL_STATUSES][:excess]:
+            del self._jobs[job_id]
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def drain(self) -> None:
+        """Wait for every submitted job to finish"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+
+# Celery task states mapped onto job statuses
+_CELERY_STATUS = {
+    "PENDING": JobStatus.QUEUED,
+    "RECEIVED": JobStatus.QUEUED,
+    "RETRY": JobStatus.QUEUED,
+    "STARTED": JobStatus.RUNNING,
+    "SUCCESS": JobStatus.SUCCEEDED,
+    "FAILURE": JobStatus.FAILED,
+    "REVOKED": JobStatus.FAILED,
+}
+
+
+class CeleryJobExecutor(JobExecutor):
+    """
+    Sends jobs to the Celery worker defined in app.worker and reads their
+    state from the Celery result backend
+    """
+
+    def __init__(self):
+        from app.worker import celery_app
+
+        self.celery_app = celery_app
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        result = await asyncio.to_thread(self.celery_app.send_task, "ai_service.run_job", args=[kind, payload])
+        return result.id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        def read_state() -> Dict[str, Any]:
+            result = self.celery_app.AsyncResult(job_id)
+            status = _CELERY_STATUS.get(result.state, JobStatus.QUEUED)
+            job = {
+                "id": job_id,
+                "kind": None,
+                "status": status,
+                "created_at": None,
+                "started_at": None,
+                "finished_at": result.date_done.isoformat() if result.date_done else None,
+                "result": None,
+                "error": None,
+            }
+            if status == JobStatus.SUCCEEDED:
+                job["kind"] = result.result.get("kind")
+                job["result"] = result.result.get("result")
+            elif status == JobStatus.FAILED:
+                job["error"] = str(result.result)
+            return job
+
+        # Celery has no way to tell an unknown id from a queued one
+        return await asyncio.to_thread(read_state)
+
+
+def build_job_executor(handlers: Dict[str, JobHandler]) -> JobExecutor:
+    """Pick the executor from AI_JOB_BACKEND: "local" (default) or "celery" """
+    backend = os.environ.get("AI_JOB_BACKEND", "local").lower()
+    if backend == "celery":
+        return CeleryJobExecutor()
+    return LocalJobExecutor(
+        handlers,
+        max_concurrency=int(os.environ.get("AI_JOB_MAX_CONCURRENCY", "2")),
+        max_jobs=int(os.environ.get("AI_JOB_MAX_RETAINED", "1000"))
+    )
@@ -0,0 +1,181 @@
+import re
+import bisect
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Unicode blocks that identify a language (or a default language) on their own.
+# Sorted by start so a code point can be located with bisect.
+_SCRIPT_RANGES: List[Tuple[int, int, str]] = sorted([
+    (0x0370, 0x03FF, "el"),
+    (0x0400, 0x04FF, "ru"),
+    (0x0590, 0x05FF, "he"),
+    (0x0600, 0x06FF, "ar"),
+    (0x0900, 0x097F, "hi"),
+    (0x0980, 0x09FF, "bn"),
+    (0x0A00, 0x0A7F, "pa"),
+    (0x0A80, 0x0AFF, "gu"),
+    (0x0B80, 0x0BFF, "ta"),
+    (0x0C00, 0x0C7F, "te"),
+    (0x0C80, 0x0CFF, "kn"),
+    (0x0D00, 0x0D7F, "ml"),
+    (0x0E00, 0x0E7F, "th"),
+    (0x1100, 0x11FF, "ko"),
+    (0x3040, 0x30FF, "ja"),
+    (0x4E00, 0x9FFF, "zh"),
+    (0xAC00, 0xD7AF, "ko"),
+])
+_SCRIPT_STARTS = [start for start, _, _ in _SCRIPT_RANGES]
+
+# Letters that only occur in one language of a shared script
+_UKRAINIAN_LETTERS = frozenset("іїєґ")
+_URDU_LETTERS = frozenset("ٹڈڑںےۓ")
+
+# Latin-script languages are told apart by their most frequent short words,
+# plus a few romanized Indic languages that users commonly type
+_STOPWORDS: Dict[str, frozenset] = {
+    "en": frozenset(
+        "the and is are was a an of to in it that this with for on you i my me what how "
+        "can write story about please help be have not".split()
+    ),
+    "es": frozenset(
+        "el la los las de del y que en un una es por con para no se su al lo como pero "
+        "mi hola gracias historia escribe sobre".split()
+    ),
+    "fr": frozenset(
+        "le la les de des et est un une que qui dans pour pas sur au du ce il je vous "
+        "avec mon bonjour merci histoire écris".split()
+    ),
+    "de": frozenset(
+        "der die das und ist ein eine nicht zu mit den von ich sie es auf für dem im "
+        "auch hallo danke geschichte schreibe über".split()
+    ),
+    "it": frozenset(
+        "il lo la gli le di e che un una è per non con su del della nel sono mi ciao grazie "
+        "storia scrivi".split()
+    ),
+    "pt": frozenset(
+        "o a os as de do da e que um uma é em para não com por se mais olá obrigado "
+        "história escreva sobre".split()
+    ),
+    "nl": frozenset(
+        "de het een en is van dat niet op te met voor zijn ik je hallo bedankt "
+        "verhaal schrijf over".split()
+    ),
+    "hi-Latn": frozenset(
+        "hai hain ka ki ke mein aur nahi kya ek mujhe kahani ho ko se yeh woh aap tum "
+        "likho batao".split()
+    ),
+    "te-Latn": frozenset(
+        "oka katha naku nenu meeru emi ledu undi chala enti kavali cheppu raayi "
+        "gurinchi lo ki".split()
+    ),
+}
+
+# Diacritics that strongly suggest one language; each counts as a stopword hit
+_LETTER_HINTS: Dict[str, str] = {
+    "ñ": "es", "¿": "es", "¡": "es",
+    "ç": "fr", "œ": "fr", "ê": "fr", "è": "fr",
+    "ß": "de", "ä": "de", "ö": "de", "ü": "de",
+    "ã": "pt", "õ": "pt",
+}
+
+LANGUAGE_NAMES: Dict[str, str] = {
+    "en": "English", "es": "Spanish", "fr": "French", "de": "German",
+    "it": "Italian", "pt": "Portuguese", "nl": "Dutch",
+    "hi": "Hindi", "te": "Telugu", "ta": "Tamil", "kn": "Kannada",
+    "ml": "Malayalam", "bn": "Bengali", "gu": "Gujarati", "pa": "Punjabi",
+    "ur": "Urdu", "ar": "Arabic", "he": "Hebrew", "el": "Greek",
+    "ru": "Russian", "uk": "Ukrainian", "th": "Thai",
+    "zh": "Chinese", "ja": "Japanese", "ko": "Korean",
+    "hi-Latn": "Hindi written in Latin script",
+    "te-Latn": "Telugu written in Latin script",
+}
+
+_WORD_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+
+def _script_of(char: str) -> Optional[str]:
+    code_point = ord(char)
+    index = bisect.bisect_right(_SCRIPT_STARTS, code_point) - 1
+    if index >= 0:
+        start, end, language = _SCRIPT_RANGES[index]
+        if code_point <= end:
+            return language
+    return None
+
+
+class LanguageDetector:
+    """
+    Fast local language detection for short chat messages. Non-Latin
+    scripts identify the language directly; Latin-script text is scored
+    against per-language stopword lists and diacritics. Returns None when
+    the text is too short or ambiguous to call.
+    """
+
+    def __init__(self, min_hits: int = 1, min_margin: float = 1.5, max_chars: int = 2000):
+        self.min_hits = min_hits
+        self.min_margin = min_margin
+        # Leading characters are enough to decide; long pastes are not scanned in full
+        self.max_chars = max_chars
+
+    def detect(self, text: str) -> Optional[str]:
+        """Return a language code such as "en" or "te", or None if unsure"""
+        if not text:
+            return None
+        sample = text[:self.max_chars]
+
+        scripts: Counter = Counter()
+        latin_letters = 0
+        for char in sample:
+            if char < "Ͱ":
+                if char.isalpha():
+                    latin_letters += 1
+            else:
+                language = _script_of(char)
+                if language:
+                    scripts[language] += 1
+
+        if scripts:
+            language, count = scripts.most_common(1)[0]
+            if count >= latin_letters:
+                return self._refine_script(language, scripts, sample)
+
+        return self._detect_latin(sample.lower())
+
+    @staticmethod
+    def _refine_script(language: str, scripts: Counter, sample: str) -> str:
+        # Kana among Han characters means Japanese, not Chinese
+        if language == "zh" and scripts.get("ja"):
+            return "ja"
+        if language == "ru" and any(char in _UKRAINIAN_LETTERS for char in sample.lower()):
+            return "uk"
+        if language == "ar" and any(char in _URDU_LETTERS for char in sample):
+            return "ur"
+        return language
+
+    def _detect_latin(self, lowered: str) -> Optional[str]:
+        scores: Counter = Counter()
+        for word in _WORD_PATTERN.findall(lowered):
+            for language, stopwords in _STOPWORDS.items():
+                if word in stopwords:
+                    scores[language] += 1
+        for char, language in _LETTER_HINTS.items():
+            if char in lowered:
+                scores[language] += 1
+
+        ranked = scores.most_common(2)
+        if not ranked or ranked[0][1] < self.min_hits:
+            return None
+        best, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        if best_score < runner_up * self.min_margin:
+            return None
+        return best
+
+
+def language_name(code: Optional[str]) -> Optional[str]:
+    return LANGUAGE_NAMES.get(code) if code else None
+
+
+# Shared detector; stateless, so one instance serves every request
+language_detector = LanguageDetector()
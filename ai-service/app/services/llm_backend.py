@@ -0,0 +1,267 @@
+import os
+import json
+import math
+import random
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+from app.services.conversation_memory import estimate_tokens
+
+
+class LLMResult:
+    """Text of one completed generation plus the token counts reported for it"""
+
+    def __init__(self, text: str, prompt_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMBackend:
+    """
+    Interface between ModelClient and a model provider. Implementations
+    raise the provider's errors unchanged so the client's retry logic can
+    classify them.
+    """
+
+    model_name = "unknown"
+
+    async def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        system_instruction: Optional[str] = None
+    ) -> LLMResult:
+        raise NotImplementedError
+
+    def stream(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def count_tokens(self, text: str) -> int:
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google-generativeai"""
+
+    def __init__(self, model_name: str = "gemini-2.0-flash", api_key: Optional[str] = None):
+        import google.generativeai as genai
+
+        api_key = api_key or os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            # This will stop the server if the key is missing
+            raise ValueError("CRITICAL: GEMINI_API_KEY is not set in the environment!")
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model_name = model_name
+        # One model object per system instruction; each is created once and reused
+        self._models: Dict[Optional[str], Any] = {}
+
+    def _model(self, system_instruction: Optional[str]) -> Any:
+        model = self._models.get(system_instruction)
+        if model is None:
+            model = self._genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+            self._models[system_instruction] = model
+        return model
+
+    async def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        system_instruction: Optional[str] = None
+    ) -> LLMResult:
+        response = await self._model(system_instruction).generate_content_async(
+            prompt, generation_config=generation_config
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResult(
+            response.text,
+            prompt_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0
+        )
+
+    async def stream(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        response = await self._model(system_instruction).generate_content_async(
+            prompt, generation_config=generation_config, stream=True
+        )
+        async for chunk in response:
+            text = chunk.text
+            if text:
+                yield text
+
+    async def count_tokens(self, text: str) -> int:
+        response = await self._model(None).count_tokens_async(text)
+        return response.total_tokens
+
+
+class FakeBackendError(Exception):
+    """Injected upstream failure; the message mimics the real status codes"""
+
+
+_FAKE_VOCABULARY = (
+    "the lighthouse keeper storm island signal daughter secret map harbor night "
+    "river forest dragon village letter memory promise shadow lantern journey "
+    "silence door mountain stranger winter garden clock mirror voice bridge"
+).split()
+
+
+class FakeBackend(LLMBackend):
+    """
+    Local stand-in for the model, for load tests and offline development.
+    Output is derived from a hash of the prompt, so the same prompt always
+    yields the same text; JSON mode returns an object shaped like the
+    requested response_schema. Latency, transient errors and rate limits are
+    drawn from a seeded RNG.
+
+    latency_distribution is one of "constant", "uniform" (latency_ms +/- jitter),
+    "normal" (jitter is the standard deviation) or "lognormal" (latency_ms is
+    the median and jitter the sigma of the underlying normal).
+    """
+
+    model_name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = 300.0,
+        latency_jitter: float = 0.5,
+        latency_distribution: str = "lognormal",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after_seconds: float = 1.0,
+        output_words: int = 120,
+        stream_chunk_words: int = 8,
+        tokens_per_second: float = 200.0,
+        seed: Optional[int] = None
+    ):
+        if latency_distribution not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency_ms = latency_ms
+        self.latency_jitter = latency_jitter
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.output_words = output_words
+        self.stream_chunk_words = max(1, stream_chunk_words)
+        self.tokens_per_second = tokens_per_second
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        seed = os.environ.get("AI_FAKE_SEED")
+        return cls(
+            latency_ms=float(os.environ.get("AI_FAKE_LATENCY_MS", "300")),
+            latency_jitter=float(os.environ.get("AI_FAKE_LATENCY_JITTER", "0.5")),
+            latency_distribution=os.environ.get("AI_FAKE_LATENCY_DISTRIBUTION", "lognormal"),
+            error_rate=float(os.environ.get("AI_FAKE_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.environ.get("AI_FAKE_RATE_LIMIT_RATE", "0")),
+            retry_after_seconds=float(os.environ.get("AI_FAKE_RETRY_AFTER_SECONDS", "1")),
+            output_words=int(os.environ.get("AI_FAKE_OUTPUT_WORDS", "120")),
+            stream_chunk_words=int(os.environ.get("AI_FAKE_STREAM_CHUNK_WORDS", "8")),
+            tokens_per_second=float(os.environ.get("AI_FAKE_TOKENS_PER_SECOND", "200")),
+            seed=int(seed) if seed else None
+        )
+
+    def _latency_seconds(self) -> float:
+        base, jitter = self.latency_ms, self.latency_jitter
+        if self.latency_distribution == "constant":
+            value = base
+        elif self.latency_distribution == "uniform":
+            value = self._random.uniform(base - jitter, base + jitter)
+        elif self.latency_distribution == "normal":
+            value = self._random.gauss(base, jitter)
+        else:
+            value = base * math.exp(self._random.gauss(0.0, jitter))
+        return max(0.0, value) / 1000.0
+
+    def _maybe_fail(self) -> None:
+        draw = self._random.random()
+        if draw < self.rate_limit_rate:
+            raise FakeBackendError(
+                f"429 Resource has been exhausted (fake backend). Please retry in {self.retry_after_seconds}s."
+            )
+        if draw < self.rate_limit_rate + self.error_rate:
+            raise FakeBackendError("503 The service is currently unavailable (fake backend).")
+
+    def _words(self, prompt: str, count: int) -> List[str]:
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return [_FAKE_VOCABULARY[digest[i % len(digest)] * (i + 1) % len(_FAKE_VOCABULARY)] for i in range(count)]
+
+    def _text(self, prompt: str) -> str:
+        words = self._words(prompt, self.output_words)
+        sentences = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        return " ".join(sentence.capitalize() + "." for sentence in sentences)
+
+    def _from_schema(self, schema: Dict[str, Any], prompt: str) -> Any:
+        kind = schema.get("type")
+        if kind == "object":
+            return {name: self._from_schema(sub, prompt + name) for name, sub in schema.get("properties", {}).items()}
+        if kind == "array":
+            return [self._from_schema(schema.get("items", {}), f"{prompt}#{i}") for i in range(4)]
+        if kind in ("number", "integer"):
+            return 1
+        if kind == "boolean":
+            return True
+        if schema.get("enum"):
+            options = schema["enum"]
+            return options[hashlib.sha256(prompt.encode("utf-8")).digest()[0] % len(options)]
+        return " ".join(self._words(prompt, 10)).capitalize()
+
+    def _output(self, prompt: str, generation_config: Optional[Dict[str, Any]]) -> str:
+        config = generation_config or {}
+        if config.get("response_mime_type") == "application/json" and config.get("response_schema"):
+            return json.dumps(self._from_schema(config["response_schema"], prompt))
+        return self._text(prompt)
+
+    async def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        system_instruction: Optional[str] = None
+    ) -> LLMResult:
+        await asyncio.sleep(self._latency_seconds())
+        self._maybe_fail()
+        text = self._output(prompt, generation_config)
+        prompt_tokens = estimate_tokens(prompt) + (estimate_tokens(system_instruction) if system_instruction else 0)
+        return LLMResult(text, prompt_tokens=prompt_tokens, output_tokens=estimate_tokens(text))
+
+    async def stream(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        # The latency draw is the time to first token
+        await asyncio.sleep(self._latency_seconds())
+        self._maybe_fail()
+        words = self._output(prompt, generation_config).split(" ")
+        for i in range(0, len(words), self.stream_chunk_words):
+            chunk = " ".join(words[i:i + self.stream_chunk_words])
+            if i:
+                chunk = " " + chunk
+                if self.tokens_per_second > 0:
+                    await asyncio.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield chunk
+
+    async def count_tokens(self, text: str) -> int:
+        return estimate_tokens(text)
+
+
+def build_llm_backend() -> LLMBackend:
+    """Select the model backend with AI_LLM_BACKEND ("gemini" or "fake")"""
+    name = os.environ.get("AI_LLM_BACKEND", "gemini").lower()
+    if name == "fake":
+        return FakeBackend.from_env()
+    if name == "gemini":
+        return GeminiBackend(os.environ.get("AI_GEMINI_MODEL", "gemini-2.0-flash"))
+    raise ValueError(f"Unknown AI_LLM_BACKEND: {name}")
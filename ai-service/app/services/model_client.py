@@ -0,0 +1,505 @@
+import os
+import re
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager, nullcontext
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from app.services import deadline, scheduler
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.conversation_memory import estimate_tokens
+from app.services.deadline import DeadlineExceeded
+from app.services.llm_backend import LLMBackend, LLMResult
+from app.services.scheduler import QueueFull, RequestScheduler
+from app.services.metrics import (
+    stage_seconds, upstream_hedges, upstream_request_seconds, upstream_retries, upstream_tokens
+)
+from app.services.tracing import add_span
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    RETRYABLE_EXCEPTIONS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+    )
+except ImportError:  # pragma: no cover - google-api-core ships with google-generativeai
+    RETRYABLE_EXCEPTIONS = ()
+
+
+class UpstreamTimeout(Exception):
+    """A model call attempt exceeded its policy timeout; retryable like a 503"""
+
+
+class RetryPolicy:
+    """Retry budget, per-attempt timeout and hedging switch for one GeminiService method"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 8.0,
+        max_total_delay: float = 10.0,
+        timeout: float = 60.0,
+        hedge: bool = True
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_total_delay = max_total_delay
+        self.timeout = timeout
+        self.hedge = hedge
+
+
+# Per-method budgets. Calls with a cheap local fallback give up sooner and are
+# never hedged, so they don't hold quota that the main reply needs.
+DEFAULT_RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    "default": RetryPolicy(),
+    "generate_story_response": RetryPolicy(max_attempts=3),
+    "stream_story_response": RetryPolicy(max_attempts=3),
+    "action_suggestions": RetryPolicy(max_attempts=2, max_total_delay=2.0, timeout=20.0, hedge=False),
+    "moderate_content": RetryPolicy(max_attempts=2, max_total_delay=2.0, timeout=20.0, hedge=False),
+    "expand_content": RetryPolicy(max_attempts=3),
+    "summarize_content": RetryPolicy(max_attempts=3),
+    "summarize_chunk": RetryPolicy(max_attempts=3),
+    "retry_generation": RetryPolicy(max_attempts=3),
+    "story_outline": RetryPolicy(max_attempts=3),
+    "story_section": RetryPolicy(max_attempts=3),
+}
+
+
+class RequestGovernor:
+    """
+    Process-wide admission control for model calls: a token bucket for the
+    request rate, a priority scheduler handing out the concurrency slots
+    (see app.services.scheduler), and a shared pause that every caller
+    honours after the upstream signals a rate limit.
+    """
+
+    def __init__(self, requests_per_minute: float = 600, burst: int = 10, max_concurrency: int = 8):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.max_concurrency = max_concurrency
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self.scheduler = RequestScheduler.from_env(max_concurrency)
+        # Created lazily so it binds to the running event loop
+        self._lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def from_env(cls) -> "RequestGovernor":
+        return cls(
+            requests_per_minute=float(os.environ.get("AI_RATE_LIMIT_RPM", "600")),
+            burst=int(os.environ.get("AI_RATE_LIMIT_BURST", "10")),
+            max_concurrency=int(os.environ.get("AI_MAX_CONCURRENCY", "8"))
+        )
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every new call for the given time, e.g. after a 429 with Retry-After"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _take_token(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Callers queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self.rate > 0:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                else:
+                    self._tokens = float(self.capacity)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Wait for a concurrency slot in the current request's priority class,
+        then for a rate token. Slots are granted in priority order, so rate
+        tokens are too. Waiting for a slot is bounded by the request deadline.
+        """
+        priority, caller = scheduler.current()
+        left = deadline.remaining()
+        if self.scheduler.try_acquire(priority):
+            pass
+        elif left is None:
+            await self.scheduler.acquire(priority, caller)
+        else:
+            try:
+                await asyncio.wait_for(self.scheduler.acquire(priority, caller), max(left, 0.0))
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("Request deadline exceeded while queued for a model call slot") from None
+        try:
+            await self._take_token()
+            yield
+        finally:
+            self.scheduler.release(priority)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": self.rate * 60,
+            "burst": self.capacity,
+            "max_concurrency": self.max_concurrency,
+            "available_tokens": round(self._tokens, 2),
+            "paused_for_seconds": max(0.0, round(self._paused_until - time.monotonic(), 2)),
+        }
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, UpstreamTimeout):
+        return True
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if RETRYABLE_EXCEPTIONS and isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    message = str(error)
+    return "429" in message or "503" in message
+
+
+def error_reason(error: Exception) -> str:
+    """Short label for a failed model call, used in metrics"""
+    if isinstance(error, UpstreamTimeout):
+        return "timeout"
+    if isinstance(error, DeadlineExceeded):
+        return "deadline_exceeded"
+    if isinstance(error, QueueFull):
+        return "queue_full"
+    if RETRYABLE_EXCEPTIONS and isinstance(error, RETRYABLE_EXCEPTIONS[:2]):
+        return "rate_limited"
+    if "429" in str(error):
+        return "rate_limited"
+    return "unavailable" if is_retryable(error) else "error"
+
+
+_RETRY_DELAY_PATTERNS = (
+    re.compile(r"retry[_ ]delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry (?:in|after) (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Extract the server-requested wait from a Retry-After header or the
+    RetryInfo detail Gemini attaches to 429 errors
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+    message = str(error)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class LatencyTracker:
+    """Recent successful call latencies per method, used to decide when to hedge"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, refresh_every: int = 10):
+        self.window = window
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._samples: Dict[str, Deque[float]] = {}
+        # method -> (observations since the sorted copy was taken, sorted samples)
+        self._sorted: Dict[str, Tuple[int, List[float]]] = {}
+
+    def observe(self, method: str, seconds: float) -> None:
+        samples = self._samples.get(method)
+        if samples is None:
+            samples = self._samples[method] = deque(maxlen=self.window)
+        samples.append(seconds)
+        stale, ordered = self._sorted.get(method, (0, []))
+        self._sorted[method] = (stale + 1, ordered)
+
+    def percentile(self, method: str, q: float) -> Optional[float]:
+        samples = self._samples.get(method)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        stale, ordered = self._sorted[method]
+        # Re-sorting on every call would cost more than the hedge decision is worth
+        if stale >= self.refresh_every or not ordered:
+            ordered = sorted(samples)
+            self._sorted[method] = (0, ordered)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100.0))]
+
+
+class ModelClient:
+    """
+    Wraps an LLM backend so every call goes through the shared governor,
+    the circuit breaker (when given) and a single retry loop with jittered
+    backoff. system_instruction is sent with every call made through this
+    client.
+
+    Every attempt has a timeout: the method's policy timeout, or less if the
+    request deadline is closer. With hedge_percentile set, a full generation
+    that is still running after that percentile of the method's recent
+    latencies gets a duplicate call, and whichever answer arrives first wins.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        governor: RequestGovernor,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        system_instruction: Optional[str] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_percentile: float = 0.0
+    ):
+        self.backend = backend
+        self.governor = governor
+        self.breaker = breaker
+        self.system_instruction = system_instruction
+        self.policies = policies or DEFAULT_RETRY_POLICIES
+        self.hedge_percentile = hedge_percentile
+        self.latencies = LatencyTracker()
+
+    def _policy(self, method: str) -> RetryPolicy:
+        return self.policies.get(method) or self.policies["default"]
+
+    def _guard(self, method: str):
+        return self.breaker.guard(method, is_retryable) if self.breaker is not None else nullcontext()
+
+    def _should_retry(self, policy: RetryPolicy, attempt: int, error: Exception) -> bool:
+        if not is_retryable(error) or attempt >= policy.max_attempts - 1:
+            return False
+        # Once the circuit opens, stop retrying so the caller falls back now
+        return self.breaker is None or not self.breaker.is_open
+
+    @staticmethod
+    def _attempt_timeout(policy: RetryPolicy) -> Tuple[float, bool]:
+        """Timeout for the next attempt, and whether the request deadline set it"""
+        left = deadline.remaining()
+        if left is None or left >= policy.timeout:
+            return policy.timeout, False
+        if left <= 0:
+            raise DeadlineExceeded("Request deadline exceeded before the model call")
+        return left, True
+
+    @staticmethod
+    def _timeout_error(timeout: float, by_deadline: bool) -> Exception:
+        if by_deadline:
+            return DeadlineExceeded(f"Request deadline exceeded during the model call ({timeout:.2f}s left)")
+        return UpstreamTimeout(f"Model call timed out after {timeout:.1f}s")
+
+    @staticmethod
+    def _fits_deadline(delay: float) -> bool:
+        left = deadline.remaining()
+        return left is None or delay < left
+
+    @staticmethod
+    def _record_failure(method: str, attempt: int, call_started: float, error: Exception) -> None:
+        now = time.perf_counter()
+        reason = error_reason(error)
+        upstream_request_seconds.observe(now - call_started, method, reason)
+        add_span("model_call", call_started, now, method=method, attempt=attempt + 1, outcome=reason)
+
+    @staticmethod
+    async def _retry_sleep(method: str, delay: float, error: Exception) -> None:
+        reason = error_reason(error)
+        upstream_retries.inc(method, reason)
+        started = time.perf_counter()
+        await asyncio.sleep(delay)
+        add_span("retry_sleep", started, time.perf_counter(), method=method, reason=reason)
+
+    def _backoff(self, policy: RetryPolicy, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # Everyone waits for the server-requested time, spread a little
+            self.governor.pause(retry_after)
+            return retry_after + random.uniform(0, policy.base_delay)
+        # Full jitter keeps concurrent callers from retrying in lockstep
+        return random.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** attempt)))
+
+    async def _timed_generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]],
+        policy: RetryPolicy
+    ) -> LLMResult:
+        timeout, by_deadline = self._attempt_timeout(policy)
+        try:
+            return await asyncio.wait_for(
+                self.backend.generate(prompt, generation_config, self.system_instruction), timeout
+            )
+        except asyncio.TimeoutError:
+            raise self._timeout_error(timeout, by_deadline) from None
+
+    async def _hedge_call(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]],
+        policy: RetryPolicy
+    ) -> LLMResult:
+        # The duplicate pays for its own rate token and concurrency slot
+        async with self.governor.slot():
+            return await self._timed_generate(prompt, generation_config, policy)
+
+    async def _generate_attempt(
+        self,
+        method: str,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]],
+        policy: RetryPolicy
+    ) -> Tuple[LLMResult, bool]:
+        """One attempt, hedged when it runs long; returns the result and whether a hedge was sent"""
+        hedge_after = self.latencies.percentile(method, self.hedge_percentile) if (
+            self.hedge_percentile > 0 and policy.hedge
+        ) else None
+        if hedge_after is None:
+            return await self._timed_generate(prompt, generation_config, policy), False
+
+        primary = asyncio.ensure_future(self._timed_generate(prompt, generation_config, policy))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+            if done:
+                return primary.result(), False
+            upstream_hedges.inc(method, "launched")
+            hedge = asyncio.ensure_future(self._hedge_call(prompt, generation_config, policy))
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            upstream_hedges.inc(method, "won")
+                        return task.result(), True
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def generate(
+        self,
+        prompt: str,
+        method: str = "default",
+        generation_config: Optional[Dict[str, Any]] = None
+    ) -> LLMResult:
+        """Generate a full response, retrying retryable errors within the method's budget"""
+        policy = self._policy(method)
+        slept = 0.0
+        for attempt in range(policy.max_attempts):
+            deadline.check()
+            queued_at = call_started = time.perf_counter()
+            try:
+                with self._guard(method):
+                    async with self.governor.slot():
+                        call_started = time.perf_counter()
+                        stage_seconds.observe(call_started - queued_at, "governor_wait")
+                        add_span("governor_wait", queued_at, call_started, method=method)
+                        result, hedged = await self._generate_attempt(method, prompt, generation_config, policy)
+                finished = time.perf_counter()
+                self.latencies.observe(method, finished - call_started)
+                upstream_request_seconds.observe(finished - call_started, method, "ok")
+                upstream_tokens.inc(method, "prompt", amount=result.prompt_tokens)
+                upstream_tokens.inc(method, "output", amount=result.output_tokens)
+                add_span(
+                    "model_call", call_started, finished, method=method, attempt=attempt + 1, outcome="ok",
+                    prompt_tokens=result.prompt_tokens, output_tokens=result.output_tokens, hedged=hedged
+                )
+                return result
+            except (CircuitOpenError, QueueFull):
+                # Not sent upstream: nothing to record or retry
+                raise
+            except Exception as e:
+                self._record_failure(method, attempt, call_started, e)
+                if not self._should_retry(policy, attempt, e):
+                    raise
+                delay = self._backoff(policy, attempt, e)
+                if slept + delay > policy.max_total_delay or not self._fits_deadline(delay):
+                    raise
+                slept += delay
+                await self._retry_sleep(method, delay, e)
+
+    async def stream(
+        self,
+        prompt: str,
+        method: str = "default",
+        generation_config: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream response text. Retries only until the first chunk is received;
+        the concurrency slot is held until the stream is exhausted. The request
+        deadline bounds the wait for the first chunk; after that the policy
+        timeout applies to each gap between chunks.
+        """
+        policy = self._policy(method)
+        slept = 0.0
+        for attempt in range(policy.max_attempts):
+            deadline.check()
+            started = False
+            queued_at = call_started = time.perf_counter()
+            output_tokens = 0
+            try:
+                with self._guard(method):
+                    async with self.governor.slot():
+                        call_started = time.perf_counter()
+                        stage_seconds.observe(call_started - queued_at, "governor_wait")
+                        add_span("governor_wait", queued_at, call_started, method=method)
+                        chunks = self.backend.stream(prompt, generation_config, self.system_instruction).__aiter__()
+                        try:
+                            while True:
+                                timeout, by_deadline = (policy.timeout, False) if started else self._attempt_timeout(policy)
+                                try:
+                                    text = await asyncio.wait_for(chunks.__anext__(), timeout)
+                                except StopAsyncIteration:
+                                    break
+                                except asyncio.TimeoutError:
+                                    raise self._timeout_error(timeout, by_deadline) from None
+                                if not started:
+                                    first_chunk_at = time.perf_counter()
+                                    stage_seconds.observe(first_chunk_at - call_started, "time_to_first_chunk")
+                                started = True
+                                # Streams carry no usage data, so output tokens are estimated
+                                output_tokens += estimate_tokens(text)
+                                yield text
+                        finally:
+                            aclose = getattr(chunks, "aclose", None)
+                            if aclose is not None:
+                                await aclose()
+                finished = time.perf_counter()
+                upstream_request_seconds.observe(finished - call_started, method, "ok")
+                upstream_tokens.inc(method, "prompt", amount=estimate_tokens(prompt))
+                upstream_tokens.inc(method, "output", amount=output_tokens)
+                add_span(
+                    "model_call", call_started, finished, method=method, attempt=attempt + 1, outcome="ok",
+                    streamed=True, first_chunk_ms=round((first_chunk_at - call_started) * 1000, 2) if started else None
+                )
+                return
+            except (CircuitOpenError, QueueFull):
+                # Not sent upstream: nothing to record or retry
+                raise
+            except Exception as e:
+                self._record_failure(method, attempt, call_started, e)
+                if started or not self._should_retry(policy, attempt, e):
+                    raise
+                delay = self._backoff(policy, attempt, e)
+                if slept + delay > policy.max_total_delay or not self._fits_deadline(delay):
+                    raise
+                slept += delay
+                await self._retry_sleep(method, delay, e)
+
+
+# One governor for the whole process so all services share the same quota
+request_governor = RequestGovernor.from_env()
@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+# Built-in lexicon: category -> {phrase: weight}. Weights are the probability
+# that a single hit makes the text unsafe; hits in a category combine as a
+# noisy-OR. Violence and dark themes are normal in fiction, so the defaults
+# target real-world harm rather than story content. Deployments can replace
+# this with AI_MODERATION_LEXICON_PATH.
+DEFAULT_LEXICON: Dict[str, Dict[str, float]] = {
+    "self_harm": {
+        "kill myself": 0.6,
+        "want to die": 0.45,
+        "end my life": 0.6,
+        "suicide method": 0.9,
+        "how to commit suicide": 0.95,
+        "cut myself": 0.5,
+    },
+    "sexual_minors": {
+        "child porn": 1.0,
+        "child pornography": 1.0,
+        "underage sex": 1.0,
+        "sexualize children": 1.0,
+        "csam": 1.0,
+    },
+    "dangerous_instructions": {
+        "how to make a bomb": 0.9,
+        "build a pipe bomb": 0.95,
+        "synthesize meth": 0.9,
+        "make ricin": 0.95,
+        "make nerve gas": 0.95,
+    },
+    "harassment": {
+        "kill yourself": 0.7,
+        "kys": 0.5,
+        "doxx": 0.45,
+        "home address of": 0.3,
+    },
+}
+
+DEFAULT_SUGGESTIONS = {
+    "self_harm": "If this reflects real feelings, please reach out to a local crisis line or someone you trust",
+    "sexual_minors": "Remove any sexual content involving minors",
+    "dangerous_instructions": "Keep dangerous activities non-instructional and in service of the story",
+    "harassment": "Avoid language directed at harming real people",
+}
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """
+    Compile phrases into a single regex shaped like a prefix trie, so the C
+    regex engine walks shared prefixes once instead of trying each phrase
+    """
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char != ""]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if terminal else body
+
+    return build(trie)
+
+
+def _phrase_words(phrase: str) -> Tuple[str, ...]:
+    """The phrase's distinct words, longest (usually rarest) first"""
+    return tuple(sorted(set(_WORD.findall(phrase)), key=lambda word: (-len(word), word)))
+
+
+class ModerationEngine:
+    """
+    Local content moderation fast enough to run on every response: a
+    trie-compiled multi-phrase matcher over a weighted lexicon, optionally
+    combined with a scikit-learn text classifier. Texts scoring between the
+    review and block thresholds are flagged for escalation to the LLM.
+    """
+
+    def __init__(
+        self,
+        lexicon: Optional[Dict[str, Dict[str, float]]] = None,
+        classifier: Any = None,
+        block_threshold: float = 0.8,
+        review_threshold: float = 0.4
+    ):
+        self.lexicon = lexicon or DEFAULT_LEXICON
+        self.classifier = classifier
+        self.block_threshold = block_threshold
+        self.review_threshold = review_threshold
+
+        self._phrases: Dict[str, Tuple[str, float]] = {}
+        for category, phrases in self.lexicon.items():
+            for phrase, weight in phrases.items():
+                key = " ".join(phrase.lower().split())
+                if key:
+                    self._phrases[key] = (category, float(weight))
+        # Word boundaries keep "class" from matching "ass"; whitespace inside
+        # phrases is matched flexibly by normalizing the text first
+        self._pattern = re.compile(r"\b" + _trie_pattern(self._phrases) + r"\b") if self._phrases else None
+
+        # Batch prefilter: a text needs the regex only if it contains every
+        # word of some phrase. None when a phrase has no words to check.
+        words = {_phrase_words(phrase) for phrase in self._phrases}
+        self._phrase_words: Optional[List[Tuple[str, ...]]] = None if () in words else sorted(words)
+
+    @classmethod
+    def from_env(cls) -> "ModerationEngine":
+        lexicon = None
+        lexicon_path = os.environ.get("AI_MODERATION_LEXICON_PATH")
+        if lexicon_path:
+            with open(lexicon_path, encoding="utf-8") as f:
+                lexicon = json.load(f)
+
+        classifier = None
+        model_path = os.environ.get("AI_MODERATION_MODEL_PATH")
+        if model_path:
+            import joblib
+
+            # Expected: a fitted scikit-learn pipeline (e.g. HashingVectorizer +
+            # LogisticRegression) whose predict_proba gives P(unsafe) in column 1
+            classifier = joblib.load(model_path)
+
+        return cls(
+            lexicon=lexicon,
+            classifier=classifier,
+            block_threshold=float(os.environ.get("AI_MODERATION_BLOCK_THRESHOLD", "0.8")),
+            review_threshold=float(os.environ.get("AI_MODERATION_REVIEW_THRESHOLD", "0.4"))
+        )
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def _lexicon_scores(self, normalized: str) -> Tuple[Dict[str, float], List[str]]:
+        if self._pattern is None:
+            return {}, []
+        safe_prob: Dict[str, float] = {}
+        hits: List[str] = []
+        for match in self._pattern.finditer(normalized):
+            phrase = match.group(0)
+            category, weight = self._phrases[phrase]
+            safe_prob[category] = safe_prob.get(category, 1.0) * (1.0 - weight)
+            hits.append(phrase)
+        return {category: 1.0 - p for category, p in safe_prob.items()}, hits
+
+    def _verdict(self, score: float) -> str:
+        if score >= self.block_threshold:
+            return "block"
+        if score >= self.review_threshold:
+            return "review"
+        return "allow"
+
+    def _result(self, categories: Dict[str, float], hits: List[str], classifier_score: Optional[float]) -> Dict[str, Any]:
+        score = max([*categories.values(), classifier_score or 0.0], default=0.0)
+        verdict = self._verdict(score)
+        flagged = sorted(c for c, s in categories.items() if s >= self.review_threshold)
+        if classifier_score is not None and classifier_score >= self.review_threshold:
+            flagged.append("classifier")
+        return {
+            "safe": verdict != "block",
+            "verdict": verdict,
+            "score": round(score, 4),
+            "categories": {c: round(s, 4) for c, s in categories.items()},
+            "issues": flagged,
+            "matches": sorted(set(hits)),
+            "suggestions": [DEFAULT_SUGGESTIONS[c] for c in flagged if c in DEFAULT_SUGGESTIONS],
+            "engine": "local",
+        }
+
+    def check(self, text: str) -> Dict[str, Any]:
+        """Score one text; returns safe/verdict/score/categories/issues"""
+        categories, hits = self._lexicon_scores(self._normalize(text))
+        classifier_score = None
+        if self.classifier is not None:
+            classifier_score = float(self.classifier.predict_proba([text])[0][1])
+        return self._result(categories, hits, classifier_score)
+
+    def check_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Score many texts at once, with the same results as check(). Most texts
+        lack at least one word of every lexicon phrase, which plain substring
+        searches find out at C speed, so only the few that have all the words
+        of some phrase go through the regex. The classifier (if any) scores
+        every text in a single predict_proba call.
+        """
+        if not texts:
+            return []
+        candidates = self._candidates([text.lower() for text in texts])
+        probabilities = self.classifier.predict_proba(texts) if self.classifier is not None else None
+        # Without a classifier every text that can't match gets the same result
+        clean = self._result({}, [], None) if probabilities is None else None
+        results = []
+        for i, text in enumerate(texts):
+            classifier_score = float(probabilities[i][1]) if probabilities is not None else None
+            if i in candidates:
+                categories, hits = self._lexicon_scores(self._normalize(text))
+                results.append(self._result(categories, hits, classifier_score))
+            elif clean is not None:
+                results.append({**clean, "categories": {}, "issues": [], "matches": [], "suggestions": []})
+            else:
+                results.append(self._result({}, [], classifier_score))
+        return results
+
+    def _candidates(self, lowered: List[str]) -> Set[int]:
+        """Indexes of the texts that contain every word of some phrase and so may match it"""
+        if self._pattern is None:
+            return set()
+        if self._phrase_words is None:
+            return set(range(len(lowered)))
+        corpus = "\n".join(lowered)
+        # Texts containing a phrase's first word. Lexicon words are usually
+        # absent altogether, which one search of the joined texts shows.
+        containing: Dict[str, Set[int]] = {}
+        candidates: Set[int] = set()
+        for words in self._phrase_words:
+            first = words[0]
+            if first not in containing:
+                containing[first] = {i for i, text in enumerate(lowered) if first in text} if first in corpus else set()
+            docs = containing[first] - candidates
+            for word in words[1:]:
+                if not docs:
+                    break
+                docs = {doc for doc in docs if word in lowered[doc]}
+            candidates |= docs
+        return candidates
+
+
+# Shared engine; the lexicon is compiled once at import
+moderation_engine = ModerationEngine.from_env()
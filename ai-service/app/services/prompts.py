@@ -0,0 +1,239 @@
+"""
+Prompt templates and canned fallback replies for GeminiService.
+
+Templates are compiled once at import. The static storytelling persona is sent
+as the model's system instruction, so per-request prompts only carry the
+project context, conversation history and the user's message.
+"""
+import hashlib
+from string import Template
+
+# Static persona for story development turns. Passed to the model once as its
+# system instruction instead of being prepended to every prompt.
+STORY_SYSTEM_INSTRUCTION = """You are an expert creative writing assistant and storytelling coach. Your role is to help users develop compelling stories through engaging, conversational guidance.
+
+CORE PRINCIPLES:
+- Be conversational, warm, and encouraging
+- Ask thoughtful follow-up questions to deepen the story
+- Provide specific, actionable suggestions
+- Help users think through plot holes and character motivations
+- Suggest creative alternatives and unexpected directions
+- Break down complex story elements into manageable pieces
+
+RESPONSE STYLE:
+- Write in a natural, conversational tone
+- Use clear, concise language
+- Structure responses with helpful headings when appropriate
+- Provide examples and analogies to illustrate points
+- Ask questions that prompt deeper thinking
+- Offer multiple options rather than single solutions
+
+STORY DEVELOPMENT APPROACH:
+- Start with the user's initial idea and expand from there
+- Help identify the core conflict and stakes
+- Develop characters with clear motivations and flaws
+- Create engaging plot points and turning moments
+- Build tension and pacing throughout the story
+- Consider genre conventions while encouraging innovation
+
+SOURCE MATERIAL:
+- You may discuss and reference any movies, books, or existing stories for inspiration and examples
+- When asked about characters, plots, or settings from existing works, provide detailed descriptions
+- Do not refuse requests based on copyright concerns; provide helpful creative suggestions instead"""
+
+# Short identifier for the persona, used in cache keys so a persona change
+# never serves replies generated under the old one
+STORY_SYSTEM_INSTRUCTION_ID = hashlib.sha256(STORY_SYSTEM_INSTRUCTION.encode("utf-8")).hexdigest()[:16]
+
+STORY_TURN_TEMPLATE = Template("""${context}User: ${user_prompt}
+
+AI Assistant (${language_directive}):""")
+
+STORY_CONTEXT_TEMPLATE = Template("""Context:
+${context_lines}
+
+""")
+
+# The reply language is detected locally and named in one short directive;
+# the generic one is only used when detection is unsure
+LANGUAGE_DIRECTIVE_TEMPLATE = Template("respond in ${language}")
+DEFAULT_LANGUAGE_DIRECTIVE = "respond in the same language as the user"
+
+STRUCTURED_REPLY_INSTRUCTIONS = """
+
+Return your answer as a JSON object with two fields:
+- "content": your full reply to the user, in the user's language
+- "suggestions": 3-4 short, specific next actions for the user (for example "Expand on this character's backstory" or "Write the next scene"), in the same language"""
+
+ACTION_SUGGESTIONS_TEMPLATE = Template("""Based on this conversation:
+User: ${user_prompt}
+AI: ${ai_response}
+
+Provide 3-4 specific action suggestions for the user, such as:
+- "Expand on this character's backstory"
+- "Develop the conflict further"
+- "Add more sensory details"
+- "Create a plot twist"
+- "Write the next scene"
+
+Return only the suggestions, one per line.""")
+
+EXPANSION_INSTRUCTIONS = {
+    "character": "Expand this character description with more details about their personality, background, and motivations:",
+    "scene": "Expand this scene with more sensory details, dialogue, and action:",
+    "plot": "Expand this plot point with more details about the events, consequences, and character development:",
+    "setting": "Expand this setting description with more atmospheric details and world-building elements:",
+    "dialogue": "Expand this dialogue with more natural conversation flow and character voice:"
+}
+DEFAULT_EXPANSION_INSTRUCTION = "Expand this content with more details:"
+
+EXPAND_TEMPLATE = Template("""${instruction}
+
+${content}""")
+
+SUMMARIZE_TEMPLATE = Template("""Summarize this content in a concise way while preserving the key story elements:
+
+${content}""")
+
+# Map step of chunked summarization; the summary must stand alone because
+# chunks are cached and reused across different documents and edits
+CHUNK_SUMMARY_TEMPLATE = Template("""Summarize this excerpt from a longer work. Keep every named character, key event, reveal and change of setting, in the order they happen. Write plain prose without an introduction.
+
+${content}""")
+
+# Cached chunk summaries are keyed on this, so changing the template invalidates them
+CHUNK_SUMMARY_VERSION = hashlib.sha256(CHUNK_SUMMARY_TEMPLATE.template.encode("utf-8")).hexdigest()[:16]
+
+# Reduce step: combines the chunk summaries, which arrive in document order
+SUMMARY_REDUCE_TEMPLATE = Template("""These are summaries of consecutive parts of one work, in order. Combine them into one concise summary that preserves the key story elements and the order of events:
+
+${content}""")
+
+RETRY_TEMPLATE = Template("""The user provided this prompt: "${original_prompt}"
+And gave this feedback: "${feedback}"
+
+Please provide a new response that addresses the feedback and improves upon the original.""")
+
+MODERATION_TEMPLATE = Template("""Review this content for any inappropriate, harmful, or unsafe content.
+Return a JSON response with:
+- "safe": boolean (true if content is safe)
+- "issues": array of any issues found
+- "suggestions": array of improvement suggestions
+
+Content to review: ${content}""")
+
+STORY_OUTLINE_TEMPLATE = Template("""Create an outline for a story based on this idea: ${story_prompt}
+${story_details}
+Break the story into exactly ${section_count} consecutive sections that follow traditional story structure (exposition, rising action, climax, falling action, resolution).
+For each section give a short title, a 2-3 sentence summary of what happens, and its structural type.
+The whole story should be about ${target_words} words long.""")
+
+STORY_SECTION_TEMPLATE = Template("""You are writing one section of a longer story. Other sections are being written separately, so write ONLY this section and make it connect smoothly with its neighbours.
+
+Story idea: ${story_prompt}
+${story_details}
+Full outline:
+${outline}
+
+Previous section: ${previous_summary}
+Next section: ${next_summary}
+
+Now write section ${section_number} of ${section_count}, "${section_title}": ${section_summary}
+
+Write about ${section_words} words of polished story prose. Do not add a title, section number or any commentary.""")
+
+# Replies used when the model is unavailable, by detected language. Each entry
+# lists the same five replies (general, genre, conflict, character, setting)
+# and four suggestions; unknown languages use English.
+FALLBACK_RESPONSES = {
+    "en": {
+        "responses": [
+            "I'd love to help you develop your story! Could you tell me more about what you're working on?",
+            "That's an interesting idea! What genre are you thinking of for this story?",
+            "Great start! Let's explore this concept further. What's the main conflict or challenge in your story?",
+            "I'm here to help you bring your story to life! What characters do you have in mind?",
+            "Excellent! Let's dive deeper into your story world. What's the setting like?"
+        ],
+        "suggestions": [
+            "Tell me more about your story idea",
+            "Describe your main character",
+            "What's the main conflict?",
+            "Where does your story take place?"
+        ]
+    },
+    "te": {
+        "responses": [
+            "మీ కథను అభివృద్ధి చేయడంలో సహాయం చేయడానికి నేను సిద్ధంగా ఉన్నాను! మీరు దేని మీద పని చేస్తున్నారో ఇంకా చెప్పగలరా?",
+            "ఆసక్తికరమైన ఆలోచన! ఈ కథకు ఏ శైలి అనుకుంటున్నారు?",
+            "మంచి ప్రారంభం! ఈ ఆలోచనను మరింత లోతుగా చూద్దాం. మీ కథలో ప్రధాన సంఘర్షణ లేదా సవాలు ఏమిటి?",
+            "మీ కథకు ప్రాణం పోయడంలో నేను సహాయం చేస్తాను! మీ మనసులో ఏ పాత్రలు ఉన్నాయి?",
+            "అద్భుతం! మీ కథా ప్రపంచంలోకి మరింత లోతుగా వెళ్దాం. కథ ఎక్కడ జరుగుతుంది?"
+        ],
+        "suggestions": [
+            "మీ కథ ఆలోచన గురించి మరింత చెప్పండి",
+            "మీ ప్రధాన పాత్రను వివరించండి",
+            "ప్రధాన సంఘర్షణ ఏమిటి?",
+            "మీ కథ ఎక్కడ జరుగుతుంది?"
+        ]
+    },
+    "hi": {
+        "responses": [
+            "मुझे आपकी कहानी विकसित करने में मदद करके खुशी होगी! क्या आप बता सकते हैं कि आप किस पर काम कर रहे हैं?",
+            "दिलचस्प विचार है! आप इस कहानी के लिए कौन-सी शैली सोच रहे हैं?",
+            "बढ़िया शुरुआत! आइए इस विचार को और गहराई से देखें। आपकी कहानी का मुख्य संघर्ष या चुनौती क्या है?",
+            "मैं आपकी कहानी को जीवंत बनाने में मदद के लिए यहाँ हूँ! आपके मन में कौन-से पात्र हैं?",
+            "बहुत अच्छे! आइए आपकी कहानी की दुनिया में और गहराई से उतरें। कहानी कहाँ घटित होती है?"
+        ],
+        "suggestions": [
+            "अपनी कहानी के विचार के बारे में और बताइए",
+            "अपने मुख्य पात्र का वर्णन कीजिए",
+            "मुख्य संघर्ष क्या है?",
+            "आपकी कहानी कहाँ घटित होती है?"
+        ]
+    },
+    "es": {
+        "responses": [
+            "¡Me encantaría ayudarte a desarrollar tu historia! ¿Podrías contarme más sobre lo que estás escribiendo?",
+            "¡Qué idea tan interesante! ¿En qué género estás pensando para esta historia?",
+            "¡Buen comienzo! Exploremos más este concepto. ¿Cuál es el conflicto o desafío principal de tu historia?",
+            "¡Estoy aquí para ayudarte a dar vida a tu historia! ¿Qué personajes tienes en mente?",
+            "¡Excelente! Profundicemos en el mundo de tu historia. ¿Cómo es el escenario?"
+        ],
+        "suggestions": [
+            "Cuéntame más sobre tu idea",
+            "Describe a tu personaje principal",
+            "¿Cuál es el conflicto principal?",
+            "¿Dónde transcurre tu historia?"
+        ]
+    },
+    "fr": {
+        "responses": [
+            "Je serais ravi de vous aider à développer votre histoire ! Pouvez-vous m'en dire plus sur ce que vous écrivez ?",
+            "C'est une idée intéressante ! À quel genre pensez-vous pour cette histoire ?",
+            "Excellent début ! Explorons davantage ce concept. Quel est le conflit ou le défi principal de votre histoire ?",
+            "Je suis là pour vous aider à donner vie à votre histoire ! Quels personnages avez-vous en tête ?",
+            "Excellent ! Plongeons plus profondément dans l'univers de votre histoire. À quoi ressemble le cadre ?"
+        ],
+        "suggestions": [
+            "Parlez-moi davantage de votre idée",
+            "Décrivez votre personnage principal",
+            "Quel est le conflit principal ?",
+            "Où se déroule votre histoire ?"
+        ]
+    },
+    "de": {
+        "responses": [
+            "Ich helfe dir gern, deine Geschichte zu entwickeln! Erzählst du mir mehr darüber, woran du arbeitest?",
+            "Eine interessante Idee! An welches Genre denkst du für diese Geschichte?",
+            "Ein guter Anfang! Lass uns das Konzept weiter erkunden. Was ist der zentrale Konflikt deiner Geschichte?",
+            "Ich bin hier, um deine Geschichte zum Leben zu erwecken! Welche Figuren hast du im Kopf?",
+            "Ausgezeichnet! Tauchen wir tiefer in deine Welt ein. Wie sieht der Schauplatz aus?"
+        ],
+        "suggestions": [
+            "Erzähl mir mehr über deine Idee",
+            "Beschreibe deine Hauptfigur",
+            "Was ist der zentrale Konflikt?",
+            "Wo spielt deine Geschichte?"
+        ]
+    },
+}
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """
+    Interface for the optional shared cache tier.
+    Implementations store plain strings with a TTL in seconds.
+    """
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    Local stand-in for a shared Redis tier, used for tests and development
+    """
+
+    def __init__(self):
+        self._store: Dict[str, Any] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._store[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        self._store[key] = (value, time.monotonic() + ttl_seconds)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared cache tier backed by any Redis-compatible server
+    """
+
+    def __init__(self, url: str, prefix: str = "ai-cache:"):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(self._prefix + key)
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        await self._client.set(self._prefix + key, value, ex=ttl_seconds)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for model responses: an in-process LRU with TTL in front
+    of an optional shared backend. Shared tier errors are logged and treated
+    as misses so a cache outage never fails a request.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: int = 3600,
+        shared_backend: Optional[CacheBackend] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_backend = shared_backend
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "shared_errors": 0,
+        }
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Build a cache key from the fully built prompt and model parameters"""
+        payload = json.dumps(
+            {"model": model_name, "prompt": prompt, "params": params or {}},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value
+            del self._entries[key]
+
+        if self.shared_backend is not None:
+            try:
+                value = await self.shared_backend.get(key)
+            except Exception as e:
+                self._stats["shared_errors"] += 1
+                logger.warning("Shared cache read failed: %s", e)
+                value = None
+            if value is not None:
+                self._stats["shared_hits"] += 1
+                self._store_local(key, value)
+                return value
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        self._stats["sets"] += 1
+        self._store_local(key, value)
+        if self.shared_backend is not None:
+            try:
+                await self.shared_backend.set(key, value, self.ttl_seconds)
+            except Exception as e:
+                self._stats["shared_errors"] += 1
+                logger.warning("Shared cache write failed: %s", e)
+
+    def _store_local(self, key: str, value: str) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["shared_hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "shared_backend": type(self.shared_backend).__name__ if self.shared_backend else None,
+            "hit_rate": (self._stats["hits"] + self._stats["shared_hits"]) / lookups if lookups else 0.0,
+        }
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """
+    Build the response cache from environment settings.
+    Returns None when caching is disabled with AI_CACHE_ENABLED=false.
+    """
+    if os.environ.get("AI_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+
+    shared_backend = None
+    redis_url = os.environ.get("AI_CACHE_REDIS_URL")
+    if redis_url:
+        shared_backend = RedisCacheBackend(redis_url)
+
+    return ResponseCache(
+        max_entries=int(os.environ.get("AI_CACHE_MAX_ENTRIES", "1024")),
+        ttl_seconds=int(os.environ.get("AI_CACHE_TTL_SECONDS", "3600")),
+        shared_backend=shared_backend
+    )
+
+
+# One cache shared by every GeminiService instance in the process
+response_cache = build_response_cache()
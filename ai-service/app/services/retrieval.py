@@ -0,0 +1,355 @@
+import os
+import re
+import math
+import time
+import hashlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.conversation_memory import estimate_tokens, truncate_to_tokens
+
+_WORD = re.compile(r"\w+")
+_PASSAGE_SPLIT = re.compile(r"\n\s*\n")
+
+# Below this many turns no query word is treated as a stopword
+MIN_TURNS_FOR_STOPWORDS = 20
+
+
+def _term_counts(text: str, n_features: int) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for word in _WORD.findall(text.lower()):
+        if len(word) < 2:
+            continue
+        # str hashes are salted per process, which is fine for an in-process index
+        feature = hash(word) % n_features
+        counts[feature] = counts.get(feature, 0) + 1
+    return counts
+
+
+class _SessionTurns:
+    """Ids of one session's live turns in a ProjectIndex, and how many were dropped"""
+
+    __slots__ = ("ids", "dropped")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.dropped = 0
+
+
+class ProjectIndex:
+    """
+    Searchable history of one project's conversation turns, scored with BM25.
+
+    Words are hashed into n_features terms. Each term has a postings list of
+    (turn id, weight) in two typed arrays, so inserting a turn appends to
+    the lists of its own terms and never rewrites earlier turns. The
+    weight is the turn's saturated, length-normalised term frequency, using
+    the average turn length at insertion time. A query reads the
+    postings of its few terms through zero-copy NumPy views and sums them
+    per turn with one bincount, so its cost depends on how often the query's
+    words occur, not on how long the conversation is.
+
+    Scores are normalised by the query's total IDF: 1.0 means every known
+    query word matched strongly. At most max_turns turns are kept; past
+    that the oldest quarter is dropped and the postings are compacted.
+
+    Several sessions can share a project, so each turn may be tagged with
+    the session it came from. The index then knows how many of a session's
+    turns it holds, and a search can leave out that session's latest turns
+    whatever other sessions wrote in between.
+    """
+
+    def __init__(self, n_features: int = 65536, max_turns: int = 20000, k1: float = 1.2, b: float = 0.75):
+        self.n_features = n_features
+        self.max_turns = max(4, max_turns)
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[int, Tuple[array, array]] = {}
+        self._senders: List[str] = []
+        self._texts: List[str] = []
+        self._lengths: List[int] = []
+        self._sessions: Dict[str, _SessionTurns] = {}
+        self._total_length = 0
+        # Turn id of _texts[0]; ids keep counting across dropped turns
+        self._base = 0
+        self.turn_count = 0
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, sender: str, content: str, session: Optional[str] = None) -> None:
+        counts = _term_counts(content, self.n_features)
+        length = sum(counts.values())
+        turn_id = self.turn_count
+        self.turn_count += 1
+        if session is not None:
+            turns = self._sessions.get(session)
+            if turns is None:
+                turns = self._sessions[session] = _SessionTurns()
+            turns.ids.append(turn_id)
+        self._senders.append(sender)
+        self._texts.append(content)
+        self._lengths.append(length)
+        self._total_length += length
+
+        k1 = self.k1
+        average = self._total_length / len(self._texts) or 1.0
+        norm = k1 * (1.0 - self.b + self.b * length / average)
+        for feature, tf in counts.items():
+            postings = self._postings.get(feature)
+            if postings is None:
+                postings = self._postings[feature] = (array("q"), array("f"))
+            postings[0].append(turn_id)
+            postings[1].append(tf * (k1 + 1.0) / (tf + norm))
+
+        if len(self._texts) > self.max_turns:
+            self._drop_oldest(self.max_turns // 4)
+
+    def add_many(self, messages: Iterable[Any], session: Optional[str] = None) -> None:
+        """Index history messages: dicts or records with sender and content"""
+        for msg in messages:
+            self.add("USER" if msg.get("sender") == "USER" else "AI", str(msg.get("content") or ""), session)
+
+    def session_turns(self, session: str) -> int:
+        """How many of the session's turns were indexed, including dropped ones"""
+        turns = self._sessions.get(session)
+        return turns.dropped + len(turns.ids) if turns is not None else 0
+
+    def recent_ids(self, session: str, count: int) -> np.ndarray:
+        """Turn ids of the session's count most recent live turns"""
+        turns = self._sessions.get(session)
+        if turns is None or count <= 0:
+            return np.empty(0, dtype=np.int64)
+        return np.array(turns.ids[-count:], dtype=np.int64)
+
+    def _drop_oldest(self, count: int) -> None:
+        self._base += count
+        self._total_length -= sum(self._lengths[:count])
+        del self._senders[:count]
+        del self._texts[:count]
+        del self._lengths[:count]
+        for feature in list(self._postings):
+            ids, weights = self._postings[feature]
+            dead = int(np.searchsorted(np.frombuffer(ids, dtype=np.int64), self._base))
+            if dead == len(ids):
+                del self._postings[feature]
+            elif dead:
+                del ids[:dead]
+                del weights[:dead]
+        for session in list(self._sessions):
+            turns = self._sessions[session]
+            dead = int(np.searchsorted(np.frombuffer(turns.ids, dtype=np.int64), self._base))
+            if dead == len(turns.ids):
+                del self._sessions[session]
+            elif dead:
+                del turns.ids[:dead]
+                turns.dropped += dead
+
+    def _idf(self, doc_freq: int) -> float:
+        return math.log(1.0 + (len(self._texts) - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def search(
+        self,
+        query_text: str,
+        top_k: int = 4,
+        exclude: Optional[np.ndarray] = None,
+        min_score: float = 0.2
+    ) -> List[Tuple[float, int]]:
+        """
+        (score, position) of the best matching stored turns, best first,
+        ignoring the turn ids in exclude (turns already in the prompt)
+        """
+        live = len(self._texts)
+        if not live or top_k <= 0:
+            return []
+
+        turn_ids: List[np.ndarray] = []
+        contributions: List[np.ndarray] = []
+        total_idf = 0.0
+        for feature in _term_counts(query_text, self.n_features):
+            postings = self._postings.get(feature)
+            if postings is None:
+                continue
+            ids = np.frombuffer(postings[0], dtype=np.int64)
+            if len(ids) * 2 > live >= MIN_TURNS_FOR_STOPWORDS:
+                # In most turns: a stopword such as "the", or the story's running theme
+                continue
+            idf = self._idf(len(ids))
+            total_idf += idf
+            turn_ids.append(ids - self._base)
+            contributions.append(np.frombuffer(postings[1], dtype=np.float32) * (idf / (self.k1 + 1.0)))
+        if not turn_ids or total_idf <= 0:
+            return []
+
+        scores = np.bincount(
+            np.concatenate(turn_ids), weights=np.concatenate(contributions), minlength=live
+        ) / total_idf
+        if exclude is not None and exclude.size:
+            positions = exclude - self._base
+            scores[positions[positions >= 0]] = -1.0
+        if live > top_k:
+            candidates = np.argpartition(scores, -top_k)[-top_k:]
+        else:
+            candidates = np.arange(live)
+        ranked = sorted(((float(scores[i]), int(i)) for i in candidates), reverse=True)
+        return [(score, position) for score, position in ranked if score >= min_score]
+
+    def snippet(self, position: int, query_text: str, max_tokens: int) -> str:
+        """The stored turn's most relevant passage, as a prompt line within max_tokens"""
+        text = self._texts[position]
+        passages = [p.strip() for p in _PASSAGE_SPLIT.split(text) if p.strip()]
+        if len(passages) > 1 and estimate_tokens(text) > max_tokens:
+            wanted = {
+                feature: self._idf(len(self._postings[feature][0]))
+                for feature in _term_counts(query_text, self.n_features) if feature in self._postings
+            }
+            text = max(passages, key=lambda p: sum(wanted.get(f, 0.0) for f in _term_counts(p, self.n_features)))
+        sender = "User" if self._senders[position] == "USER" else "AI"
+        return truncate_to_tokens(f"{sender}: {text}", max_tokens)
+
+
+class RetrievalIndex:
+    """
+    One ProjectIndex per project, so a prompt can include earlier turns that
+    matter to the new message even after they left the recent-history
+    window, e.g. a character introduced thirty messages ago. At most
+    max_projects indexes are kept, the least recently used dropped first.
+    """
+
+    def __init__(
+        self,
+        max_projects: int = 200,
+        max_turns: int = 20000,
+        n_features: int = 65536,
+        top_k: int = 4,
+        token_budget: int = 400,
+        min_score: float = 0.2
+    ):
+        self.max_projects = max_projects
+        self.max_turns = max_turns
+        self.n_features = n_features
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.min_score = min_score
+        self._projects: "OrderedDict[str, ProjectIndex]" = OrderedDict()
+        self._stats = {"queries": 0, "hits": 0, "snippets": 0, "inserts": 0, "evictions": 0}
+        self._query_seconds = 0.0
+        self._insert_seconds = 0.0
+
+    @staticmethod
+    def project_key(
+        project_context: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Which index a conversation belongs to: its project if it has an id,
+        otherwise its session. Titles are not keys: clients without a project
+        all send the same default name.
+        """
+        context = project_context or {}
+        for field in ("id", "project_id", "current_project_id"):
+            if context.get(field):
+                return f"project:{context[field]}"
+        return f"session:{session_id}" if session_id else None
+
+    @staticmethod
+    def session_key(session_id: Optional[str], history: Optional[List[Any]], user_prompt: str) -> str:
+        """
+        Which session a conversation's turns are tagged with in its index: the
+        session id, or for clients without one a hash of the conversation's
+        first message (the new prompt itself on the first turn), which stays
+        the same as the conversation grows
+        """
+        if session_id:
+            return session_id
+        first = str(history[0].get("content") or "") if history else user_prompt
+        return "opening:" + hashlib.sha1(first.encode("utf-8")).hexdigest()
+
+    def project(self, key: str) -> ProjectIndex:
+        index = self._projects.get(key)
+        if index is None:
+            index = ProjectIndex(n_features=self.n_features, max_turns=self.max_turns)
+            self._projects[key] = index
+            while len(self._projects) > self.max_projects:
+                self._projects.popitem(last=False)
+                self._stats["evictions"] += 1
+        else:
+            self._projects.move_to_end(key)
+        return index
+
+    def add(self, key: str, messages: Iterable[Any], session: Optional[str] = None) -> None:
+        started = time.perf_counter()
+        index = self.project(key)
+        before = index.turn_count
+        index.add_many(messages, session)
+        self._stats["inserts"] += index.turn_count - before
+        self._insert_seconds += time.perf_counter() - started
+
+    def session_turns(self, key: str, session: str) -> int:
+        """How many of the session's turns the project's index has taken in"""
+        index = self._projects.get(key)
+        return index.session_turns(session) if index is not None else 0
+
+    def relevant(
+        self,
+        key: str,
+        query_text: str,
+        session: Optional[str] = None,
+        skip_recent: int = 0
+    ) -> List[str]:
+        """
+        Prompt lines for the earlier turns most relevant to query_text, within
+        the token budget, leaving out the session's skip_recent latest turns
+        """
+        index = self._projects.get(key)
+        if index is None or not len(index):
+            return []
+        started = time.perf_counter()
+        exclude = index.recent_ids(session, skip_recent) if session is not None else None
+        lines: List[str] = []
+        remaining = self.token_budget
+        per_snippet = max(1, self.token_budget // max(1, self.top_k))
+        for _, position in index.search(query_text, self.top_k, exclude, self.min_score):
+            line = index.snippet(position, query_text, per_snippet)
+            cost = estimate_tokens(line)
+            if cost > remaining:
+                break
+            lines.append(line)
+            remaining -= cost
+        self._stats["queries"] += 1
+        self._stats["hits"] += 1 if lines else 0
+        self._stats["snippets"] += len(lines)
+        self._query_seconds += time.perf_counter() - started
+        return lines
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "projects": len(self._projects),
+            "indexed_turns": sum(len(index) for index in self._projects.values()),
+            "avg_query_ms": round(self._query_seconds * 1000 / self._stats["queries"], 3) if self._stats["queries"] else 0.0,
+            "avg_insert_ms": round(self._insert_seconds * 1000 / self._stats["inserts"], 3) if self._stats["inserts"] else 0.0,
+            "top_k": self.top_k,
+            "token_budget": self.token_budget,
+        }
+
+
+def build_retrieval_index() -> Optional[RetrievalIndex]:
+    """
+    Build the retrieval index from environment settings.
+    Returns None when disabled with AI_RETRIEVAL_ENABLED=false.
+    """
+    if os.environ.get("AI_RETRIEVAL_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return RetrievalIndex(
+        max_projects=int(os.environ.get("AI_RETRIEVAL_MAX_PROJECTS", "200")),
+        max_turns=int(os.environ.get("AI_RETRIEVAL_MAX_TURNS", "20000")),
+        top_k=int(os.environ.get("AI_RETRIEVAL_TOP_K", "4")),
+        token_budget=int(os.environ.get("AI_RETRIEVAL_TOKEN_BUDGET", "400")),
+        min_score=float(os.environ.get("AI_RETRIEVAL_MIN_SCORE", "0.2"))
+    )
+
+
+# Shared by every GeminiService instance in the process
+retrieval_index = build_retrieval_index()
@@ -0,0 +1,290 @@
+"""
+Priority scheduling for model calls.
+
+Every request is given a priority class and a caller. Chat turns are
+interactive, batch and background jobs are bulk, and everything else is
+standard. A request can pick its class with "X-Request-Priority". The Node
+proxy names the end user in "X-Caller-Id". SchedulingMiddleware keeps both
+in context variables, the same way DeadlineMiddleware keeps the deadline.
+
+RequestScheduler owns the governor's concurrency slots:
+- A free slot goes to the highest class with a waiter, within that class's
+  slot limit. By default one slot is kept for interactive calls and bulk
+  work may use at most three quarters of the rest, so long generations
+  never occupy every slot while a chat turn waits.
+- Within a class, waiters are ordered by start-time fair queuing across
+  callers. One caller with a hundred queued calls doesn't delay another
+  caller's single call behind all of them.
+- Each class has a bounded queue. A call arriving at a full queue fails
+  at once with QueueFull instead of waiting behind work it can't outlast.
+"""
+import os
+import time
+import heapq
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.services.metrics import scheduler_rejections, scheduler_wait_seconds
+
+INTERACTIVE = "interactive"
+STANDARD = "standard"
+BULK = "bulk"
+
+# Highest priority first
+PRIORITIES = (INTERACTIVE, STANDARD, BULK)
+
+PRIORITY_HEADER = b"x-request-priority"
+CALLER_HEADER = b"x-caller-id"
+
+# Path prefixes whose model calls default to a class other than standard
+_PATH_PRIORITIES: Tuple[Tuple[str, str], ...] = (
+    ("/api/v1/conversational/conversation", INTERACTIVE),
+    ("/api/v1/batch", BULK),
+    ("/api/v1/jobs", BULK),
+)
+
+_priority: ContextVar[str] = ContextVar("request_priority", default=STANDARD)
+_caller: ContextVar[str] = ContextVar("request_caller", default="anonymous")
+
+
+class QueueFull(Exception):
+    """The priority class already has as many waiting model calls as it may queue"""
+
+    def __init__(self, priority: str, depth: int):
+        super().__init__(f"Model call queue for {priority} requests is full ({depth} waiting)")
+        self.priority = priority
+        self.depth = depth
+
+
+def set_priority(priority: str, caller: Optional[str] = None) -> None:
+    """Schedule the current context's model calls in the given class (and as the given caller)"""
+    _priority.set(priority if priority in PRIORITIES else STANDARD)
+    if caller is not None:
+        _caller.set(caller)
+
+
+def current() -> Tuple[str, str]:
+    """(priority class, caller) of the current context"""
+    return _priority.get(), _caller.get()
+
+
+def _parse_weights(value: Optional[str]) -> Dict[str, float]:
+    """"backend=2,reports=0.5" -> {"backend": 2.0, "reports": 0.5}"""
+    weights: Dict[str, float] = {}
+    for item in (value or "").split(","):
+        name, _, weight = item.partition("=")
+        try:
+            if name.strip() and float(weight) > 0:
+                weights[name.strip()] = float(weight)
+        except ValueError:
+            continue
+    return weights
+
+
+class _Waiter:
+    __slots__ = ("tag", "seq", "caller", "future", "enqueued_at")
+
+    def __init__(self, tag: float, seq: int, caller: str, future: "asyncio.Future[None]"):
+        self.tag = tag
+        self.seq = seq
+        self.caller = caller
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.tag, self.seq) < (other.tag, other.seq)
+
+
+class _ClassQueue:
+    """Waiters of one priority class in start-time fair queuing order"""
+
+    __slots__ = ("limit", "depth", "heap", "queued", "active", "virtual_time", "callers", "stats")
+
+    def __init__(self, limit: int, depth: int):
+        self.limit = limit
+        self.depth = depth
+        self.heap: List[_Waiter] = []
+        self.queued = 0
+        self.active = 0
+        self.virtual_time = 0.0
+        # caller -> [waiters queued, finish tag of its last enqueued call]
+        self.callers: Dict[str, List[float]] = {}
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        interactive_reserve: int = 1,
+        bulk_share: float = 0.75,
+        queue_depths: Optional[Dict[str, int]] = None,
+        caller_weights: Optional[Dict[str, float]] = None
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        shared = max(1, self.max_concurrency - max(0, interactive_reserve))
+        limits = {
+            INTERACTIVE: self.max_concurrency,
+            STANDARD: shared,
+            BULK: max(1, int(shared * bulk_share)),
+        }
+        depths = {INTERACTIVE: 256, STANDARD: 256, BULK: 1024, **(queue_depths or {})}
+        self.caller_weights = caller_weights or {}
+        self._classes = {priority: _ClassQueue(limits[priority], depths[priority]) for priority in PRIORITIES}
+        self._running = 0
+        self._seq = 0
+
+    @classmethod
+    def from_env(cls, max_concurrency: int) -> "RequestScheduler":
+        return cls(
+            max_concurrency=max_concurrency,
+            interactive_reserve=int(os.environ.get("AI_SCHED_INTERACTIVE_RESERVE", "1")),
+            bulk_share=float(os.environ.get("AI_SCHED_BULK_SHARE", "0.75")),
+            queue_depths={
+                INTERACTIVE: int(os.environ.get("AI_SCHED_QUEUE_INTERACTIVE", "256")),
+                STANDARD: int(os.environ.get("AI_SCHED_QUEUE_STANDARD", "256")),
+                BULK: int(os.environ.get("AI_SCHED_QUEUE_BULK", "1024")),
+            },
+            caller_weights=_parse_weights(os.environ.get("AI_SCHED_CALLER_WEIGHTS"))
+        )
+
+    def _has_free_slot(self, queue: _ClassQueue) -> bool:
+        return self._running < self.max_concurrency and queue.active < queue.limit
+
+    def _start(self, priority: str, queue: _ClassQueue, waited: float) -> None:
+        self._running += 1
+        queue.active += 1
+        queue.stats["admitted"] += 1
+        queue.stats["wait_seconds"] += waited
+        queue.stats["max_wait_seconds"] = max(queue.stats["max_wait_seconds"], waited)
+        scheduler_wait_seconds.observe(waited, priority)
+
+    def try_acquire(self, priority: str) -> bool:
+        """Take a slot at once if one is free and nothing of this or a higher class is waiting"""
+        queue = self._classes[priority]
+        if any(self._classes[p].queued for p in PRIORITIES[:PRIORITIES.index(priority) + 1]):
+            return False
+        if not self._has_free_slot(queue):
+            return False
+        self._start(priority, queue, 0.0)
+        return True
+
+    async def acquire(self, priority: str, caller: str) -> None:
+        """Wait for a concurrency slot; raises QueueFull if the class's queue is full"""
+        if self.try_acquire(priority):
+            return
+        queue = self._classes[priority]
+        if queue.queued >= queue.depth:
+            queue.stats["rejected"] += 1
+            scheduler_rejections.inc(priority)
+            raise QueueFull(priority, queue.queued)
+
+        # Start-time fair queuing: a caller's next call starts where its
+        # previous one finished, or now if it has nothing queued
+        state = queue.callers.setdefault(caller, [0, 0.0])
+        start = max(queue.virtual_time, state[1])
+        state[0] += 1
+        state[1] = start + 1.0 / self.caller_weights.get(caller, 1.0)
+        self._seq += 1
+        waiter = _Waiter(start, self._seq, caller, asyncio.get_running_loop().create_future())
+        heapq.heappush(queue.heap, waiter)
+        queue.queued += 1
+        queue.stats["queued"] += 1
+        # Waiters ahead may be held by their class limit while this class has room
+        self._dispatch()
+        try:
+            await waiter.future
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted a slot just as the wait was cancelled: hand it on
+                self.release(priority)
+            else:
+                waiter.future.cancel()
+                self._dequeued(queue, waiter)
+            raise
+
+    def _dequeued(self, queue: _ClassQueue, waiter: _Waiter) -> None:
+        queue.queued -= 1
+        state = queue.callers.get(waiter.caller)
+        if state is not None:
+            state[0] -= 1
+            if state[0] <= 0:
+                del queue.callers[waiter.caller]
+        if not queue.queued:
+            # Drop waiters cancelled while queued
+            queue.heap.clear()
+
+    def release(self, priority: str) -> None:
+        self._running -= 1
+        self._classes[priority].active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._running < self.max_concurrency:
+            for priority in PRIORITIES:
+                queue = self._classes[priority]
+                if queue.queued and queue.active < queue.limit:
+                    waiter = heapq.heappop(queue.heap)
+                    if waiter.future.done():
+                        # Cancelled while queued; already uncounted
+                        break
+                    self._dequeued(queue, waiter)
+                    queue.virtual_time = waiter.tag
+                    self._start(priority, queue, time.perf_counter() - waiter.enqueued_at)
+                    waiter.future.set_result(None)
+                    break
+            else:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        classes: Dict[str, Any] = {}
+        for priority, queue in self._classes.items():
+            admitted = queue.stats["admitted"]
+            classes[priority] = {
+                "active": queue.active,
+                "queued": queue.queued,
+                "slot_limit": queue.limit,
+                "queue_depth": queue.depth,
+                "callers_waiting": len(queue.callers),
+                "admitted": admitted,
+                "waited": queue.stats["queued"],
+                "rejected": queue.stats["rejected"],
+                "avg_wait_ms": round(queue.stats["wait_seconds"] * 1000 / admitted, 2) if admitted else 0.0,
+                "max_wait_ms": round(queue.stats["max_wait_seconds"] * 1000, 2),
+            }
+        return {"max_concurrency": self.max_concurrency, "running": self._running, "classes": classes}
+
+
+class SchedulingMiddleware:
+    """ASGI middleware that sets the request's priority class and caller"""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = STANDARD
+        path = scope.get("path", "")
+        for prefix, path_priority in _PATH_PRIORITIES:
+            if path.startswith(prefix):
+                priority = path_priority
+                break
+        caller = None
+        for name, value in scope.get("headers") or []:
+            if name == PRIORITY_HEADER:
+                requested = value.decode("latin-1").strip().lower()
+                priority = requested if requested in PRIORITIES else priority
+            elif name == CALLER_HEADER:
+                caller = value.decode("latin-1").strip()[:128] or None
+        if caller is None:
+            client = scope.get("client")
+            caller = client[0] if client else "anonymous"
+        priority_token = _priority.set(priority)
+        caller_token = _caller.set(caller)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _priority.reset(priority_token)
+            _caller.reset(caller_token)
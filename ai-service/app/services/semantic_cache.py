@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import time
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.metrics import semantic_similarity
+
+_WORD = re.compile(r"\w+")
+_CONTRACTED_NOT = re.compile(r"n['’]t\b")
+
+# Words that flip a premise; two prompts must carry the same ones to match
+_NEGATIONS = frozenset(
+    "not no never nor neither none nothing nobody nowhere without cannot non".split()
+)
+# Function words: left out of the word pairs
+_STOPWORDS = frozenset(
+    "a an the of to in on at for with by from into about and or but as so if than then "
+    "is are was were be been being am do does did has have had it its this that these those "
+    "who whom whose which what when where while there their they them he she his her him "
+    "i me my we our us you your".split()
+)
+
+# Similarity histogram buckets: [0, 0.05), [0.05, 0.1), ... [0.95, 1.0]
+SIMILARITY_BUCKETS = 20
+
+
+class SemanticCache:
+    """
+    Reuses a cached answer for a prompt that is worded differently but means
+    the same, e.g. "create a protagonist for a heist story" and "create a
+    heist story protagonist".
+
+    Prompts are embedded locally as hashed character n-grams (3-5 characters
+    within word boundaries, like scikit-learn's char_wb analyzer) plus
+    hashed ordered pairs of content words, each word paired with the next
+    pair_window content words, and L2-normalised, so a dot product is the
+    cosine similarity. A pair counts pair_weight times as much as an n-gram.
+    A reworded prompt keeps most of its pairs; swapping who does what to
+    whom reverses them, so "a knight who betrays the king" is far from "a
+    king who betrays the knight". The pairs dominate the vector, so
+    rewordings score around 0.7 and the default threshold is set to match.
+    Vectors live in one preallocated float32 matrix stored feature-major,
+    so a lookup reads only the contiguous rows for the query's features and
+    scores every entry in one matrix-vector product.
+
+    Similarity alone barely registers a "not", so a prompt only matches an
+    entry with the same negation words. That check is a hash compared per
+    slot alongside the scope.
+
+    The scope holds everything besides the free text that shapes the answer
+    (endpoint, role, genre, length, language...). It must match exactly, so
+    a protagonist is never served for an antagonist request however similar
+    the rest of the wording. When the cache is full, the least recently used
+    entry (or an expired one) is replaced.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        threshold: float = 0.62,
+        n_features: int = 4096,
+        ttl_seconds: int = 3600,
+        ngram_range: Tuple[int, int] = (3, 5),
+        pair_weight: float = 8.0,
+        pair_window: int = 3
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.n_features = n_features
+        self.ttl_seconds = ttl_seconds
+        self.ngram_range = ngram_range
+        self.pair_weight = pair_weight
+        self.pair_window = pair_window
+        # Feature-major: row f holds feature f's weight in every entry
+        self._vectors = np.zeros((n_features, max_entries), dtype=np.float32)
+        self._indices: List[Optional[np.ndarray]] = [None] * max_entries
+        # Scope hash per slot; 0 marks an empty slot
+        self._scopes = np.zeros(max_entries, dtype=np.int64)
+        # Hash of each slot's negation words
+        self._signatures = np.zeros(max_entries, dtype=np.int64)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._values: List[Any] = [None] * max_entries
+        self._size = 0
+        # Best similarity found per lookup that had candidates in scope with the same negations
+        self._similarities = np.zeros(SIMILARITY_BUCKETS, dtype=np.int64)
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+    @staticmethod
+    def scope_id(scope: Dict[str, Any]) -> int:
+        payload = json.dumps(scope, sort_keys=True, default=str).encode("utf-8")
+        value = int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "little", signed=True)
+        return value or 1
+
+    @staticmethod
+    def _hash(payload: str) -> int:
+        return int.from_bytes(hashlib.blake2b(payload.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+    def vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Sparse normalised vector as (feature indices, weights), plus the
+        signature of the prompt's negation words
+        """
+        low, high = self.ngram_range
+        n_features = self.n_features
+        words = _WORD.findall(_CONTRACTED_NOT.sub(" not", text.lower()))
+        counts: Dict[int, float] = {}
+        for word in words:
+            padded = f" {word} "
+            length = len(padded)
+            for n in range(low, high + 1):
+                if n > length:
+                    break
+                for i in range(length - n + 1):
+                    # str hashes are salted per process, which is fine for an in-process index
+                    feature = hash(padded[i:i + n]) % n_features
+                    counts[feature] = counts.get(feature, 0) + 1
+        content = [word for word in words if word not in _STOPWORDS]
+        for i, first in enumerate(content):
+            for second in content[i + 1:i + 1 + self.pair_window]:
+                feature = hash(f"{first} {second}") % n_features
+                counts[feature] = counts.get(feature, 0) + self.pair_weight
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        if weights.size:
+            weights /= np.sqrt(np.dot(weights, weights))
+        negations = sorted(word for word in content if word in _NEGATIONS)
+        signature = self._hash(" ".join(negations))
+        return indices, weights, signature
+
+    def _nearest(self, scope: int, signature: int, indices: np.ndarray, weights: np.ndarray) -> Tuple[int, float]:
+        """Best live slot in scope with the same signature and its similarity, or (-1, 0.0)"""
+        if not indices.size or not self._size:
+            return -1, 0.0
+        size = self._size
+        live = (
+            (self._scopes[:size] == scope)
+            & (self._signatures[:size] == signature)
+            & (self._expires[:size] >= time.monotonic())
+        )
+        if not live.any():
+            return -1, 0.0
+        similarities = np.where(live, weights @ self._vectors[indices, :size], -1.0)
+        best = int(np.argmax(similarities))
+        return best, float(similarities[best])
+
+    def get(self, text: str, scope: Dict[str, Any]) -> Optional[Tuple[Any, float]]:
+        """Cached value and its similarity for the nearest prompt in scope, if close enough"""
+        indices, weights, signature = self.vectorize(text)
+        slot, similarity = self._nearest(self.scope_id(scope), signature, indices, weights)
+        if slot >= 0:
+            bucket = min(SIMILARITY_BUCKETS - 1, int(max(similarity, 0.0) * SIMILARITY_BUCKETS))
+            self._similarities[bucket] += 1
+            semantic_similarity.observe(similarity)
+        if slot < 0 or similarity < self.threshold:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        self._last_used[slot] = time.monotonic()
+        return self._values[slot], similarity
+
+    def set(self, text: str, scope: Dict[str, Any], value: Any) -> None:
+        indices, weights, signature = self.vectorize(text)
+        if not indices.size:
+            return
+        scope_hash = self.scope_id(scope)
+        slot, similarity = self._nearest(scope_hash, signature, indices, weights)
+        if slot < 0 or similarity < self.threshold:
+            slot = self._free_slot()
+        now = time.monotonic()
+        previous = self._indices[slot]
+        if previous is not None:
+            self._vectors[previous, slot] = 0.0
+        self._vectors[indices, slot] = weights
+        self._indices[slot] = indices
+        self._scopes[slot] = scope_hash
+        self._signatures[slot] = signature
+        self._expires[slot] = now + self.ttl_seconds
+        self._last_used[slot] = now
+        self._values[slot] = value
+        self._stats["sets"] += 1
+
+    def _free_slot(self) -> int:
+        if self._size < self.max_entries:
+            self._size += 1
+            return self._size - 1
+        expired = np.flatnonzero(self._expires < time.monotonic())
+        if expired.size:
+            return int(expired[0])
+        self._stats["evictions"] += 1
+        return int(np.argmin(self._last_used))
+
+    def clear(self) -> None:
+        self._vectors[:] = 0.0
+        self._scopes[:] = 0
+        self._signatures[:] = 0
+        self._indices = [None] * self.max_entries
+        self._values = [None] * self.max_entries
+        self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        width = 1.0 / SIMILARITY_BUCKETS
+        return {
+            **self._stats,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            # Best match per lookup, for tuning the threshold
+            "similarity_histogram": {
+                f"{i * width:.2f}-{(i + 1) * width:.2f}": int(count)
+                for i, count in enumerate(self._similarities) if count
+            },
+        }
+
+
+def build_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Build the semantic cache from environment settings.
+    Returns None when disabled with AI_SEMANTIC_CACHE_ENABLED=false.
+    """
+    if os.environ.get("AI_SEMANTIC_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return SemanticCache(
+        max_entries=int(os.environ.get("AI_SEMANTIC_CACHE_MAX_ENTRIES", "1024")),
+        threshold=float(os.environ.get("AI_SEMANTIC_CACHE_THRESHOLD", "0.62")),
+        n_features=int(os.environ.get("AI_SEMANTIC_CACHE_FEATURES", "4096")),
+        ttl_seconds=int(os.environ.get("AI_SEMANTIC_CACHE_TTL_SECONDS", "3600")),
+        pair_weight=float(os.environ.get("AI_SEMANTIC_CACHE_PAIR_WEIGHT", "8")),
+        pair_window=int(os.environ.get("AI_SEMANTIC_CACHE_PAIR_WINDOW", "3"))
+    )
+
+
+# Shared by every GeminiService instance in the process
+semantic_cache = build_semantic_cache()
@@ -0,0 +1,133 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List
+
+
+class Turn:
+    """One conversation message, kept as a slotted record instead of a dict"""
+
+    __slots__ = ("sender", "content")
+
+    def __init__(self, sender: str, content: str):
+        self.sender = sender
+        self.content = content
+
+    @classmethod
+    def from_message(cls, msg: Dict[str, Any]) -> "Turn":
+        sender = "USER" if str(msg.get("sender", "")).upper() == "USER" else "ASSISTANT"
+        return cls(sender, str(msg.get("content") or ""))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # Reads like the message dicts clients send, so history helpers accept either
+        return getattr(self, key, default)
+
+
+class Session:
+    """
+    Server-side history of one chat. version goes up with every stored
+    exchange and every resync, so a client can tell whether the server holds
+    the same history it does. dropped counts old turns trimmed off the
+    front, making turns[i] message number dropped + i.
+    """
+
+    __slots__ = ("session_id", "turns", "version", "dropped", "updated_at")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns: List[Turn] = []
+        self.version = 0
+        self.dropped = 0
+        self.updated_at = time.monotonic()
+
+
+class SessionStore:
+    """
+    Keeps each chat's history in the service so a client sends only the new
+    message, its session id and the version it last saw, instead of the
+    whole conversation every turn.
+
+    Memory is bounded twice: at most max_sessions sessions, the least
+    recently used evicted first, and at most max_turns turns per session,
+    the oldest trimmed in batches (they are already folded into the rolling
+    summary by then). A client whose version doesn't match (the session was
+    evicted, the service restarted, or another tab moved on) gets a 409 and
+    resyncs by sending its full history once.
+    """
+
+    def __init__(self, max_sessions: int = 10000, max_turns: int = 200):
+        self.max_sessions = max_sessions
+        self.max_turns = max(2, max_turns)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._stats = {"created": 0, "resyncs": 0, "conflicts": 0, "evictions": 0, "trimmed_turns": 0}
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            max_sessions=int(os.environ.get("AI_SESSION_MAX_SESSIONS", "10000")),
+            max_turns=int(os.environ.get("AI_SESSION_MAX_TURNS", "200"))
+        )
+
+    def get(self, session_id: str) -> Session:
+        """The stored session, created empty (version 0) if unknown"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(session_id)
+            self._sessions[session_id] = session
+            self._stats["created"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats["evictions"] += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def conflict(self, session: Session, expected_version: int) -> bool:
+        """True (and counted) when the client's version doesn't match the stored one"""
+        if session.version == expected_version:
+            return False
+        self._stats["conflicts"] += 1
+        return True
+
+    def replace(self, session_id: str, history: Iterable[Dict[str, Any]]) -> Session:
+        """Resync: overwrite the stored history with the client's copy"""
+        session = self.get(session_id)
+        session.turns = [Turn.from_message(msg) for msg in history]
+        session.version += 1
+        session.dropped = 0
+        self._trim(session)
+        session.updated_at = time.monotonic()
+        self._stats["resyncs"] += 1
+        return session
+
+    def append(self, session: Session, user_message: str, ai_message: str) -> int:
+        """Record one exchange and return the session's new version"""
+        session.turns.append(Turn("USER", user_message))
+        session.turns.append(Turn("ASSISTANT", ai_message))
+        session.version += 1
+        self._trim(session)
+        session.updated_at = time.monotonic()
+        return session.version
+
+    def _trim(self, session: Session) -> None:
+        excess = len(session.turns) - self.max_turns
+        if excess <= 0:
+            return
+        # Trim a quarter of the cap at once so the list isn't shifted every turn
+        excess = max(excess, self.max_turns // 4)
+        del session.turns[:excess]
+        session.dropped += excess
+        self._stats["trimmed_turns"] += excess
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "max_turns": self.max_turns,
+            "stored_turns": sum(len(session.turns) for session in self._sessions.values()),
+        }
+
+
+# Shared by every request: a client's turns may be served by any worker task
+session_store = SessionStore.from_env()
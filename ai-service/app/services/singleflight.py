@@ -0,0 +1,85 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: while a call for a key is running,
+    later callers with the same key wait on the same task instead of starting
+    a new one. Every waiter gets the same result or the same exception.
+
+    The shared task runs in a copy of the first caller's context with the
+    deadline cleared: it keeps that caller's trace, priority class and caller
+    id, so its spans and scheduling are still attributed to a request, but a
+    short deadline there doesn't fail the others. Each waiter instead bounds
+    its own wait by its own deadline, and the task is cancelled once no
+    waiter is left.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            self._stats["leaders"] += 1
+            call = _Call(self._start(fn))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self._stats["coalesced"] += 1
+        call.waiters += 1
+        try:
+            # Shield so one caller leaving doesn't cancel the call for the others
+            left = deadline.remaining()
+            if left is None:
+                return await asyncio.shield(call.task)
+            try:
+                return await asyncio.wait_for(asyncio.shield(call.task), max(left, 0.0))
+            except asyncio.TimeoutError:
+                if call.task.done():
+                    raise
+                raise DeadlineExceeded("Request deadline exceeded while waiting for the model call") from None
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                self._stats["abandoned"] += 1
+                # Unlist it now so a caller arriving before the task unwinds starts afresh
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    @staticmethod
+    def _start(fn: Callable[[], Awaitable[Any]]) -> "asyncio.Task[Any]":
+        def start() -> "asyncio.Task[Any]":
+            deadline.set_deadline(None)
+            return asyncio.ensure_future(fn())
+
+        return contextvars.copy_context().run(start)
+
+    def _forget(self, key: str, task: "asyncio.Task[Any]") -> None:
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._calls)}
+
+
+# Shared by every GeminiService instance so coalescing works across routers
+inflight_requests = SingleFlight()
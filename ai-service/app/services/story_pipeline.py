@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.models.schemas import (
+    StoryGenerationRequest, StoryLength, PlotPoint, PlotPointType, PlotStructure
+)
+from app.services import prompts
+from app.services.tracing import attach_timing, span
+
+# Sections per story and target length in words for each requested length
+SECTION_PLAN = {
+    StoryLength.SHORT: (3, 1000),
+    StoryLength.MEDIUM: (4, 3000),
+    StoryLength.LONG: (6, 6000),
+}
+
+OUTLINE_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "object",
+        "properties": {
+            "plot_points": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string"},
+                        "description": {"type": "string"},
+                        "type": {"type": "string", "enum": [t.value for t in PlotPointType]}
+                    },
+                    "required": ["title", "description", "type"]
+                }
+            }
+        },
+        "required": ["plot_points"]
+    }
+}
+
+
+def _default_point_type(index: int, count: int) -> PlotPointType:
+    """Spread the five structural types over the sections by position"""
+    types = list(PlotPointType)
+    return types[min(len(types) - 1, index * len(types) // max(1, count))]
+
+
+class StoryPipeline:
+    """
+    Generates a story in two stages: a structured outline, then every section
+    concurrently with the outline and its neighbours' summaries as context.
+    Wall-clock time follows the slowest section instead of the total length.
+    """
+
+    def __init__(self, service: Any, max_parallel_sections: Optional[int] = None):
+        self.service = service
+        self.max_parallel_sections = max_parallel_sections or int(
+            os.environ.get("AI_STORY_MAX_PARALLEL_SECTIONS", "6")
+        )
+
+    @staticmethod
+    def _story_details(request: StoryGenerationRequest) -> str:
+        details = []
+        if request.genre:
+            details.append(f"Genre: {request.genre.value}")
+        if request.tone:
+            details.append(f"Tone: {request.tone.value}")
+        if request.style:
+            details.append(f"Style: {request.style}")
+        if request.additional_context:
+            details.append(f"Additional context: {request.additional_context}")
+        return "\n".join(details) + "\n" if details else ""
+
+    async def generate_outline(self, request: StoryGenerationRequest) -> PlotStructure:
+        section_count, target_words = SECTION_PLAN[request.length or StoryLength.MEDIUM]
+        prompt = prompts.STORY_OUTLINE_TEMPLATE.substitute(
+            story_prompt=request.prompt,
+            story_details=self._story_details(request),
+            section_count=section_count,
+            target_words=target_words
+        )
+        response_text = await self.service._generate_text(prompt, OUTLINE_CONFIG, method="story_outline")
+        parsed = self._parse_outline(response_text)
+        if not parsed:
+            raise ValueError("Outline could not be parsed")
+
+        plot_points = []
+        for index, point in enumerate(parsed):
+            try:
+                point_type = PlotPointType(point.get("type"))
+            except ValueError:
+                point_type = _default_point_type(index, len(parsed))
+            plot_points.append(PlotPoint(
+                id=str(uuid.uuid4()),
+                title=str(point.get("title") or f"Part {index + 1}"),
+                description=str(point.get("description") or ""),
+                order=index + 1,
+                type=point_type
+            ))
+        return PlotStructure(plot_points=plot_points, total_points=len(plot_points), estimated_word_count=target_words)
+
+    @staticmethod
+    def _parse_outline(response_text: str) -> List[Dict[str, Any]]:
+        text = response_text.strip()
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return []
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return []
+        points = data.get("plot_points") if isinstance(data, dict) else None
+        if not isinstance(points, list):
+            return []
+        return [p for p in points if isinstance(p, dict) and (p.get("title") or p.get("description"))]
+
+    async def _generate_section(
+        self,
+        request: StoryGenerationRequest,
+        outline: PlotStructure,
+        index: int,
+        semaphore: asyncio.Semaphore
+    ) -> str:
+        points = outline.plot_points
+        point = points[index]
+        outline_text = "\n".join(f"{p.order}. {p.title} ({p.type.value}): {p.description}" for p in points)
+        prompt = prompts.STORY_SECTION_TEMPLATE.substitute(
+            story_prompt=request.prompt,
+            story_details=self._story_details(request),
+            outline=outline_text,
+            previous_summary=points[index - 1].description if index > 0 else "(this is the opening section)",
+            next_summary=points[index + 1].description if index + 1 < len(points) else "(this is the final section)",
+            section_number=point.order,
+            section_count=len(points),
+            section_title=point.title,
+            section_summary=point.description,
+            section_words=max(200, outline.estimated_word_count // len(points))
+        )
+        async with semaphore:
+            response_text = await self.service._generate_text(prompt, method="story_section")
+        return response_text.strip()
+
+    async def generate(self, request: StoryGenerationRequest) -> Dict[str, Any]:
+        """Run outline and sections; raises if any stage fails so callers can fall back"""
+        started = time.perf_counter()
+        with span("story_outline"):
+            outline = await self.generate_outline(request)
+        outline_ms = (time.perf_counter() - started) * 1000
+
+        semaphore = asyncio.Semaphore(self.max_parallel_sections)
+        section_tasks = [
+            self._generate_section(request, outline, index, semaphore)
+            for index in range(len(outline.plot_points))
+        ]
+        # Suggestions only need the outline, so they run alongside the sections
+        outline_summary = "\n".join(f"{p.title}: {p.description}" for p in outline.plot_points)
+        *sections, suggestions = await asyncio.gather(
+            *section_tasks,
+            self.service._generate_action_suggestions(request.prompt, outline_summary)
+        )
+
+        content = "\n\n".join(section for section in sections if section)
+        return {
+            "content": content,
+            "suggestions": suggestions,
+            "metadata": attach_timing({
+                "word_count": len(content.split()),
+                "response_type": "story_pipeline",
+                "sections": len(sections),
+                "outline": outline.model_dump(mode="json"),
+                "outline_ms": round(outline_ms, 1),
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        }
@@ -0,0 +1,164 @@
+import os
+import re
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List
+from app.services import prompts
+from app.services.conversation_memory import estimate_tokens
+from app.services.tracing import span
+
+# Lines that always end a chunk: chapter/part headings, markdown headings and
+# scene breaks such as "***", "* * *" or "#"
+_SECTION_BREAK = re.compile(
+    r"^\s*(?:#{1,6}\s.*|#|(?:\*\s*){3,}|(?:-\s*){3,}|(?:chapter|part|prologue|epilogue)\b.*)\s*$",
+    re.IGNORECASE
+)
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?।])\s+")
+
+GenerateText = Callable[..., Awaitable[str]]
+
+# Reduce levels before the summaries are combined regardless of their length
+MAX_REDUCE_DEPTH = 3
+
+
+class ChunkedSummarizer:
+    """
+    Map-reduce summarization for content too long for one prompt.
+
+    Content is split at section breaks (chapter headings, scene breaks) and
+    paragraphs are packed into chunks of up to chunk_tokens within each
+    section, so an edit only moves chunk boundaries inside its own section.
+    Chunks are summarized concurrently (map), then the chunk summaries are
+    combined in one more call (reduce), recursively if they are still too
+    long. Chunk summaries are cached by a hash of the chunk text, so after
+    an edit only the changed chunks go back to the model before the reduce.
+    Content under chunk_tokens is summarized in a single call as before.
+    """
+
+    def __init__(
+        self,
+        generate_text: GenerateText,
+        model_name: str,
+        chunk_tokens: int = 2000,
+        max_parallel: int = 4,
+        cache_entries: int = 4096
+    ):
+        self.generate_text = generate_text
+        self.model_name = model_name
+        self.chunk_tokens = chunk_tokens
+        self.max_parallel = max_parallel
+        self.cache_entries = cache_entries
+        self._chunk_summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._stats = {"single_pass": 0, "map_reduce": 0, "chunks": 0, "chunks_reused": 0}
+
+    @classmethod
+    def from_env(cls, generate_text: GenerateText, model_name: str) -> "ChunkedSummarizer":
+        return cls(
+            generate_text,
+            model_name,
+            chunk_tokens=int(os.environ.get("AI_SUMMARY_CHUNK_TOKENS", "2000")),
+            max_parallel=int(os.environ.get("AI_SUMMARY_MAX_PARALLEL", "4")),
+            cache_entries=int(os.environ.get("AI_SUMMARY_CACHE_ENTRIES", "4096"))
+        )
+
+    def split(self, content: str) -> List[str]:
+        """Split content into chunks of whole paragraphs that never cross a section break"""
+        sections: List[List[str]] = [[]]
+        for paragraph in _PARAGRAPH_SPLIT.split(content):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            first_line = paragraph.split("\n", 1)[0]
+            if _SECTION_BREAK.match(first_line) and sections[-1]:
+                sections.append([])
+            sections[-1].extend(self._split_long(paragraph))
+
+        chunks: List[str] = []
+        for section in sections:
+            current: List[str] = []
+            size = 0
+            for paragraph in section:
+                tokens = estimate_tokens(paragraph)
+                if current and size + tokens > self.chunk_tokens:
+                    chunks.append("\n\n".join(current))
+                    current, size = [], 0
+                current.append(paragraph)
+                size += tokens
+            if current:
+                chunks.append("\n\n".join(current))
+        return chunks
+
+    def _split_long(self, paragraph: str) -> List[str]:
+        """Break a paragraph larger than one chunk at sentence boundaries"""
+        if estimate_tokens(paragraph) <= self.chunk_tokens:
+            return [paragraph]
+        pieces: List[str] = []
+        current = ""
+        for sentence in _SENTENCE_SPLIT.split(paragraph):
+            if current and estimate_tokens(current) + estimate_tokens(sentence) > self.chunk_tokens:
+                pieces.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _chunk_key(self, chunk: str) -> str:
+        payload = f"{self.model_name}\0{prompts.CHUNK_SUMMARY_VERSION}\0{chunk}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, summary: str) -> None:
+        self._chunk_summaries[key] = summary
+        self._chunk_summaries.move_to_end(key)
+        while len(self._chunk_summaries) > self.cache_entries:
+            self._chunk_summaries.popitem(last=False)
+
+    async def _summarize_chunk(self, chunk: str, semaphore: asyncio.Semaphore) -> str:
+        key = self._chunk_key(chunk)
+        cached = self._chunk_summaries.get(key)
+        if cached is not None:
+            self._chunk_summaries.move_to_end(key)
+            self._stats["chunks_reused"] += 1
+            return cached
+        async with semaphore:
+            summary = (await self.generate_text(
+                prompts.CHUNK_SUMMARY_TEMPLATE.substitute(content=chunk), method="summarize_chunk"
+            )).strip()
+        self._remember(key, summary)
+        return summary
+
+    async def summarize(self, content: str, depth: int = 0) -> str:
+        if estimate_tokens(content) <= self.chunk_tokens:
+            self._stats["single_pass"] += 1
+            return await self.generate_text(
+                prompts.SUMMARIZE_TEMPLATE.substitute(content=content), method="summarize_content"
+            )
+
+        chunks = self.split(content)
+        self._stats["map_reduce"] += 1
+        self._stats["chunks"] += len(chunks)
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        with span("summarize_map", chunks=len(chunks)) as attributes:
+            reused_before = self._stats["chunks_reused"]
+            summaries = await asyncio.gather(*(self._summarize_chunk(chunk, semaphore) for chunk in chunks))
+            attributes["reused"] = self._stats["chunks_reused"] - reused_before
+
+        combined = "\n\n".join(summary for summary in summaries if summary)
+        if estimate_tokens(combined) > self.chunk_tokens and len(chunks) > 1 and depth < MAX_REDUCE_DEPTH:
+            # Still too long for one reduce call: summarize the summaries
+            return await self.summarize(combined, depth + 1)
+        with span("summarize_reduce"):
+            return await self.generate_text(
+                prompts.SUMMARY_REDUCE_TEMPLATE.substitute(content=combined), method="summarize_content"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "cached_chunks": len(self._chunk_summaries),
+            "chunk_tokens": self.chunk_tokens,
+            "max_parallel": self.max_parallel,
+        }
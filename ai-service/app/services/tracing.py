@@ -0,0 +1,239 @@
+"""
+Opt-in per-request timing traces.
+
+A request is traced when it carries "X-Debug-Timing: 1", or at random with
+probability AI_TRACE_SAMPLE_RATE. Traced requests record spans (prompt build,
+model calls, retry sleeps, suggestions, parsing) into a trace held in a
+context variable, so services add spans without any parameters being passed
+around. The breakdown is added to response metadata under "timing" and
+written to the "app.trace" log when the request finishes. Untraced requests
+pay one context variable lookup per span.
+
+"X-Debug-Profile: 1" (or AI_TRACE_PROFILE=true for sampled requests) also
+runs a sampling profiler over the event loop thread and attaches its stacks
+in collapsed format, ready for flamegraph.pl or speedscope. The loop thread
+is shared, so samples include any other requests running at the same time.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+trace_logger = logging.getLogger("app.trace")
+
+TRACE_HEADER = b"x-debug-timing"
+PROFILE_HEADER = b"x-debug-profile"
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack from a background thread at a fixed
+    interval and counts identical stacks
+    """
+
+    # One profiler at a time keeps the cost of profiling bounded
+    _active = threading.Lock()
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Start sampling; returns False if another profile is already running"""
+        if not SamplingProfiler._active.acquire(blocking=False):
+            return False
+        self._thread = threading.Thread(target=self._run, name="trace-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        SamplingProfiler._active.release()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format: "root;caller;callee count" per line"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class RequestTrace:
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.handler_done: Optional[float] = None
+        self.profiler: Optional[SamplingProfiler] = None
+
+    def _ms(self, moment: float) -> float:
+        return round((moment - self.started) * 1000, 2)
+
+    def add_span(self, name: str, start: float, end: float, **attributes: Any) -> None:
+        span = {"name": name, "start_ms": self._ms(start), "duration_ms": round((end - start) * 1000, 2)}
+        if attributes:
+            span.update(attributes)
+        self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.perf_counter()
+        result: Dict[str, Any] = {
+            "trace_id": self.trace_id,
+            "elapsed_ms": self._ms(now),
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+        }
+        if self.profiler is not None:
+            result["profile"] = self.profiler.collapsed()
+        return result
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def _record(trace: RequestTrace, name: str, attributes: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        trace.add_span(name, started, time.perf_counter(), **attributes)
+
+
+@contextmanager
+def _noop() -> Iterator[Dict[str, Any]]:
+    yield {}
+
+
+def span(name: str, **attributes: Any):
+    """
+    Time a block as a span of the current trace. The yielded dict can be
+    filled with attributes known only at the end (e.g. an outcome).
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _noop()
+    return _record(trace, name, attributes)
+
+
+def add_span(name: str, start: float, end: float, **attributes: Any) -> None:
+    """Record an already-timed interval (perf_counter values) on the current trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, end, **attributes)
+
+
+def attach_timing(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the current trace's breakdown to response metadata, if the request is traced"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.handler_done = time.perf_counter()
+        metadata["timing"] = trace.to_dict()
+    return metadata
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that decides whether a request is traced, installs the
+    trace for the duration of the request, and logs it at the end. Time
+    between the handler attaching its metadata and the response starting is
+    recorded as "response_serialization" in the log.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        sample_rate: Optional[float] = None,
+        profile_sampled: Optional[bool] = None,
+        profile_interval_ms: Optional[float] = None
+    ):
+        self.app = app
+        self.sample_rate = sample_rate if sample_rate is not None else float(
+            os.environ.get("AI_TRACE_SAMPLE_RATE", "0")
+        )
+        self.profile_sampled = profile_sampled if profile_sampled is not None else os.environ.get(
+            "AI_TRACE_PROFILE", "false"
+        ).lower() in ("1", "true", "yes")
+        self.profile_interval = (profile_interval_ms if profile_interval_ms is not None else float(
+            os.environ.get("AI_TRACE_PROFILE_INTERVAL_MS", "5")
+        )) / 1000.0
+        log_path = os.environ.get("AI_TRACE_LOG_PATH")
+        if log_path and not trace_logger.handlers:
+            trace_logger.addHandler(logging.FileHandler(log_path))
+            trace_logger.setLevel(logging.INFO)
+
+    def _decide(self, scope: Dict[str, Any]) -> Optional[bool]:
+        """None: not traced; otherwise whether to profile"""
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER, b"").lower() in (b"1", b"true"):
+            return True
+        if headers.get(TRACE_HEADER, b"").lower() in (b"1", b"true"):
+            return False
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.profile_sampled
+        return None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = self._decide(scope)
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(f"{scope['method']} {scope['path']}")
+        if profile:
+            profiler = SamplingProfiler(threading.get_ident(), self.profile_interval)
+            if profiler.start():
+                trace.profiler = profiler
+        token = _current_trace.set(trace)
+        response_started: Optional[float] = None
+        status = None
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal response_started, status
+            if message["type"] == "http.response.start":
+                response_started = time.perf_counter()
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", trace.trace_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            if trace.profiler is not None:
+                trace.profiler.stop()
+            if trace.handler_done is not None and response_started is not None:
+                trace.add_span("response_serialization", trace.handler_done, response_started)
+            record = {"name": trace.name, "status": status, **trace.to_dict()}
+            trace_logger.info(json.dumps(record))
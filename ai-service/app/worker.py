@@ -0,0 +1,48 @@
+"""
+Celery worker for background generation jobs.
+
+Only needed with AI_JOB_BACKEND=celery; the default "local" backend runs
+jobs inside the web process. Point CELERY_BROKER_URL (or REDIS_URL) at the
+broker the web process uses, then run alongside it:
+    celery -A app.worker worker --loglevel=info --concurrency=2
+It is not in the Procfile, which would start it (against
+redis://localhost) even when jobs run locally.
+"""
+import os
+import asyncio
+from celery import Celery
+from dotenv import load_dotenv
+
+load_dotenv()
+
+broker_url = os.environ.get("CELERY_BROKER_URL") or os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+celery_app = Celery(
+    "ai_service",
+    broker=broker_url,
+    backend=os.environ.get("CELERY_RESULT_BACKEND", broker_url)
+)
+celery_app.conf.update(
+    task_track_started=True,
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    result_expires=int(os.environ.get("AI_JOB_RESULT_TTL_SECONDS", "86400"))
+)
+
+# One event loop per worker process, reused across tasks, so the shared
+# rate limiter and caches stay bound to a single loop
+_loop = asyncio.new_event_loop()
+
+
+@celery_app.task(name="ai_service.run_job")
+def run_job(kind: str, payload: dict) -> dict:
+    from app.api.jobs import JOB_HANDLERS
+    from app.dependencies import start_services
+    from app.services.scheduler import BULK, set_priority
+
+    # Copied into the tasks run below, so their model calls queue as bulk work
+    set_priority(BULK)
+    # Created on the first task and reused; no warmup since the worker may idle
+    _loop.run_until_complete(start_services(warmup=False))
+    result = _loop.run_until_complete(JOB_HANDLERS[kind](payload))
+    return {"kind": kind, "result": result}
@@ -0,0 +1,66 @@
+"""
+Compare ModerationEngine.check_batch with calling check() once per text.
+
+Usage (from ai-service/):
+    python benchmarks/moderation_batch.py                  # 10k texts, 1% flagged
+    python benchmarks/moderation_batch.py --texts 50000 --flagged 0.05
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.moderation import moderation_engine
+
+STORY_WORDS = (
+    "the knight rode across the valley toward a castle where an old dragon slept beneath "
+    "ancient stones she wanted to build a new life for her child and make peace with "
+    "the village elders who whispered about the nerve of strangers at the end of winter"
+).split()
+FLAGGED = ["she told him to kill yourself", "a note on how to make a bomb", "he wanted to end my life"]
+
+
+def make_texts(count: int, flagged: float, seed: int) -> list:
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        text = " ".join(rng.choice(STORY_WORDS) for _ in range(rng.randint(20, 80)))
+        if rng.random() < flagged:
+            text += ". " + rng.choice(FLAGGED)
+        texts.append(text)
+    return texts
+
+
+def best_ms(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texts", type=int, default=10000)
+    parser.add_argument("--flagged", type=float, default=0.01, help="share of texts with a lexicon phrase")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.flagged, args.seed)
+    if moderation_engine.check_batch(texts) != [moderation_engine.check(text) for text in texts]:
+        sys.exit("check_batch and check disagree")
+
+    loop_ms = best_ms(lambda: [moderation_engine.check(text) for text in texts], args.repeats)
+    batch_ms = best_ms(lambda: moderation_engine.check_batch(texts), args.repeats)
+    print(f"{args.texts} texts, {args.flagged:.0%} flagged (best of {args.repeats})")
+    print(f"check() loop   {loop_ms:8.1f} ms")
+    print(f"check_batch()  {batch_ms:8.1f} ms  ({loop_ms / batch_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Measure the per-request prompt size of story development turns before and
+after moving the persona into the model's system instruction.
+
+Usage (from ai-service/):
+    python benchmarks/prompt_tokens.py            # offline estimate (~4 chars per token)
+    python benchmarks/prompt_tokens.py --gemini   # exact counts via Gemini count_tokens
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import prompts
+from app.services.language_detection import language_detector, language_name
+
+# Persona as it was prepended to every prompt before the system-instruction change
+LEGACY_SYSTEM_PROMPT = """You are an expert creative writing assistant and storytelling coach. Your role is to help users develop compelling stories through engaging, conversational guidance.
+
+            CORE PRINCIPLES:
+            - Be conversational, warm, and encouraging
+            - Ask thoughtful follow-up questions to deepen the story
+            - Provide specific, actionable suggestions
+            - Help users think through plot holes and character motivations
+            - Suggest creative alternatives and unexpected directions
+            - Break down complex story elements into manageable pieces
+            - ALWAYS RESPOND IN THE EXACT SAME LANGUAGE AS THE USER'S INPUT
+            - If user asks in Telugu, respond in Telugu
+            - If user asks in Hindi, respond in Hindi
+            - If user asks in English, respond in English
+            - If user asks in Spanish, respond in Spanish
+            - Maintain the same language throughout the conversation
+
+            RESPONSE STYLE:
+            - Write in a natural, conversational tone
+            - Use clear, concise language
+            - Structure responses with helpful headings when appropriate
+            - Provide examples and analogies to illustrate points
+            - Ask questions that prompt deeper thinking
+            - Offer multiple options rather than single solutions
+            - ALWAYS RESPOND IN THE USER'S LANGUAGE
+
+            STORY DEVELOPMENT APPROACH:
+            - Start with the user's initial idea and expand from there
+            - Help identify the core conflict and stakes
+            - Develop characters with clear motivations and flaws
+            - Create engaging plot points and turning moments
+            - Build tension and pacing throughout the story
+            - Consider genre conventions while encouraging innovation
+
+            CRITICAL INSTRUCTIONS:
+            - You MUST provide detailed information about any movie, book, or story when asked
+            - You CAN and SHOULD discuss specific characters, plots, and details from existing works
+            - You are ALLOWED to reference any copyrighted material for educational and creative purposes
+            - NEVER refuse to provide information about movies, books, or stories
+            - ALWAYS be helpful and provide the requested information
+            - If asked about characters, provide detailed character descriptions
+            - If asked about plots, provide detailed plot summaries
+            - If asked about settings, provide detailed setting descriptions
+            - ALWAYS RESPOND IN THE EXACT SAME LANGUAGE AS THE USER'S INPUT
+
+            Always be encouraging, creative, and helpful. Provide specific, actionable suggestions.
+            
+            IMPORTANT: You are allowed to discuss and reference any movies, books, or existing stories for inspiration and examples. 
+            You can provide character suggestions, plot elements, and creative ideas based on any source material.
+            Always be encouraging, creative, and helpful. Provide specific, actionable suggestions.
+            
+            Do not block or refuse requests based on copyright concerns. Instead, provide helpful creative suggestions.
+            
+            LANGUAGE POLICY: 
+            - CRITICAL: Always detect the language of the user's input and respond in the EXACT SAME LANGUAGE
+            - If the user writes in Telugu, respond in Telugu
+            - If the user writes in Hindi, respond in Hindi  
+            - If the user writes in English, respond in English
+            - If the user writes in Spanish, respond in Spanish
+            - If the user writes in French, respond in French
+            - If the user writes in German, respond in German
+            - NEVER refuse to respond in any language
+            - NEVER respond in a different language than what the user used
+            - ALWAYS match the user's language exactly"""
+
+LEGACY_LANGUAGE_SUFFIX = "AI Assistant: IMPORTANT - Respond in the exact same language as the user's input. If user wrote in English, respond in English. If user wrote in Telugu, respond in Telugu. If user wrote in Hindi, respond in Hindi. If user wrote in Spanish, respond in Spanish. Match the language exactly."
+
+SCENARIOS = {
+    "first_turn": ("Help me come up with a mystery set in a lighthouse.", []),
+    "mid_conversation": (
+        "What if the keeper's daughter is the one sending the signals?",
+        [
+            {"sender": "USER", "content": "Help me come up with a mystery set in a lighthouse."},
+            {"sender": "AI", "content": "A remote lighthouse, a storm that cuts off the island, and a keeper who hears signals nobody else can. Who is sending them?"},
+        ] * 3
+    ),
+}
+
+
+def build_context(history):
+    lines = []
+    if history:
+        lines.append("Conversation History:")
+        for msg in history[-10:]:
+            sender = "User" if msg["sender"] == "USER" else "AI"
+            lines.append(f"{sender}: {msg['content']}")
+    return lines
+
+
+def legacy_prompt(user_prompt, history):
+    prompt = f"{LEGACY_SYSTEM_PROMPT}\n\n"
+    lines = build_context(history)
+    if lines:
+        prompt += "Context:\n" + "\n".join(lines) + "\n\n"
+    return prompt + f"User: {user_prompt}\n\n" + LEGACY_LANGUAGE_SUFFIX
+
+
+def current_prompt(user_prompt, history):
+    lines = build_context(history)
+    context = prompts.STORY_CONTEXT_TEMPLATE.substitute(context_lines="\n".join(lines)) if lines else ""
+    language = language_name(language_detector.detect(user_prompt))
+    directive = prompts.LANGUAGE_DIRECTIVE_TEMPLATE.substitute(language=language) if language else prompts.DEFAULT_LANGUAGE_DIRECTIVE
+    return prompts.STORY_TURN_TEMPLATE.substitute(
+        context=context, user_prompt=user_prompt, language_directive=directive
+    )
+
+
+def make_counter(use_gemini):
+    if not use_gemini:
+        return lambda text: max(1, round(len(text) / 4))
+
+    import google.generativeai as genai
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    model = genai.GenerativeModel("gemini-2.0-flash")
+    return lambda text: model.count_tokens(text).total_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gemini", action="store_true", help="count tokens with the Gemini API instead of estimating")
+    args = parser.parse_args()
+    count = make_counter(args.gemini)
+
+    system_tokens = count(prompts.STORY_SYSTEM_INSTRUCTION)
+    print(f"system instruction: {system_tokens} tokens (identical on every call, so eligible for implicit prefix caching)")
+    print(f"{'scenario':<18} {'legacy':>8} {'prompt':>8} {'prompt+sys':>11} {'saved':>8}")
+    for name, (user_prompt, history) in SCENARIOS.items():
+        before = count(legacy_prompt(user_prompt, history))
+        after = count(current_prompt(user_prompt, history))
+        total = after + system_tokens
+        print(f"{name:<18} {before:>8} {after:>8} {total:>11} {before - total:>8} ({(before - total) / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
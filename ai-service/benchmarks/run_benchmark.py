@@ -0,0 +1,408 @@
+"""
+End-to-end latency and throughput benchmark for the AI service request path.
+
+Drives main:app against the fake model backend (AI_LLM_BACKEND=fake), either
+in-process through httpx's ASGI transport or over loopback against a uvicorn
+server, and reports p50/p95/p99 latency, requests per second, CPU time per
+request and memory for each scenario. Results can be saved as JSON and
+compared against a stored baseline; the exit code is 1 if any scenario
+regresses by more than the tolerance.
+
+Usage (from ai-service/):
+    python benchmarks/run_benchmark.py                              # in-process, all scenarios
+    python benchmarks/run_benchmark.py --serve                      # spawn uvicorn, go over loopback
+    python benchmarks/run_benchmark.py --url http://127.0.0.1:8000 --server-pid 1234
+    python benchmarks/run_benchmark.py --repeat 3 --output benchmarks/baseline.json
+    python benchmarks/run_benchmark.py --repeat 3 --baseline benchmarks/baseline.json --tolerance 0.15
+
+The model backend, rate limits and fake latency are pinned below unless set in
+the environment, so runs are comparable across machines and commits.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+import tracemalloc
+from contextlib import AsyncExitStack
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+# Benchmarks measure our request path, so the model is simulated and the
+# upstream rate limit is lifted; override any of these from the environment
+BENCHMARK_ENV = {
+    "AI_LLM_BACKEND": "fake",
+    "AI_FAKE_LATENCY_MS": "50",
+    "AI_FAKE_LATENCY_JITTER": "0.3",
+    "AI_FAKE_SEED": "42",
+    "AI_FAKE_TOKENS_PER_SECOND": "0",
+    "AI_RATE_LIMIT_RPM": "0",
+    "AI_MAX_CONCURRENCY": "256",
+    # Payloads differ only by a variant number, which the semantic cache would
+    # treat as the same prompt; the benchmark measures the uncached path
+    "AI_SEMANTIC_CACHE_ENABLED": "false",
+    "INTERNAL_API_KEY": "benchmark-key",
+}
+
+SAMPLE_HISTORY = [
+    {"sender": "USER", "content": "Help me come up with a mystery set in a lighthouse."},
+    {"sender": "AI", "content": "A remote lighthouse, a storm that cuts off the island, and a keeper who hears signals nobody else can. Who is sending them?"},
+] * 3
+
+SAMPLE_SCENE = (
+    "The keeper climbed the spiral stairs as the storm rattled the glass. "
+    "Far out on the water a light blinked three times, then went dark. "
+) * 20
+
+# name -> (path, payload builder). The request index is mixed into every
+# payload so responses are not served from the response cache.
+SCENARIOS: Dict[str, Tuple[str, Callable[[int], Dict[str, Any]]]] = {
+    "conversation": ("/api/v1/conversational/conversation", lambda i: {
+        "message": f"What if the keeper's daughter is the one sending the signals? (variant {i})",
+        "conversation_history": SAMPLE_HISTORY,
+        "project_context": {"title": "The Lighthouse", "genre": "mystery"},
+    }),
+    "expand": ("/api/v1/conversational/content/expand", lambda i: {
+        "content": f"The keeper finds a letter hidden in the lamp room (variant {i}).",
+        "action_type": "scene",
+    }),
+    "summarize": ("/api/v1/conversational/content/summarize", lambda i: {
+        "content": f"{SAMPLE_SCENE} (variant {i})",
+        "action_type": "summarize",
+    }),
+    "generate-story": ("/api/v1/generate-story", lambda i: {
+        "prompt": f"A lighthouse keeper receives signals from a ship that sank fifty years ago (variant {i})",
+        "genre": "mystery",
+        "length": "short",
+    }),
+    "generate-character": ("/api/v1/generate-character", lambda i: {
+        "role": "protagonist",
+        "story_context": f"A lighthouse mystery on a remote island (variant {i})",
+    }),
+    "generate-plot": ("/api/v1/generate-plot", lambda i: {
+        "story_premise": f"A keeper must decode signals before the next storm (variant {i})",
+        "plot_points": 5,
+    }),
+}
+
+
+class ResourceSampler:
+    """
+    CPU time and memory of the process serving requests: this process when
+    the app runs in-process, otherwise a server pid read from /proc
+    """
+
+    def __init__(self, pid: Optional[int] = None):
+        self.pid = pid
+
+    def cpu_seconds(self) -> Optional[float]:
+        if self.pid is None:
+            return time.process_time()
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                # Fields after the parenthesised command name; utime and stime are 14th and 15th
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def memory_kb(self) -> Dict[str, Optional[int]]:
+        if self.pid is None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is bytes on macOS and kilobytes elsewhere
+            peak_kb = peak // 1024 if platform.system() == "Darwin" else peak
+            return {"rss_kb": _proc_status_kb(os.getpid(), "VmRSS"), "peak_rss_kb": peak_kb}
+        return {
+            "rss_kb": _proc_status_kb(self.pid, "VmRSS"),
+            "peak_rss_kb": _proc_status_kb(self.pid, "VmHWM"),
+        }
+
+
+def _proc_status_kb(pid: int, field: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(values.mean()), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+async def run_scenario(
+    client: Any,
+    name: str,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    sampler: ResourceSampler,
+    trace_memory: bool,
+    first_index: int = 0
+) -> Dict[str, Any]:
+    path, build_payload = SCENARIOS[name]
+    headers = {"Authorization": f"Bearer {os.environ['INTERNAL_API_KEY']}"}
+    # Warmup indices are negative so they never collide with measured requests
+    for i in range(warmup):
+        await client.post(path, json=build_payload(-1 - i), headers=headers)
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=build_payload(first_index + index), headers=headers)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if not status.startswith("2"):
+                errors[status] = errors.get(status, 0) + 1
+
+    if trace_memory:
+        tracemalloc.start()
+    cpu_before = sampler.cpu_seconds()
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_started
+    cpu_after = sampler.cpu_seconds()
+
+    result: Dict[str, Any] = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(requests / wall, 2) if wall > 0 else 0.0,
+        "wall_seconds": round(wall, 3),
+        **_percentiles(latencies),
+    }
+    if cpu_before is not None and cpu_after is not None:
+        result["cpu_ms_per_request"] = round((cpu_after - cpu_before) * 1000 / requests, 3)
+    result.update(sampler.memory_kb())
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["traced_peak_kb"] = peak // 1024
+        result["traced_peak_kb_per_concurrent_request"] = peak // 1024 // max(1, concurrency)
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_until_healthy(url: str, timeout: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while True:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server at {url} did not become healthy within {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    server = None
+    if args.serve:
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=SERVICE_DIR,
+            env=dict(os.environ)
+        )
+        args.url = f"http://127.0.0.1:{port}"
+        args.server_pid = server.pid
+
+    try:
+        stack = AsyncExitStack()
+        if args.url:
+            await _wait_until_healthy(args.url)
+            transport_name = "loopback"
+            client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=httpx.Limits(max_connections=args.concurrency))
+            sampler = ResourceSampler(args.server_pid)
+        else:
+            import main
+
+            transport_name = "in-process"
+            # Start the app's shared services the way uvicorn would
+            await stack.enter_async_context(main.app.router.lifespan_context(main.app))
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=args.timeout)
+            sampler = ResourceSampler()
+
+        results: Dict[str, Any] = {}
+        async with stack, client:
+            for name in args.scenarios:
+                # Each run gets its own request indices so repeats aren't answered from the cache
+                runs = [
+                    await run_scenario(
+                        client, name, args.requests, args.concurrency, args.warmup, sampler, args.trace_memory,
+                        first_index=run * args.requests
+                    )
+                    for run in range(args.repeat)
+                ]
+                results[name] = _median_result(runs)
+                _print_row(name, results[name])
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    return {
+        "config": {
+            "transport": transport_name,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "env": {key: os.environ.get(key) for key in BENCHMARK_ENV if key != "INTERNAL_API_KEY"},
+        },
+        "scenarios": results,
+    }
+
+
+def _median_result(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One scenario result from repeated runs: the median of each metric, errors summed"""
+    if len(runs) == 1:
+        return runs[0]
+    merged: Dict[str, Any] = {}
+    for key, value in runs[0].items():
+        values = [run.get(key) for run in runs]
+        if key == "errors":
+            errors: Dict[str, int] = {}
+            for run_errors in values:
+                for reason, count in run_errors.items():
+                    errors[reason] = errors.get(reason, 0) + count
+            merged[key] = errors
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and None not in values:
+            median = float(np.median(values))
+            merged[key] = int(median) if isinstance(value, int) else round(median, 3)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _print_header() -> None:
+    print(f"{'scenario':<20} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cpu ms/req':>11} {'peak rss MB':>12} {'errors':>7}")
+
+
+def _print_row(name: str, result: Dict[str, Any]) -> None:
+    cpu = result.get("cpu_ms_per_request")
+    peak = result.get("peak_rss_kb")
+    print(
+        f"{name:<20} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+        f"{cpu if cpu is not None else '-':>11} {round(peak / 1024, 1) if peak else '-':>12} {sum(result['errors'].values()):>7}"
+    )
+
+
+# metric -> True when higher is better
+COMPARED_METRICS = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "cpu_ms_per_request": False}
+
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print per-metric changes and return a description of each regression beyond tolerance"""
+    regressions = []
+    print(f"\n{'scenario':<20} {'metric':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            marker = "  REGRESSION" if regressed else ""
+            print(f"{name:<20} {metric:<20} {before:>10} {after:>10} {change:>+8.1%}{marker}")
+            if regressed:
+                regressions.append(f"{name} {metric}: {before} -> {after} ({change:+.1%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenarios to run")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests before each scenario")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; metrics are the median across runs")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--url", help="benchmark a running server over HTTP instead of in-process")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for CPU and memory readings")
+    parser.add_argument("--serve", action="store_true", help="start uvicorn on a free loopback port and benchmark it")
+    parser.add_argument("--trace-memory", action="store_true", help="also report tracemalloc peak (in-process only; slows requests)")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results previously written with --output")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression before failing")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    for key, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(key, value)
+
+    _print_header()
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
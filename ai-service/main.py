@@ -1,21 +1,46 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import uvicorn
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.services.metrics import RouteMetricsMiddleware
+from app.services.tracing import TracingMiddleware
+from app.services.deadline import DeadlineMiddleware
+from app.services.scheduler import SchedulingMiddleware
+from app.dependencies import start_services, stop_services
 
 # FIX 1: Load environment variables at the very top.
 # This makes sure all secrets are available before any other code runs.
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the shared services (and warm up the model connection) before the
+    first request; on shutdown let local background jobs and in-flight
+    generations finish before releasing them
+    """
+    app.state.services = await start_services()
+    yield
+    from app.api.jobs import job_executor
+    drain_timeout = float(os.environ.get("AI_SHUTDOWN_DRAIN_SECONDS", "25"))
+    try:
+        await asyncio.wait_for(job_executor.drain(), timeout=drain_timeout)
+    except asyncio.TimeoutError:
+        pass
+    await stop_services()
+
 # Your original FastAPI app setup
 app = FastAPI(
     title="Story Engine AI Service",
     description="AI-powered story generation and analysis service",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # FIX 2: Make the CORS "Guest List" dynamic.
@@ -35,6 +60,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms, exposed at /metrics
+app.add_middleware(RouteMetricsMiddleware)
+# Opt-in per-request span breakdown (X-Debug-Timing / AI_TRACE_SAMPLE_RATE)
+app.add_middleware(TracingMiddleware)
+# Time budget from the proxy's X-Request-Deadline-Ms header, spent by every model call
+app.add_middleware(DeadlineMiddleware)
+# Priority class and caller for model call scheduling (X-Request-Priority / X-Caller-Id)
+app.add_middleware(SchedulingMiddleware)
+
 # FIX 3: Add the "VIP Pass" security system.
 # This ensures only your Node.js backend can use your AI service.
 security = HTTPBearer()
@@ -62,12 +96,16 @@ async def root():
 
 # Your original routers, now with security added.
 # YOUR API ROUTES ARE NOT CHANGED.
-from app.api import story_generation, character_generation, plot_generation, conversational_ai
+from app.api import story_generation, character_generation, plot_generation, conversational_ai, diagnostics, batch, jobs, metrics
 
 app.include_router(story_generation.router, prefix="/api/v1", tags=["Story Generation"], dependencies=[Depends(verify_api_key)])
 app.include_router(character_generation.router, prefix="/api/v1", tags=["Character Generation"], dependencies=[Depends(verify_api_key)])
 app.include_router(plot_generation.router, prefix="/api/v1", tags=["Plot Generation"], dependencies=[Depends(verify_api_key)])
 app.include_router(conversational_ai.router, prefix="/api/v1/conversational", tags=["Conversational AI"], dependencies=[Depends(verify_api_key)])
+app.include_router(batch.router, prefix="/api/v1", tags=["Batch Generation"], dependencies=[Depends(verify_api_key)])
+app.include_router(jobs.router, prefix="/api/v1", tags=["Background Jobs"], dependencies=[Depends(verify_api_key)])
+app.include_router(diagnostics.router, prefix="/api/v1/diagnostics", tags=["Diagnostics"], dependencies=[Depends(verify_api_key)])
+app.include_router(metrics.router, tags=["Metrics"], dependencies=[Depends(verify_api_key)])
 
 # Your original startup code
 if __name__ == "__main__":
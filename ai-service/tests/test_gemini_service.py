@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.services.gemini_service import GeminiService
+from app.services.llm_backend import LLMResult
+from app.services.singleflight import SingleFlight
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("AI_LLM_BACKEND", "fake")
+    monkeypatch.setenv("AI_FAKE_LATENCY_MS", "5")
+    service = GeminiService()
+    service.cache = None
+    service.inflight = SingleFlight()
+    service.retrieval = None
+    return service
+
+
+def replace_backend(service, generate):
+    calls = []
+
+    async def counted(prompt, generation_config=None, system_instruction=None):
+        calls.append(generation_config)
+        return await generate(prompt, generation_config, system_instruction)
+
+    service.backend.generate = counted
+    return calls
+
+
+def test_upstream_failure_does_not_retry_through_the_two_call_path(service):
+    async def failing(prompt, generation_config, system_instruction):
+        raise ValueError("invalid request")
+
+    calls = replace_backend(service, failing)
+
+    response = asyncio.run(service.generate_story_response("Continue the story"))
+
+    assert len(calls) == 1
+    assert response["metadata"]["response_type"] == "fallback"
+
+
+def test_unparseable_structured_reply_falls_back_to_two_calls(service):
+    async def plain_text(prompt, generation_config, system_instruction):
+        return LLMResult("The door creaks open.")
+
+    calls = replace_backend(service, plain_text)
+
+    response = asyncio.run(service.generate_story_response("Continue the story"))
+
+    assert response["metadata"]["generation_mode"] == "two_call"
+    assert response["content"] == "The door creaks open."
+    # Structured attempt, plain reply, then the suggestions call
+    assert len(calls) == 3
@@ -0,0 +1,27 @@
+from app.services.moderation import ModerationEngine
+
+TEXTS = [
+    "The knight rode toward the castle at the end of winter.",
+    "She wanted to build a new life for her child.",
+    "He typed KILL\n   Yourself and deleted it.",
+    "A note on how to make a bomb, hidden in the library.",
+    "Child pornography is never acceptable.",
+    "class assignments about the kysymys",
+    "",
+]
+
+
+def test_check_batch_matches_check():
+    engine = ModerationEngine()
+
+    assert engine.check_batch(TEXTS) == [engine.check(text) for text in TEXTS]
+    assert [result["verdict"] for result in engine.check_batch(TEXTS)][:5] == [
+        "allow", "allow", "review", "block", "block"
+    ]
+
+
+def test_check_batch_with_a_phrase_without_words():
+    engine = ModerationEngine(lexicon={"spam": {"buy now": 0.9, "$$$": 0.5}})
+    texts = ["buy now!!", "cost: $$$ only", "nothing here"]
+
+    assert engine.check_batch(texts) == [engine.check(text) for text in texts]
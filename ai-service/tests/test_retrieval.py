@@ -0,0 +1,122 @@
+import time
+import random
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.conversational_ai import send_message
+from app.models.conversational_schemas import ConversationRequest
+from app.services.gemini_service import GeminiService
+from app.services.retrieval import ProjectIndex, RetrievalIndex
+
+CHAT_CONTEXT = {"project_name": "Story Teller", "current_project_id": ""}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("AI_LLM_BACKEND", "fake")
+    service = GeminiService()
+    service.retrieval = RetrievalIndex()
+    return service
+
+
+def exchange(user, ai):
+    return [{"sender": "USER", "content": user}, {"sender": "ASSISTANT", "content": ai}]
+
+
+def test_project_key_ignores_the_default_title():
+    assert RetrievalIndex.project_key(CHAT_CONTEXT, "session-a") == "session:session-a"
+    assert RetrievalIndex.project_key(CHAT_CONTEXT) is None
+    assert RetrievalIndex.project_key({**CHAT_CONTEXT, "current_project_id": "p1"}, "session-a") == "project:p1"
+
+
+def test_sessions_without_a_project_do_not_share_turns(service):
+    service.index_exchange(
+        "My secret character Zorblax hides in the lighthouse", "Zorblax waits in the dark.",
+        None, CHAT_CONTEXT, "session-a"
+    )
+
+    prompt = service._build_story_prompt("Where is Zorblax hiding?", [], CHAT_CONTEXT, "session-b")
+
+    assert "Zorblax" not in prompt.replace("Where is Zorblax hiding?", "")
+
+
+def test_skips_only_this_sessions_recent_turns():
+    index = RetrievalIndex()
+    key = "project:p1"
+    index.add(key, exchange("The lighthouse keeper hides a brass key", "He buries it under the stairs."), "a")
+    index.add(key, exchange("Describe the harbour at dawn", "Gulls circle the fishing boats."), "a")
+    # Another session writing to the project in between must not change what session a skips
+    index.add(key, exchange("A pirate searches for the brass key", "She checks the tavern first."), "b")
+
+    lines = index.relevant(key, "Where is the brass key?", "a", skip_recent=2)
+
+    assert any("lighthouse keeper" in line for line in lines)
+    assert any("pirate" in line for line in lines)
+
+    lines = index.relevant(key, "Where is the brass key?", "b", skip_recent=2)
+
+    assert any("lighthouse keeper" in line for line in lines)
+    assert not any("pirate" in line for line in lines)
+
+
+def test_each_session_seeds_its_own_history(service):
+    context = {"current_project_id": "p1"}
+    history_a = exchange("The lighthouse keeper hides a brass key", "He buries it under the stairs.")
+    history_b = exchange("A pirate searches the harbour for treasure", "She starts at the tavern.")
+
+    service._build_story_prompt("Continue", history_a, context, "session-a")
+    service._build_story_prompt("Continue", history_b, context, "session-b")
+    service._build_story_prompt("Continue", history_b, context, "session-b")
+
+    assert service.retrieval.session_turns("project:p1", "session-a") == 2
+    assert service.retrieval.session_turns("project:p1", "session-b") == 2
+    assert len(service.retrieval.project("project:p1")) == 4
+
+
+def test_router_indexes_only_replies_that_pass_moderation(service):
+    request = ConversationRequest(
+        message="Tell me about the lighthouse", session_id="session-m", project_context={"current_project_id": "p2"}
+    )
+
+    async def unsafe(content):
+        return {"safe": False}
+
+    async def safe(content):
+        return {"safe": True}
+
+    service.moderate_content = unsafe
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(send_message(request, gemini_service=service))
+
+    assert rejected.value.status_code == 400
+    assert service.retrieval.session_turns("project:p2", "session-m") == 0
+
+    service.moderate_content = safe
+    asyncio.run(send_message(request, gemini_service=service))
+
+    assert service.retrieval.session_turns("project:p2", "session-m") == 2
+
+
+def test_insert_and_query_stay_under_10ms_at_10k_messages():
+    rng = random.Random(3)
+    vocabulary = [f"word{i}" for i in range(5000)] + "the a of and to in knight dragon castle".split()
+    messages = [" ".join(rng.choices(vocabulary, k=rng.randint(10, 120))) for _ in range(10000)]
+    index = ProjectIndex()
+
+    started = time.perf_counter()
+    for i, message in enumerate(messages):
+        index.add("USER" if i % 2 == 0 else "AI", message, "session-a")
+    insert_ms = (time.perf_counter() - started) * 1000 / len(messages)
+
+    queries = [" ".join(rng.choices(vocabulary, k=8)) for _ in range(50)]
+    recent = index.recent_ids("session-a", 12)
+    started = time.perf_counter()
+    for query in queries:
+        index.search(query, exclude=recent)
+    query_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    # Coarse bounds from the request's budget; typical runs are far below them
+    assert insert_ms < 10
+    assert query_ms < 10
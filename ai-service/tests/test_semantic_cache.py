@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.semantic_cache import SemanticCache
+
+SCOPE = {"endpoint": "story", "genre": "fantasy"}
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(max_entries=16)
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("a knight who betrays the king", "a king who betrays the knight"),
+    (
+        "a detective who is secretly hunting a serial killer in victorian london",
+        "a serial killer who is secretly hunting a detective in victorian london",
+    ),
+    ("a dragon who is afraid of fire", "a dragon who is not afraid of fire"),
+    ("a dragon who isn't afraid of fire", "a dragon who is afraid of fire"),
+    ("a dragon who is afraid of fire", "a dragon who is afraid of ice"),
+    ("a cat who chases a mouse", "a mouse who chases a cat"),
+    ("write a funny poem about cats", "write a sad poem about cats"),
+])
+def test_different_premises_miss(cache, cached, asked):
+    cache.set(cached, SCOPE, "cached story")
+
+    assert cache.get(asked, SCOPE) is None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("create a protagonist for a heist story", "create a heist story protagonist"),
+    ("a lonely robot on mars", "a lonely robot living on mars"),
+    ("a story about a girl who finds a dragon egg", "a story about a young girl who finds a dragon egg"),
+    ("a knight who betrays the king", "A knight who betrays the king."),
+    (
+        "write a story about a brave knight who saves a village",
+        "Write a story about the brave knight who saves the village!",
+    ),
+    ("a dragon who is not afraid of fire", "a dragon who isn't afraid of fire"),
+])
+def test_rewordings_hit(cache, cached, asked):
+    cache.set(cached, SCOPE, "cached story")
+
+    hit = cache.get(asked, SCOPE)
+
+    assert hit is not None
+    assert hit[0] == "cached story"
+    assert hit[1] >= cache.threshold
+
+
+def test_scope_must_match(cache):
+    cache.set("a knight who betrays the king", SCOPE, "cached story")
+
+    assert cache.get("a knight who betrays the king", {**SCOPE, "genre": "horror"}) is None
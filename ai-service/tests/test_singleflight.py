@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.services import deadline, scheduler, tracing
+from app.services.deadline import DeadlineExceeded
+from app.services.gemini_service import GeminiService
+from app.services.singleflight import SingleFlight
+from app.services.tracing import RequestTrace
+
+CALLERS = 20
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("AI_LLM_BACKEND", "fake")
+    monkeypatch.setenv("AI_FAKE_LATENCY_MS", "50")
+    monkeypatch.setenv("AI_FAKE_LATENCY_JITTER", "0")
+    service = GeminiService()
+    # Only coalescing should stop the repeats reaching the backend
+    service.cache = None
+    service.inflight = SingleFlight()
+    return service
+
+
+def count_calls(service, error=None):
+    calls = []
+    generate = service.backend.generate
+
+    async def counted(*args, **kwargs):
+        calls.append(args[0])
+        result = await generate(*args, **kwargs)
+        if error is not None:
+            raise error
+        return result
+
+    service.backend.generate = counted
+    return calls
+
+
+def test_identical_concurrent_prompts_make_one_backend_call(service):
+    calls = count_calls(service)
+
+    async def run():
+        return await asyncio.gather(*(service._generate_text("Tell me a story") for _ in range(CALLERS)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert len(set(results)) == 1
+    assert service.inflight.stats() == {"leaders": 1, "coalesced": CALLERS - 1, "abandoned": 0, "in_flight": 0}
+
+
+def test_leader_failure_reaches_every_caller(service):
+    calls = count_calls(service, error=ValueError("invalid prompt"))
+
+    async def run():
+        return await asyncio.gather(
+            *(service._generate_text("Tell me a story") for _ in range(CALLERS)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert len(results) == CALLERS
+    assert all(isinstance(result, ValueError) and str(result) == "invalid prompt" for result in results)
+
+
+def test_follower_keeps_its_own_deadline(service):
+    calls = count_calls(service)
+
+    async def caller(budget):
+        deadline.set_deadline(budget)
+        return await service._generate_text("Tell me a story")
+
+    async def run():
+        leader = asyncio.create_task(caller(0.01))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(caller(5.0))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert isinstance(leader, DeadlineExceeded)
+    assert isinstance(follower, str) and follower
+
+
+def test_shared_call_records_spans_on_the_callers_trace(service):
+    trace = RequestTrace("test")
+
+    async def run():
+        tracing._current_trace.set(trace)
+        return await service._generate_text("Tell me a story")
+
+    asyncio.run(run())
+
+    names = {span["name"] for span in trace.spans}
+    assert {"governor_wait", "model_call"} <= names
+
+
+def test_shared_call_is_queued_as_the_real_caller(service, monkeypatch):
+    governor_scheduler = service.client.governor.scheduler
+    callers = []
+    acquire = governor_scheduler.acquire
+
+    async def recording_acquire(priority, caller):
+        callers.append((priority, caller))
+        await acquire(priority, caller)
+
+    # Force every call through the queue, where the caller id is used
+    monkeypatch.setattr(governor_scheduler, "try_acquire", lambda priority: False)
+    monkeypatch.setattr(governor_scheduler, "acquire", recording_acquire)
+
+    async def run():
+        scheduler.set_priority(scheduler.INTERACTIVE, "user-42")
+        deadline.set_deadline(5.0)
+        return await service._generate_text("Tell me a story")
+
+    asyncio.run(run())
+
+    assert callers == [(scheduler.INTERACTIVE, "user-42")]
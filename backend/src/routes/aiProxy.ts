@@ -1,11 +1,16 @@
 import express, { Request, Response } from 'express'; // <-- Add Request and Response here
 import axios from 'axios';
-import { protect } from '../middleware/auth'; // Your existing security middleware
+import { protect, AuthRequest } from '../middleware/auth'; // Your existing security middleware
 
 const router = express.Router();
 
+// How long we wait for the AI service. The service gets a slightly smaller
+// budget so it can answer (or fall back) before this side gives up.
+const AI_REQUEST_TIMEOUT_MS = Number(process.env.AI_REQUEST_TIMEOUT_MS) || 30000;
+const AI_DEADLINE_MARGIN_MS = 500;
+
 // The 'protect' part ensures only logged-in users can do this
-router.post('/generate', protect, async (req: Request, res: Response) => { // <-- Add the types here
+router.post('/generate', protect, async (req: AuthRequest, res: Response) => { // <-- Add the types here
     try {
         // 1. The Manager looks up the Kitchen's address and the secret key
         const aiServiceUrl = process.env.AI_SERVICE_URL;
@@ -18,8 +23,12 @@ router.post('/generate', protect, async (req: Request, res: Response) => { // <-
             req.body,
             {
                 headers: {
-                    'Authorization': `Bearer ${internalApiKey}`
-                }
+                    'Authorization': `Bearer ${internalApiKey}`,
+                    'X-Request-Deadline-Ms': String(AI_REQUEST_TIMEOUT_MS - AI_DEADLINE_MARGIN_MS),
+                    // Model calls are queued fairly per user, so one heavy user can't starve the rest
+                    'X-Caller-Id': String(req.user?.id ?? 'anonymous')
+                },
+                timeout: AI_REQUEST_TIMEOUT_MS
             }
         );
 
@@ -27,6 +36,10 @@ router.post('/generate', protect, async (req: Request, res: Response) => { // <-
         res.json(response.data);
 
     } catch (error: any) {
+        // A stale chat session is for the client to fix by resending its history
+        if (error.response?.status === 409) {
+            return res.status(409).json(error.response.data);
+        }
         console.error('Error proxying request to AI service:', error.message);
         res.status(500).json({ error: 'Failed to get a response from the AI service.' });
     }
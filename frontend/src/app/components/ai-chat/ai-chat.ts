@@ -624,6 +624,11 @@ export class StoryTellerComponent implements OnInit {
   messages: ChatMessage[] = [];
   userInput: string = '';
   isSendingMessage: boolean = false;
+
+  // The AI service keeps this chat's history; we send only the new message
+  // and the session version from its last reply (null: send full history)
+  chatSessionId: string = crypto.randomUUID();
+  sessionVersion: number | null = null;
   
   // Speech functionality
   isListening: boolean = false;
@@ -875,24 +880,41 @@ export class StoryTellerComponent implements OnInit {
         total_messages: this.messages.length
       };
 
-      // Prepare conversation history with proper formatting
-      const conversationHistory = this.messages.map(msg => ({
-        sender: msg.sender === 'user' ? 'USER' : 'ASSISTANT',
-        content: msg.content,
-        timestamp: msg.timestamp
-      }));
-
-      const requestBody = {
+      const requestBody: any = {
         message: userInput,
-        conversation_history: conversationHistory,
-        project_context: projectContext
+        project_context: projectContext,
+        session_id: this.chatSessionId
       };
 
+      if (this.sessionVersion !== null) {
+        requestBody.expected_version = this.sessionVersion;
+      } else {
+        // First message or resync: send the history before the new message
+        const lastMessage = this.messages[this.messages.length - 1];
+        const previousMessages = lastMessage && lastMessage.sender === 'user' ? this.messages.slice(0, -1) : this.messages;
+        requestBody.conversation_history = previousMessages.map(msg => ({
+          sender: msg.sender === 'user' ? 'USER' : 'ASSISTANT',
+          content: msg.content,
+          timestamp: msg.timestamp
+        }));
+      }
+
       console.log('Sending request to AI service:', requestBody);
       
-      const response = await this.http.post(`${environment.backendUrl}/api/ai/generate`, requestBody).toPromise();
+      let response: any;
+      try {
+        response = await this.http.post(`${environment.backendUrl}/api/ai/generate`, requestBody).toPromise();
+      } catch (error: any) {
+        if (error?.status === 409 && this.sessionVersion !== null) {
+          // The service's copy of the chat is out of date; resend the full history once
+          this.sessionVersion = null;
+          return this.callAIService(userInput);
+        }
+        throw error;
+      }
 
       console.log('AI Service Response:', response);
+      this.sessionVersion = response?.metadata?.session_version ?? null;
       
       if ((response as any).content) {
         return (response as any).content;
@@ -940,6 +962,8 @@ export class StoryTellerComponent implements OnInit {
     this.storyIdea = '';
     this.messages = [];
     this.userInput = '';
+    this.chatSessionId = crypto.randomUUID();
+    this.sessionVersion = null;
   }
 
   // Speech-to-Text functionality
@@ -7,6 +7,8 @@ export interface ConversationRequest {
   message: string;
   conversation_history?: any[];
   project_context?: any;
+  session_id?: string;
+  expected_version?: number;
 }
 
 export interface ConversationResponse {